@@ -1,6 +1,7 @@
 import os
 from functools import lru_cache
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from dotenv import load_dotenv
 
 # Load environment from backend/.env when imported (works for worker too)
@@ -11,3 +12,10 @@ def get_redis() -> Redis:
     url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     # Important: RQ expects binary-safe Redis (no response decoding)
     return Redis.from_url(url)
+
+
+@lru_cache(maxsize=1)
+def get_async_redis() -> AsyncRedis:
+    """asyncio client for pub/sub (WebSocket fan-out across workers)"""
+    url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    return AsyncRedis.from_url(url)
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from supabase import create_client, Client
 from typing import Dict, List, Any, Optional
 import json
@@ -305,3 +306,9 @@ class SupabaseClient:
         month = quarter_months.get(quarter, 12)
         
         return datetime(year, month, 1)
+
+
+@lru_cache(maxsize=1)
+def get_supabase_client() -> SupabaseClient:
+    """Shared SupabaseClient so routes reuse one HTTP session instead of building one per request"""
+    return SupabaseClient()
@@ -2,6 +2,7 @@
 PulseCompass API - Refactored Main Application
 Clean, modular FastAPI application with proper separation of concerns
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
@@ -22,6 +23,7 @@ from middleware.rate_limit import limiter, custom_rate_limit_handler
 from slowapi.errors import RateLimitExceeded
 from core.logging_config import setup_logging
 from core.monitoring import init_sentry
+from services.transcript_keywords import create_keyword_pool
 
 # Load environment variables
 load_dotenv()
@@ -32,13 +34,24 @@ setup_logging()
 # Initialize monitoring
 init_sentry()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the process pool used to scan very large transcripts"""
+    app.state.keyword_pool = create_keyword_pool()
+    try:
+        yield
+    finally:
+        app.state.keyword_pool.shutdown(cancel_futures=True)
+
+
 # Create FastAPI app
 app = FastAPI(
     title="PulseCompass API",
     description="Advanced Stock Market Analysis Backend - Refactored Architecture",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add rate limiter
@@ -3,7 +3,7 @@ Companies Router - Handles company-related operations
 """
 from fastapi import APIRouter, HTTPException
 from typing import Optional
-from database.supabase_client import SupabaseClient
+from database.supabase_client import get_supabase_client
 
 router = APIRouter(prefix="/companies", tags=["companies"])
 
@@ -22,7 +22,7 @@ async def get_default_watchlist():
 async def create_company(name: str, ticker: str, sector: Optional[str] = None):
     """Create a new company"""
     try:
-        db_client = SupabaseClient()
+        db_client = get_supabase_client()
         company_id = await db_client.create_company(name, ticker, sector)
         return {"company_id": company_id, "message": "Company created successfully"}
     except Exception as e:
@@ -2,21 +2,18 @@
 Advanced Integrity Analysis Router - Multi-Quarter Analysis
 Institutional-grade management integrity tracking with quarter-over-quarter comparison
 """
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from typing import List, Dict, Tuple
 import PyPDF2
 import io
 import re
 from datetime import datetime
-from collections import defaultdict
-import sys
-import os
 import pandas as pd
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.ai_analyzer import AIAnalyzer
+from services.transcript_keywords import count_keyword_categories, PARALLEL_THRESHOLD
 
 router = APIRouter(prefix="/integrity", tags=["integrity"])
 
@@ -101,9 +98,8 @@ def extract_text_from_pdf(pdf_file: bytes) -> str:
         raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
 
 
-def extract_financial_metrics(text: str) -> Dict:
+def extract_financial_metrics(text: str, text_lower: str) -> Dict:
     """Extract specific financial metrics from transcript"""
-    text_lower = text.lower()
     metrics = {}
     
     # Revenue patterns
@@ -133,25 +129,24 @@ def extract_financial_metrics(text: str) -> Dict:
     return metrics
 
 
-def analyze_quarter_transcript(text: str, quarter_name: str, company_name: str = "", model: str = None, temperature: float = None) -> Dict:
-    """Analyze a single quarter's transcript with AI"""
-    text_lower = text.lower()
-    
+def analyze_quarter_transcript(text: str, text_lower: str, quarter_name: str, company_name: str = "", model: str = None, temperature: float = None, ai_analysis: Dict = None, keyword_counts: Dict = None) -> Dict:
+    """Analyze a single quarter's transcript with AI (pass ai_analysis/keyword_counts if already computed)"""
     # Get AI-powered analysis
-    ai_analysis = ai_analyzer.analyze_quarter_with_ai(text, quarter_name, company_name, model=model, temperature=temperature, max_chars=4500)
+    if ai_analysis is None:
+        ai_analysis = ai_analyzer.analyze_quarter_with_ai(text, quarter_name, company_name, model=model, temperature=temperature, max_chars=4500, text_lower=text_lower)
     
     # Key metrics for this quarter (for scoring)
-    revenue_mentions = text_lower.count('revenue') + text_lower.count('sales') + text_lower.count('topline')
-    margin_mentions = text_lower.count('margin') + text_lower.count('profitability') + text_lower.count('ebitda')
-    growth_mentions = sum(text_lower.count(word) for word in ['growth', 'increase', 'expansion', 'accelerat'])
+    if keyword_counts is None:
+        keyword_counts = count_keyword_categories(text_lower)
+    revenue_mentions = keyword_counts['revenue']
+    margin_mentions = keyword_counts['margin']
+    growth_mentions = keyword_counts['growth']
     
     # Positive indicators
-    positive_words = ['delivered', 'achieved', 'exceeded', 'outperformed', 'strong', 'robust', 'successful']
-    positive_count = sum(text_lower.count(word) for word in positive_words)
+    positive_count = keyword_counts['positive']
     
     # Concern indicators
-    concern_words = ['missed', 'below', 'disappointed', 'shortfall', 'challenges', 'headwinds', 'pressure']
-    concern_count = sum(text_lower.count(word) for word in concern_words)
+    concern_count = keyword_counts['concern']
     
     # Guidance extraction
     guidance_statements = []
@@ -197,13 +192,12 @@ def analyze_quarter_transcript(text: str, quarter_name: str, company_name: str =
             highlights.append(f"Profitability metrics discussed ({margin_mentions} mentions)")
     
     # Strategic initiatives
-    strategy_words = ['digital', 'transformation', 'innovation', 'technology', 'automation', 'ai', 'cloud']
-    strategy_count = sum(text_lower.count(word) for word in strategy_words)
+    strategy_count = keyword_counts['strategy']
     if strategy_count > 10:
         highlights.append(f"Strong strategic initiatives focus ({strategy_count} technology/innovation mentions)")
     
     # Customer focus
-    customer_count = text_lower.count('customer') + text_lower.count('client')
+    customer_count = keyword_counts['customer']
     if customer_count > 15:
         highlights.append(f"High customer centricity ({customer_count} customer/client mentions)")
     
@@ -251,30 +245,35 @@ def compare_quarters(quarters_data: List[Dict]) -> Dict:
     scores = [q['score'] for q in sorted_quarters]
     score_trend = "Improving" if scores[-1] > scores[0] else "Declining" if scores[-1] < scores[0] else "Stable"
     
-    # Guidance tracking
-    guidance_tracking = []
-    
+    # Guidance tracking (sized up front: one entry per guidance statement of every quarter but the last)
+    guidance_tracking = [None] * sum(len(q.get('guidance', [])) for q in sorted_quarters[:-1])
+    slot = 0
+
     for i in range(len(sorted_quarters) - 1):
         current_q = sorted_quarters[i]
         next_q = sorted_quarters[i + 1]
-        
+
         # Check if guidance from current quarter was met in next quarter
         current_guidance = current_q.get('guidance', [])
-        
+        if not current_guidance:
+            continue
+
+        # Simple heuristic: if next quarter has higher positive indicators, guidance likely met.
+        # Status and evidence only depend on the quarter pair, so build them once per pair.
+        current_positive = current_q['metrics']['positive_indicators']
+        next_positive = next_q['metrics']['positive_indicators']
+        delivery_status = "Delivered" if next_positive >= current_positive else "Missed"
+        evidence = f"Positive indicators: {current_positive} → {next_positive}"
+
         for guidance in current_guidance:
-            # Simple heuristic: if next quarter has higher positive indicators, guidance likely met
-            current_positive = current_q['metrics']['positive_indicators']
-            next_positive = next_q['metrics']['positive_indicators']
-            
-            delivery_status = "Delivered" if next_positive >= current_positive else "Missed"
-            
-            guidance_tracking.append({
+            guidance_tracking[slot] = {
                 'quarter': current_q['quarter'],
                 'guidance': guidance['details'],
                 'next_quarter': next_q['quarter'],
                 'status': delivery_status,
-                'evidence': f"Positive indicators: {current_positive} → {next_positive}"
-            })
+                'evidence': evidence
+            }
+            slot += 1
     
     # Performance summary
     avg_score = sum(scores) / len(scores)
@@ -291,8 +290,9 @@ def compare_quarters(quarters_data: List[Dict]) -> Dict:
     }
 
 
-@router.post("/analyze")
+@router.post("/analyze", response_class=ORJSONResponse)
 async def analyze_integrity(
+    request: Request,
     files: List[UploadFile] = File(...),
     company_name: str = Form(...),
     model: str = Form(default=""),
@@ -304,8 +304,8 @@ async def analyze_integrity(
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
     
-    # Process each PDF separately
-    quarters_analysis = []
+    # Extract each PDF separately
+    quarters = []
     
     for file in files:
         if not file.filename.endswith('.pdf'):
@@ -317,17 +317,41 @@ async def analyze_integrity(
         # Extract text
         content = await file.read()
         text = extract_text_from_pdf(content)
+        text_lower = text.lower()
         # Fallback to extract quarter from transcript content when unknown
         if quarter_num == 0 or year == 0:
             qn, qnum2, year2 = extract_quarter_from_text(text)
             if qnum2 and year2:
                 quarter_name, quarter_num, year = qn, qnum2, year2
         
-        # Analyze this quarter
-        quarter_analysis = analyze_quarter_transcript(text, quarter_name, company_name, model=(model or None), temperature=temperature)
-        quarter_analysis['year'] = year
-        quarter_analysis['quarter_num'] = quarter_num
-        quarter_analysis['filename'] = file.filename
+        quarters.append({
+            'text': text,
+            'text_lower': text_lower,
+            'quarter': quarter_name,
+            'company': company_name,
+            'year': year,
+            'quarter_num': quarter_num,
+            'filename': file.filename
+        })
+    
+    # AI analysis of all quarters at once (concurrent Ollama requests)
+    ai_analyses = await ai_analyzer.analyze_quarters_batch(quarters, model=(model or None), temperature=temperature, max_chars=4500)
+    
+    keyword_pool = getattr(request.app.state, 'keyword_pool', None)
+    quarters_analysis = []
+    for q, ai_analysis in zip(quarters, ai_analyses):
+        if len(q['text_lower']) > PARALLEL_THRESHOLD:
+            # Tiled scan across the app's process pool, waited on off the event loop
+            keyword_counts = await run_in_threadpool(count_keyword_categories, q['text_lower'], keyword_pool)
+        else:
+            keyword_counts = count_keyword_categories(q['text_lower'])
+        quarter_analysis = analyze_quarter_transcript(
+            q['text'], q['text_lower'], q['quarter'], company_name,
+            ai_analysis=ai_analysis, keyword_counts=keyword_counts
+        )
+        quarter_analysis['year'] = q['year']
+        quarter_analysis['quarter_num'] = q['quarter_num']
+        quarter_analysis['filename'] = q['filename']
         
         quarters_analysis.append(quarter_analysis)
     
@@ -441,8 +465,7 @@ async def rank_excel(file: UploadFile = File(...)):
         if not col:
             return pd.Series(0, index=work.index)
         vals = to_num(work[col])
-        r = vals.rank(method='average', ascending=ascending)
-        score = (r / r.max()) * 100.0
+        score = vals.rank(method='average', ascending=ascending, pct=True) * 100.0
         return score.fillna(0) * weight
 
     # Higher is better
@@ -467,15 +490,15 @@ async def rank_excel(file: UploadFile = File(...)):
             out_cols.append(c)
     output = work[out_cols].sort_values('rank_score', ascending=False).reset_index(drop=True)
 
-    # Build JSON response
+    # Build JSON response (NaN -> None in one vectorized pass, then drop empty cells per record)
+    records = output.astype(object).where(output.notna(), None).to_dict(orient='records')
     results = []
-    for _, row in output.iterrows():
-        item = { 'name': row.get(name_col, ''), 'rank_score': float(row.get('rank_score', 0)) }
-        for c in out_cols:
-            if c not in [name_col, 'rank_score']:
-                v = row.get(c)
-                if pd.notna(v):
-                    item[c] = float(v) if isinstance(v, (int, float)) else str(v)
+    for r in records:
+        name = r.pop(name_col)
+        item = { 'name': name if name is not None else '', 'rank_score': float(r.pop('rank_score')) }
+        for c, v in r.items():
+            if v is not None:
+                item[c] = float(v) if isinstance(v, (int, float)) else str(v)
         results.append(item)
 
     return {
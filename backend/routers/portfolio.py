@@ -2,7 +2,7 @@
 Portfolio Router - Handles portfolio and watchlist operations
 """
 from fastapi import APIRouter, HTTPException
-from database.supabase_client import SupabaseClient
+from database.supabase_client import get_supabase_client
 
 router = APIRouter(prefix="/portfolio", tags=["portfolio"])
 
@@ -27,7 +27,7 @@ async def get_default_portfolio():
 async def get_portfolio(user_id: str):
     """Get user's portfolio"""
     try:
-        db_client = SupabaseClient()
+        db_client = get_supabase_client()
         portfolio = await db_client.get_user_portfolio(user_id)
         return portfolio
     except Exception as e:
@@ -38,7 +38,7 @@ async def get_portfolio(user_id: str):
 async def get_watchlist(user_id: str):
     """Get user's watchlist"""
     try:
-        db_client = SupabaseClient()
+        db_client = get_supabase_client()
         watchlist = await db_client.get_user_watchlist(user_id)
         return watchlist
     except Exception as e:
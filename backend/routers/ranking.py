@@ -3,8 +3,10 @@ Financial Ranking Router
 Handles company ranking based on financial metrics
 """
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from starlette.concurrency import run_in_threadpool
 import pandas as pd
-import io
+import numpy as np
+import re
 from typing import Dict
 import sys
 from pathlib import Path
@@ -14,7 +16,7 @@ import json
 sys.path.append(str(Path(__file__).parent.parent / "utils"))
 
 try:
-    from sector_adjustments import get_sector_from_name, adjust_score_for_sector, SECTOR_BENCHMARKS
+    from sector_adjustments import get_sector_from_name, map_sectors, adjust_score_for_sector, SECTOR_BENCHMARKS
     from performance_tracking import save_current_rankings
     from investment_tiers import classify_all_companies, get_tier_summary, get_portfolio_recommendation
     SECTOR_ENABLED = True
@@ -24,6 +26,20 @@ except ImportError as e:
     SECTOR_ENABLED = False
     TIERS_ENABLED = False
 
+# Optional fast parsers for uploaded spreadsheets
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None
+
 router = APIRouter(prefix="/ranking", tags=["ranking"])
 
 # Investment philosophy weights - Refined with emphasis on valuation and cash flow quality
@@ -92,21 +108,121 @@ PHILOSOPHIES = {
     }
 }
 
+# Top 3 weighted metrics per philosophy, used for ranking explanations
+PHILOSOPHY_TOP3 = {
+    philosophy_id: sorted(data['weights'].items(), key=lambda x: x[1], reverse=True)[:3]
+    for philosophy_id, data in PHILOSOPHIES.items()
+}
+
+# All numeric metric columns, in canonical order
+NUMERIC_COLS = [
+    'cmp', 'market_cap', 'pe_ratio', 'roe', 'roce',
+    'sales_growth_3yr', 'sales_growth_5yr', 'sales', 'pat',
+    'profit_growth_3yr', 'profit_growth_5yr',
+    'fcf_3yr', 'fcf_5yr', 'fcf', 'peg',
+    'return_1yr', 'return_3yr', 'return_5yr',
+    'asset_turnover', 'cmp_sales', 'eps',
+    'eps_growth_3yr', 'eps_growth_5yr',
+    'debt_equity', 'opm', 'dividend_yield',
+    # New metrics
+    'npm', 'interest_coverage', 'current_ratio', 'pb_ratio', 'ev_ebitda',
+    'dividend_payout', 'fcf_yield_inverse', 'pledged_pct', 'promoter_holding'
+]
+METRIC_INDEX = {metric: i for i, metric in enumerate(NUMERIC_COLS)}
+
+# Metrics where lower is better (inverse scoring)
+INVERSE_METRICS = frozenset({
+    'debt_equity', 'pe_ratio', 'peg', 'cmp_sales', 'pb_ratio', 'ev_ebitda', 'fcf_yield_inverse', 'pledged_pct'
+})
+
+# Philosophy weights as one float32 matrix: a row per philosophy, columns aligned to METRIC_INDEX
+PHILOSOPHY_ROW = {philosophy_id: i for i, philosophy_id in enumerate(PHILOSOPHIES)}
+WEIGHT_MATRIX = np.zeros((len(PHILOSOPHIES), len(METRIC_INDEX)), dtype=np.float32)
+for _philosophy_id, _data in PHILOSOPHIES.items():
+    for _metric, _weight in _data['weights'].items():
+        WEIGHT_MATRIX[PHILOSOPHY_ROW[_philosophy_id], METRIC_INDEX[_metric]] = _weight
+
+
+# Map common column name variations (Screener.in format) to standard names
+COLUMN_MAPPING = {
+    'name': ['company', 'company_name', 'name'],
+    'cmp': ['cmp rs', 'cmp', 'current_price', 'price'],
+    'market_cap': ['mar cap rs.cr', 'market_cap', 'mcap', 'market cap'],
+    'pe_ratio': ['p/e', 'pe', 'pe_ratio', 'price_to_earnings'],
+    'roe': ['roe %', 'roe', 'return_on_equity', 'return on equity'],
+    'roce': ['roce %', 'roce', 'return_on_capital', 'return on capital employed'],
+    'sales_growth_3yr': ['sales var 3yrs', 'sales var 3yrs %', 'sales_growth_3yr', 'sales growth 3yrs %'],
+    'sales_growth_5yr': ['sales var 5yrs', 'sales var 5yrs %', 'sales_growth_5yr', 'sales growth 5yrs %', 'sales growth (5 yrs cagr)'],
+    'sales': ['sales rs.cr', 'sales', 'revenue'],
+    'pat': ['pat 12m rs.cr', 'pat', 'profit_after_tax', 'net_profit'],
+    'profit_growth_3yr': ['profit var 3yrs', 'profit var 3yrs %', 'profit_growth_3yr', 'pat growth 3yrs %'],
+    'profit_growth_5yr': ['profit var 5yrs', 'profit var 5yrs %', 'profit_growth_5yr', 'pat growth 5yrs %'],
+    'fcf_3yr': ['free cash flow 3yrs', 'fcf_3yr'],
+    'fcf_5yr': ['free cash flow 5yrs', 'fcf_5yr'],
+    'fcf': ['free cash flow rs.cr', 'free cash / eq', 'free cash eq', 'fcf', 'free_cash_flow'],
+    'peg': ['peg', 'peg_ratio'],
+    'return_1yr': ['1yr return', '1yr return %', 'return_1yr'],
+    'return_3yr': ['3yrs return', '3yrs return %', 'return_3yr'],
+    'return_5yr': ['5yrs return', '5yrs return %', 'return_5yr'],
+    'asset_turnover': ['asset turnover', 'asset_turnover'],
+    'cmp_sales': ['cmp / sales', 'cmp_sales', 'price_to_sales'],
+    'eps': ['eps 12m rs', 'eps', 'earnings_per_share'],
+    'eps_growth_3yr': ['eps var 3yrs', 'eps var 3yrs %', 'eps_growth_3yr'],
+    'eps_growth_5yr': ['eps var 5yrs', 'eps var 5yrs %', 'eps_growth_5yr'],
+    'debt_equity': ['debt / eq', 'debt/eq', 'debt_equity', 'debt_to_equity', 'd/e', 'debt/equity', 'debt eq'],
+    'opm': ['opm %', 'opm', 'operating_profit_margin', 'operating margin'],
+    'dividend_yield': ['div yld', 'div yld %', 'dividend_yield', 'dividend yield'],
+    # New format columns
+    'npm': ['npm ann %', 'net profit margin', 'npm %'],
+    'interest_coverage': ['int coverage', 'interest coverage', 'interest coverage ratio'],
+    'current_ratio': ['current ratio', 'current_ratio'],
+    'pb_ratio': ['cmp / bv', 'price to book', 'p/b', 'pb ratio', 'p/bv'],
+    'ev_ebitda': ['ev / ebitda', 'ev/ebitda', 'ev to ebitda'],
+    'dividend_payout': ['dividend payout %', 'payout ratio', 'dividend payout'],
+    'fcf_yield_inverse': ['cmp / fcf', 'price to fcf'],
+    'pledged_pct': ['pledged %', 'pledged shares %', 'pledged'],
+    'promoter_holding': ['prom. hold. %', 'promoter holding %', 'promoter holding']
+}
+
+# Inverted index of variations, longest first so the most specific variation wins
+# (e.g. 'eps var 3yrs %' maps to eps_growth_3yr rather than eps)
+VARIATION_TO_STANDARD = dict(sorted(
+    ((var, standard) for standard, variations in COLUMN_MAPPING.items() for var in variations),
+    key=lambda item: len(item[0]),
+    reverse=True
+))
+
 
 # Load Banking/NBFC mapping: any entry in this file is treated as financials
-FINANCIALS_SYMBOLS: set[str] = set()
-FINANCIALS_NAMES: set[str] = set()
+FINANCIALS_SYMBOLS: frozenset[str] = frozenset()
+FINANCIALS_NAMES: frozenset[str] = frozenset()
 try:
     _mapping_path = Path(__file__).parent.parent / "data" / "nbfc_bank.json"
     with open(_mapping_path, "r", encoding="utf-8") as _f:
         _mapping = json.load(_f)
         if isinstance(_mapping, dict):
-            FINANCIALS_NAMES = {str(k).strip().lower() for k in _mapping.keys()}
-            FINANCIALS_SYMBOLS = {str(v).strip().lower() for v in _mapping.values()}
+            FINANCIALS_NAMES = frozenset(str(k).strip().lower() for k in _mapping.keys())
+            FINANCIALS_SYMBOLS = frozenset(str(v).strip().lower() for v in _mapping.values())
 except Exception:
     # If mapping is not available, fall back to heuristics only
-    FINANCIALS_SYMBOLS = set()
-    FINANCIALS_NAMES = set()
+    FINANCIALS_SYMBOLS = frozenset()
+    FINANCIALS_NAMES = frozenset()
+
+# Arrow copies of the lookup sets so vectorized isin runs as a hashed C probe
+if ARROW_AVAILABLE:
+    _FIN_SYMBOLS_LOOKUP = pa.array(sorted(FINANCIALS_SYMBOLS), type=pa.string())
+    _FIN_NAMES_LOOKUP = pa.array(sorted(FINANCIALS_NAMES), type=pa.string())
+else:
+    _FIN_SYMBOLS_LOOKUP = FINANCIALS_SYMBOLS
+    _FIN_NAMES_LOOKUP = FINANCIALS_NAMES
+
+# Sector labels and company-name fragments that mark a company as financials
+FINANCIALS_SECTOR_KEYWORDS = ['bank', 'nbfc', 'finance', 'financial', 'insurance', 'hfc', 'housing finance', 'brokerage']
+FINANCIALS_NAME_KEYWORDS = [
+    ' bank', 'bank ', 'nbfc', 'finance', 'finserv', 'fin. ', 'fintech', 'lending', 'microfinance', 'nbfcs', 'housing finance', 'hfc', 'insurance', 'mfi'
+]
+# All name keywords matched in one pass (plain substrings, same as the keyword list)
+_FIN_NAME_RE = re.compile('|'.join(re.escape(kw) for kw in FINANCIALS_NAME_KEYWORDS))
 
 
 def is_financials(row: pd.Series) -> bool:
@@ -127,410 +243,549 @@ def is_financials(row: pd.Series) -> bool:
             sector = get_sector_from_name(row['name'])
             if isinstance(sector, str) and sector:
                 sector_low = sector.lower()
-                if any(k in sector_low for k in ['bank', 'nbfc', 'finance', 'financial', 'insurance', 'hfc', 'housing finance', 'brokerage']):
+                if any(k in sector_low for k in FINANCIALS_SECTOR_KEYWORDS):
                     return True
     except Exception:
         pass
 
     # Heuristic by company name
     name_val = str(row.get('name', '')).lower()
-    return any(
-        kw in name_val
-        for kw in [
-            ' bank', 'bank ', 'nbfc', 'finance', 'finserv', 'fin. ', 'fintech', 'lending', 'microfinance', 'nbfcs', 'housing finance', 'hfc', 'insurance', 'mfi'
-        ]
-    )
+    return bool(_FIN_NAME_RE.search(name_val))
 
 
-def normalize_score(value: float, min_val: float, max_val: float, inverse: bool = False) -> float:
-    """Normalize a value to 0-100 scale"""
-    if pd.isna(value) or max_val == min_val:
-        return 50.0
-    
-    if inverse:
-        # For metrics where lower is better (like debt/equity)
-        normalized = 100 - ((value - min_val) / (max_val - min_val) * 100)
-    else:
-        normalized = ((value - min_val) / (max_val - min_val) * 100)
-    
-    return max(0, min(100, normalized))
+def _isin_lookup(values: pd.Series, lookup) -> np.ndarray:
+    """Membership of normalized strings in a financials lookup (Arrow-backed when available)"""
+    if ARROW_AVAILABLE:
+        values = values.astype('string[pyarrow]')
+    return (values != '').to_numpy(dtype=bool) & values.isin(lookup).to_numpy(dtype=bool)
+
+
+def compute_financials_mask(df: pd.DataFrame) -> np.ndarray:
+    """Vectorized is_financials over the whole DataFrame; returns a boolean array.
+    String work runs once per distinct symbol/name and is broadcast back through factorize codes.
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    if 'symbol' in df.columns:
+        codes, symbols = pd.factorize(df['symbol'].astype(str))
+        mask |= _isin_lookup(pd.Series(symbols).str.strip().str.lower(), _FIN_SYMBOLS_LOOKUP)[codes]
+    if 'name' not in df.columns:
+        return mask
+
+    codes, unique_names = pd.factorize(df['name'].astype(str))
+    names = pd.Series(unique_names)
+    name_hits = _isin_lookup(names.str.strip().str.lower(), _FIN_NAMES_LOOKUP)
+
+    # Prefer sector utils when available
+    try:
+        if SECTOR_ENABLED:
+            for j, name in enumerate(unique_names):
+                sector = get_sector_from_name(name)
+                if isinstance(sector, str) and any(k in sector.lower() for k in FINANCIALS_SECTOR_KEYWORDS):
+                    name_hits[j] = True
+    except Exception:
+        pass
+
+    # Heuristic by company name
+    name_hits |= names.str.lower().str.contains(_FIN_NAME_RE, regex=True).to_numpy(dtype=bool)
+    return mask | name_hits[codes]
+
+
+def normalize_metrics(values: np.ndarray, inverse: np.ndarray) -> np.ndarray:
+    """Normalize each column of a metric matrix to 0-100 scale (NaN cells and constant columns score 50).
+    inverse flags columns where lower is better (like debt/equity).
+    """
+    min_vals = np.nanmin(values, axis=0)
+    max_vals = np.nanmax(values, axis=0)
+    spans = max_vals - min_vals
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = (values - min_vals) / spans * 100
+    normalized[:, inverse] = 100 - normalized[:, inverse]
+    
+    np.clip(normalized, 0, 100, out=normalized)
+    normalized[np.isnan(values) | (spans == 0)] = 50.0
+    return normalized
+
+
+# Raw metrics read by the quality, cash flow, valuation and risk-penalty rules
+SCORING_METRICS = [
+    'roe', 'roce', 'opm', 'pat', 'fcf', 'fcf_3yr', 'fcf_5yr', 'pe_ratio', 'peg', 'debt_equity',
+    'profit_growth_3yr', 'market_cap', 'cmp_sales', 'asset_turnover', 'return_1yr'
+]
+
+
+def _metric_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Read each scoring metric column once as a float array (None if the column is absent)"""
+    return {col: df[col].to_numpy(dtype=float) if col in df.columns else None for col in SCORING_METRICS}
 
 
-def assess_quality_score(row: pd.Series) -> float:
+def assess_quality_score(metrics: Dict[str, np.ndarray], n: int) -> np.ndarray:
     """
-    Assess overall quality of the company
-    Returns multiplier between 0.5 and 1.0
+    Assess overall quality of every company
+    Returns multipliers between 0.5 and 1.5
     
     🔴 CRITICAL: Added ROE multiplier based on deep analysis feedback
     """
-    quality_score = 1.0
-    red_flags = 0
-    yellow_flags = 0
+    roe = metrics['roe']
+    debt_equity = metrics['debt_equity']
+    fcf = metrics['fcf']
+    peg = metrics['peg']
+    red_flags = np.zeros(n, dtype=np.int8)
+    yellow_flags = np.zeros(n, dtype=np.int8)
     
     # Red flags (serious concerns)
-    if 'roe' in row and row['roe'] < 5:
-        red_flags += 1
-    
-    if 'debt_equity' in row and row['debt_equity'] > 2:
-        red_flags += 1
-    
-    if 'fcf' in row and row['fcf'] < -100:
-        red_flags += 1
+    if roe is not None:
+        red_flags += roe < 5
+    if debt_equity is not None:
+        red_flags += debt_equity > 2
+    if fcf is not None:
+        red_flags += fcf < -100
     
     # Yellow flags (moderate concerns)
-    if 'roe' in row and 5 <= row['roe'] < 12:
-        yellow_flags += 1
-    
-    if 'peg' in row and row['peg'] > 2:
-        yellow_flags += 1
-    
-    if 'debt_equity' in row and 1.0 < row['debt_equity'] <= 1.5:
-        yellow_flags += 1
+    if roe is not None:
+        yellow_flags += (roe >= 5) & (roe < 12)
+    if peg is not None:
+        yellow_flags += peg > 2
+    if debt_equity is not None:
+        yellow_flags += (debt_equity > 1.0) & (debt_equity <= 1.5)
     
-    # Calculate quality multiplier
-    quality_score -= (red_flags * 0.15)  # -15% per red flag
-    quality_score -= (yellow_flags * 0.05)  # -5% per yellow flag
+    # Calculate quality multiplier: -15% per red flag, -5% per yellow flag
+    quality_score = 1.0 - red_flags * 0.15 - yellow_flags * 0.05
     
     # 🔴 CRITICAL FIX: Add ROE multiplier (Issue #1 & #2 from analysis)
     # Formula: Adjusted_Score = Base_Score × (1 + max(0, (ROE - 10) / 40))
-    if 'roe' in row and row['roe'] > 10:
-        roe_bonus = (row['roe'] - 10) / 40
-        quality_score *= (1 + min(roe_bonus, 0.6))  # Cap bonus at +60%
+    if roe is not None:
+        roe_bonus = np.minimum((roe - 10) / 40, 0.6)  # Cap bonus at +60%
+        quality_score = np.where(roe > 10, quality_score * (1 + roe_bonus), quality_score)
     
-    return max(0.5, min(1.5, quality_score))  # Allow up to 1.5x for exceptional ROE
+    return np.clip(quality_score, 0.5, 1.5)  # Allow up to 1.5x for exceptional ROE
 
 
-def calculate_risk_penalties(row: pd.Series, fcf_dq_mode: str = 'financials_only_off') -> Dict[str, float]:
-    """
-    Calculate specific risk penalties for transparency
-    Returns dict of penalty reasons and amounts
-    """
-    penalties = {}
-    
-    is_fin = is_financials(row)
-
-    # 🔴 CRITICAL: Negative Free Cash Flow Penalty (increased from -30% to -40%)
-    # Finance/NBFCs often show negative accounting FCF; soften/skip for them
-    if 'fcf' in row and row['fcf'] < 0:
-        if not is_fin:
-            penalties['negative_fcf'] = 0.40  # -40%
-        else:
-            penalties['negative_fcf'] = 0.10  # Softer for financials
-    
-    # Extreme P/E Penalty
-    if 'pe_ratio' in row:
-        if row['pe_ratio'] > 100:
-            penalties['extreme_pe'] = 0.25  # -25%
-        elif row['pe_ratio'] > 50:
-            penalties['high_pe'] = 0.15  # -15%
-    
-    # High Debt Penalty
-    if 'debt_equity' in row:
-        if not is_fin:
-            if row['debt_equity'] > 1.5:
-                penalties['high_debt'] = 0.20  # -20%
-            elif row['debt_equity'] > 1.0:
-                penalties['moderate_debt'] = 0.10  # -10%
-        else:
-            # Leverage is part of the model for financials; use more lenient thresholds
-            if row['debt_equity'] > 5.0:
-                penalties['high_debt'] = 0.15
-            elif row['debt_equity'] > 3.0:
-                penalties['moderate_debt'] = 0.05
-    
-    # 🔴 CRITICAL: Poor Profitability Penalty (strengthened based on expert feedback)
-    if 'roe' in row:
-        if row['roe'] < 8:
-            penalties['very_low_roe'] = 0.30  # -30% for ROE < 8%
-        elif row['roe'] < 10:
-            penalties['low_roe'] = 0.20  # -20% for ROE < 10% (increased from -15%)
-        elif row['roe'] < 12:
-            penalties['moderate_roe'] = 0.10  # -10% for ROE < 12% (NEW)
-    
-    # 🔴 NEW: ROCE Penalty (Expert Feedback - ranks 8-10 have low ROCE)
-    if 'roce' in row:
-        if row['roce'] < 12:
-            penalties['low_roce'] = 0.10  # -10% for ROCE < 12%
-        elif row['roce'] < 15:
-            penalties['moderate_roce'] = 0.05  # -5% for ROCE < 15%
-    
-    # High PEG Penalty (overvalued growth)
-    if 'peg' in row and row['peg'] > 2:
-        penalties['high_peg'] = 0.10  # -10%
-    
-    # 🔴 CRITICAL FIX: Low ROE + High FCF Penalty (Issue #2 - PTC India)
-    # Don't let massive FCF override poor profitability
-    if 'roe' in row and 'fcf' in row and 'profit_growth_3yr' in row:
-        if row['roe'] < 8 and row['profit_growth_3yr'] < 0:
-            # Exception: Fortress balance sheet (FCF > 1000 Cr AND D/E < 0.3)
-            if row['fcf'] > 1000 and row.get('debt_equity', 1.0) < 0.3:
-                penalties['low_roe_high_fcf'] = 0.20  # -20% (reduced penalty)
-            else:
-                penalties['low_roe_negative_growth'] = 0.50  # -50% (severe penalty)
-    
-    # 🔴 NEW: Low FCF Relative to Market Cap (Manager Feedback)
-    # For financials, skip this penalty (FCF less meaningful)
-    if 'fcf' in row and 'market_cap' in row:
-        if not is_fin and 0 < row['fcf'] < 100 and row['market_cap'] > 1000:
-            penalties['low_fcf_relative'] = 0.10  # -10%
-    
-    # 🔴 NEW: Moderate P/E Warning (Manager Feedback)
-    # Flag moderately high P/E without disqualifying
-    if 'pe_ratio' in row:
-        if 25 < row['pe_ratio'] <= 50:
-            penalties['moderate_pe'] = 0.05  # -5%
-    
-    # 🔴 NEW: Compound Penalty for Multiple Red Flags (Expert Feedback)
-    # Companies with multiple issues should be heavily penalized
-    red_flags = []
-    
-    if row.get('roe', 100) < 10:
-        red_flags.append('low_roe')
-    
-    if row.get('profit_growth_3yr', 100) < 0:
-        red_flags.append('negative_growth')
-    
-    if not is_fin and row.get('fcf', 1000) < 100 and row.get('market_cap', 0) > 1000:
-        red_flags.append('low_fcf')
-    
-    if row.get('debt_equity', 0) > 1.0:
-        red_flags.append('high_debt')
-    
-    # Apply compound penalty if 2+ red flags
-    if len(red_flags) >= 2:
-        penalties['multiple_red_flags'] = 0.10 * len(red_flags)  # -10% per flag
-    
-    # Extreme Volatility Penalty
-    if 'return_1yr' in row and abs(row['return_1yr']) > 1000:
-        penalties['extreme_volatility'] = 0.20  # -20%
-    elif 'return_1yr' in row and abs(row['return_1yr']) > 500:
-        penalties['high_volatility'] = 0.10  # -10%
-    
-    return penalties
+# Values assumed for missing metrics in the compound red-flag check (none of them raise a flag)
+RED_FLAG_DEFAULTS = {'roe': 100, 'profit_growth_3yr': 100, 'fcf': 1000, 'market_cap': 0, 'debt_equity': 0}
 
 
-def should_disqualify(row: pd.Series, fcf_dq_mode: str = 'financials_only_off') -> tuple[bool, str]:
+def should_disqualify(df: pd.DataFrame, fcf_dq_mode: str = 'financials_only_off') -> tuple[np.ndarray, np.ndarray]:
     """
-    Check if company should be disqualified from rankings
-    Returns (should_disqualify, reason)
+    Check which companies should be disqualified from rankings
+    Returns (boolean mask, reason per company); the first matching rule supplies the reason
     
     🔴 CRITICAL DISQUALIFICATION RULES - Based on feedback
     """
+    n = len(df)
+    metrics = _metric_arrays(df)
+    fcf = metrics['fcf']
+    pe = metrics['pe_ratio']
+    roe = metrics['roe']
+    debt_equity = metrics['debt_equity']
+    market_cap = metrics['market_cap']
+    return_1yr = metrics['return_1yr']
+    no_rows = np.zeros(n, dtype=bool)
+    
     # Sector-aware disqualifications
-    is_fin = is_financials(row)
+    is_fin = df['_is_fin'].to_numpy(dtype=bool) if '_is_fin' in df.columns else compute_financials_mask(df)
     apply_fcf_dq_for_fin = (fcf_dq_mode == 'global_on')
     apply_fcf_dq_for_nonfin = (fcf_dq_mode in ('financials_only_off', 'global_on'))
-
+    fcf_dq_applies = np.where(is_fin, apply_fcf_dq_for_fin, apply_fcf_dq_for_nonfin)
+    
+    # Rules in priority order: (condition, reason formatter for row i)
+    rules = []
+    
     # Massive negative FCF
-    if 'fcf' in row and row['fcf'] < -500:
-        if (is_fin and apply_fcf_dq_for_fin) or (not is_fin and apply_fcf_dq_for_nonfin):
-            return True, f"Massive cash burn: FCF {row['fcf']:.0f} Cr (unsustainable)"
+    if fcf is not None:
+        rules.append((fcf_dq_applies & (fcf < -500),
+                      lambda i: f"Massive cash burn: FCF {fcf[i]:.0f} Cr (unsustainable)"))
     
     # 🔴 CRITICAL: P/E > 100 for top 20 rankings (speculative)
-    if 'pe_ratio' in row and row['pe_ratio'] > 100:
-        return True, f"Extreme P/E ratio: {row['pe_ratio']:.1f} (speculative valuation)"
-    
-    # Disqualify if P/E is absurdly high (likely data error)
-    if 'pe_ratio' in row and row['pe_ratio'] > 500:
-        return True, f"Absurd P/E ratio: {row['pe_ratio']:.1f} (likely data error)"
+    # (the absurd P/E > 500 data-error rule is always caught here first)
+    if pe is not None:
+        rules.append((pe > 100, lambda i: f"Extreme P/E ratio: {pe[i]:.1f} (speculative valuation)"))
     
     # Negative FCF + High debt
-    if 'fcf' in row and 'debt_equity' in row:
-        if row['fcf'] < -100 and row['debt_equity'] > 2.0:
-            if (is_fin and apply_fcf_dq_for_fin) or (not is_fin and apply_fcf_dq_for_nonfin):
-                return True, "Negative FCF with very high debt (bankruptcy risk)"
+    if fcf is not None and debt_equity is not None:
+        rules.append((fcf_dq_applies & (fcf < -100) & (debt_equity > 2.0),
+                      lambda i: "Negative FCF with very high debt (bankruptcy risk)"))
     
     # Disqualify if ROE is negative (losing money)
-    if 'roe' in row and row['roe'] < 0:
-        return True, f"Negative ROE: {row['roe']:.1f}% (unprofitable)"
+    if roe is not None:
+        rules.append((roe < 0, lambda i: f"Negative ROE: {roe[i]:.1f}% (unprofitable)"))
     
     # Minimal FCF with high market cap
-    if 'fcf' in row and 'market_cap' in row:
-        if 0 < row['fcf'] < 10 and row['market_cap'] > 1000:
-            fcf_yield = (row['fcf'] / row['market_cap']) * 100
-            if fcf_yield < 0.5:
-                if (is_fin and apply_fcf_dq_for_fin) or (not is_fin and apply_fcf_dq_for_nonfin):
-                    return True, f"Minimal FCF (₹{row['fcf']:.1f} Cr) for ₹{row['market_cap']:.0f} Cr market cap (speculative)"
+    if fcf is not None and market_cap is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fcf_yield = (fcf / market_cap) * 100
+        rules.append((fcf_dq_applies & (fcf > 0) & (fcf < 10) & (market_cap > 1000) & (fcf_yield < 0.5),
+                      lambda i: f"Minimal FCF (₹{fcf[i]:.1f} Cr) for ₹{market_cap[i]:.0f} Cr market cap (speculative)"))
     
     # Disqualify if extreme volatility with negative fundamentals
-    if 'return_1yr' in row and 'fcf' in row and 'roe' in row:
-        if abs(row['return_1yr']) > 2000 and row['fcf'] < 0 and row['roe'] < 15:
-            return True, "Extreme volatility with poor fundamentals (speculative)"
+    if return_1yr is not None and fcf is not None and roe is not None:
+        rules.append(((np.abs(return_1yr) > 2000) & (fcf < 0) & (roe < 15),
+                      lambda i: "Extreme volatility with poor fundamentals (speculative)"))
+    
+    conditions = [cond for cond, _ in rules]
+    mask = np.logical_or.reduce(conditions) if conditions else no_rows
+    first_rule = np.select(conditions, np.arange(len(conditions)), default=-1) if conditions else np.full(n, -1)
     
-    return False, ""
+    # Reasons are only formatted for disqualified rows
+    reasons = np.full(n, '', dtype=object)
+    for i in np.flatnonzero(mask):
+        reasons[i] = rules[first_rule[i]][1](i)
+    
+    return mask, reasons
 
 
-def assess_cash_flow_quality(row: pd.Series) -> float:
+def assess_cash_flow_quality(metrics: Dict[str, np.ndarray], n: int) -> np.ndarray:
     """
-    Assess cash flow quality and sustainability
-    Returns a multiplier (0.7 to 1.2) - can boost or penalize score
+    Assess cash flow quality and sustainability for every company
+    Returns multipliers (0.7 to 1.2) - can boost or penalize score
     """
-    quality = 1.0
-    
-    # Positive FCF is baseline
-    if 'fcf' in row and row['fcf'] > 0:
-        quality += 0.05
+    quality = np.ones(n)
+    fcf = metrics['fcf']
+    pat = metrics['pat']
+    fcf_3yr = metrics['fcf_3yr']
+    fcf_5yr = metrics['fcf_5yr']
+    asset_turnover = metrics['asset_turnover']
+    
+    if fcf is not None:
+        # Positive FCF is baseline; negative FCF is already penalized in risk penalties
+        positive = fcf > 0
+        quality += np.where(positive, 0.05, -0.10)
         
         # Strong FCF relative to profit (FCF/PAT ratio)
-        if 'pat' in row and row['pat'] > 0:
-            fcf_to_profit = row['fcf'] / row['pat']
-            if fcf_to_profit > 0.8:  # Converting >80% of profit to cash
-                quality += 0.10
-            elif fcf_to_profit > 0.5:
-                quality += 0.05
+        if pat is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fcf_to_profit = fcf / pat
+            has_profit = positive & (pat > 0)
+            quality += np.select(
+                [has_profit & (fcf_to_profit > 0.8), has_profit & (fcf_to_profit > 0.5)],
+                [0.10, 0.05],  # Converting >80% / >50% of profit to cash
+                default=0.0
+            )
         
         # Consistent FCF over time
-        if 'fcf_3yr' in row and 'fcf_5yr' in row:
-            if row['fcf_3yr'] > 0 and row['fcf_5yr'] > 0:
-                quality += 0.05  # Consistent positive FCF
+        if fcf_3yr is not None and fcf_5yr is not None:
+            quality += np.where(positive & (fcf_3yr > 0) & (fcf_5yr > 0), 0.05, 0.0)
     else:
-        # Negative FCF is already penalized in risk penalties
         quality -= 0.10
     
     # Asset efficiency (Asset Turnover)
-    if 'asset_turnover' in row and row['asset_turnover'] > 1.0:
-        quality += 0.05
+    if asset_turnover is not None:
+        quality += np.where(asset_turnover > 1.0, 0.05, 0.0)
     
-    return max(0.7, min(1.2, quality))
+    return np.clip(quality, 0.7, 1.2)
 
 
-def assess_valuation_reasonableness(row: pd.Series) -> Dict[str, any]:
+def assess_valuation_reasonableness(metrics: Dict[str, np.ndarray], n: int) -> Dict[str, any]:
     """
     Assess if valuation is reasonable given fundamentals
-    Returns dict with reasonableness score and warnings
+    Returns dict with per-company reasonableness scores and warning lists
     """
-    score = 1.0
-    warnings = []
+    score = np.ones(n)
+    warning_masks = []
+    pe = metrics['pe_ratio']
+    growth = metrics['profit_growth_3yr']
+    roe = metrics['roe']
+    fcf = metrics['fcf']
+    market_cap = metrics['market_cap']
+    cmp_sales = metrics['cmp_sales']
+    opm = metrics['opm']
     
     # P/E vs Growth check (PEG logic)
-    if 'pe_ratio' in row and 'profit_growth_3yr' in row:
-        if row['profit_growth_3yr'] > 0:
-            implied_peg = row['pe_ratio'] / row['profit_growth_3yr']
-            
-            if implied_peg < 0.5:
-                score += 0.15  # Undervalued growth
-            elif implied_peg < 1.0:
-                score += 0.10  # Fair value growth
-            elif implied_peg > 3.0:
-                score -= 0.20
-                warnings.append('High valuation vs growth (PEG > 3)')
-            elif implied_peg > 2.0:
-                score -= 0.10
-                warnings.append('Elevated valuation vs growth (PEG > 2)')
+    if pe is not None and growth is not None:
+        growing = growth > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            implied_peg = pe / growth
+        conditions = [
+            growing & (implied_peg < 0.5),  # Undervalued growth
+            growing & (implied_peg < 1.0),  # Fair value growth
+            growing & (implied_peg > 3.0),
+            growing & (implied_peg > 2.0),
+        ]
+        score += np.select(conditions, [0.15, 0.10, -0.20, -0.10], default=0.0)
+        warning_masks.append(('High valuation vs growth (PEG > 3)', conditions[2]))
+        warning_masks.append(('Elevated valuation vs growth (PEG > 2)', conditions[3] & ~conditions[2]))
     
     # P/E vs ROE check (Quality premium justified?)
-    if 'pe_ratio' in row and 'roe' in row:
-        if row['roe'] > 25 and row['pe_ratio'] < 30:
-            score += 0.10  # High quality at reasonable price
-        elif row['roe'] < 15 and row['pe_ratio'] > 25:
-            score -= 0.15
-            warnings.append('High P/E without strong ROE')
+    if pe is not None and roe is not None:
+        quality_at_price = (roe > 25) & (pe < 30)  # High quality at reasonable price
+        expensive = ~quality_at_price & (roe < 15) & (pe > 25)
+        score += np.select([quality_at_price, expensive], [0.10, -0.15], default=0.0)
+        warning_masks.append(('High P/E without strong ROE', expensive))
     
     # FCF yield check (FCF / Market Cap)
-    if 'fcf' in row and 'market_cap' in row and row['market_cap'] > 0:
-        fcf_yield = (row['fcf'] / row['market_cap']) * 100
-        if fcf_yield > 8:
-            score += 0.10  # Strong FCF yield
-        elif fcf_yield > 5:
-            score += 0.05
-        elif fcf_yield < 0:
-            score -= 0.15
-            warnings.append('Negative FCF yield')
-    
-    # Price/Sales reasonableness
-    if 'cmp_sales' in row and 'opm' in row:
-        # High P/S should be justified by high margins
-        if row['cmp_sales'] > 10 and row['opm'] < 15:
-            score -= 0.10
-            warnings.append('High Price/Sales without strong margins')
+    if fcf is not None and market_cap is not None:
+        has_cap = market_cap > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fcf_yield = (fcf / market_cap) * 100
+        conditions = [has_cap & (fcf_yield > 8), has_cap & (fcf_yield > 5), has_cap & (fcf_yield < 0)]
+        score += np.select(conditions, [0.10, 0.05, -0.15], default=0.0)
+        warning_masks.append(('Negative FCF yield', conditions[2]))
+    
+    # Price/Sales reasonableness: high P/S should be justified by high margins
+    if cmp_sales is not None and opm is not None:
+        rich_sales = (cmp_sales > 10) & (opm < 15)
+        score += np.where(rich_sales, -0.10, 0.0)
+        warning_masks.append(('High Price/Sales without strong margins', rich_sales))
+    
+    warnings = [[] for _ in range(n)]
+    for message, mask in warning_masks:
+        for i in np.flatnonzero(mask):
+            warnings[i].append(message)
     
     return {
-        'score': max(0.6, min(1.3, score)),
+        'score': np.clip(score, 0.6, 1.3),
         'warnings': warnings
     }
 
 
-def calculate_composite_score(row: pd.Series, weights: Dict[str, float], normalized_df: pd.DataFrame, fcf_dq_mode: str = 'financials_only_off') -> float:
-    """Calculate weighted composite score with quality adjustments"""
-    score = 0.0
+def calculate_risk_penalties(metrics: Dict[str, np.ndarray], n: int, is_fin: np.ndarray, fcf_dq_mode: str = 'financials_only_off') -> Dict[str, np.ndarray]:
+    """
+    Calculate specific risk penalties for transparency
+    Returns penalty reason -> penalty amount per company (0 where it does not apply), in display order
+    """
+    penalties = {}
+    not_fin = ~is_fin
+    roe = metrics['roe']
+    fcf = metrics['fcf']
+    pe = metrics['pe_ratio']
+    debt_equity = metrics['debt_equity']
+    roce = metrics['roce']
+    peg = metrics['peg']
+    growth = metrics['profit_growth_3yr']
+    market_cap = metrics['market_cap']
+    return_1yr = metrics['return_1yr']
     
-    for metric, weight in weights.items():
-        if metric in normalized_df.columns:
-            score += normalized_df.loc[row.name, metric] * weight
+    # 🔴 CRITICAL: Negative Free Cash Flow Penalty (increased from -30% to -40%)
+    # Finance/NBFCs often show negative accounting FCF; soften/skip for them
+    if fcf is not None:
+        penalties['negative_fcf'] = np.where(fcf < 0, np.where(is_fin, 0.10, 0.40), 0.0)
     
-    # Apply quality multiplier
-    quality_multiplier = assess_quality_score(row)
-    score *= quality_multiplier
+    # Extreme P/E Penalty
+    if pe is not None:
+        penalties['extreme_pe'] = np.where(pe > 100, 0.25, 0.0)  # -25%
+        penalties['high_pe'] = np.where((pe <= 100) & (pe > 50), 0.15, 0.0)  # -15%
     
-    # Apply cash flow quality assessment
-    cf_quality = assess_cash_flow_quality(row)
-    score *= cf_quality
+    # High Debt Penalty
+    # Leverage is part of the model for financials; use more lenient thresholds
+    if debt_equity is not None:
+        penalties['high_debt'] = np.where(
+            is_fin,
+            np.where(debt_equity > 5.0, 0.15, 0.0),
+            np.where(debt_equity > 1.5, 0.20, 0.0)  # -20%
+        )
+        penalties['moderate_debt'] = np.where(
+            is_fin,
+            np.where((debt_equity <= 5.0) & (debt_equity > 3.0), 0.05, 0.0),
+            np.where((debt_equity <= 1.5) & (debt_equity > 1.0), 0.10, 0.0)  # -10%
+        )
     
-    # Apply valuation reasonableness assessment
-    valuation_assessment = assess_valuation_reasonableness(row)
-    score *= valuation_assessment['score']
+    # 🔴 CRITICAL: Poor Profitability Penalty (strengthened based on expert feedback)
+    if roe is not None:
+        penalties['very_low_roe'] = np.where(roe < 8, 0.30, 0.0)  # -30% for ROE < 8%
+        penalties['low_roe'] = np.where((roe >= 8) & (roe < 10), 0.20, 0.0)  # -20% for ROE < 10%
+        penalties['moderate_roe'] = np.where((roe >= 10) & (roe < 12), 0.10, 0.0)  # -10% for ROE < 12%
     
-    # Apply specific risk penalties
-    penalties = calculate_risk_penalties(row, fcf_dq_mode)
-    total_penalty = sum(penalties.values())
-    score *= (1 - min(total_penalty, 0.6))  # Cap total penalty at 60%
+    # 🔴 NEW: ROCE Penalty (Expert Feedback - ranks 8-10 have low ROCE)
+    if roce is not None:
+        penalties['low_roce'] = np.where(roce < 12, 0.10, 0.0)  # -10% for ROCE < 12%
+        penalties['moderate_roce'] = np.where((roce >= 12) & (roce < 15), 0.05, 0.0)  # -5% for ROCE < 15%
     
-    return round(score, 1)
-
-
-def get_key_drivers(row: pd.Series, top_n: int = 5) -> list:
-    """Identify key performance drivers"""
-    drivers = []
+    # High PEG Penalty (overvalued growth)
+    if peg is not None:
+        penalties['high_peg'] = np.where(peg > 2, 0.10, 0.0)  # -10%
     
-    # Profitability metrics
-    if 'roe' in row and row['roe'] > 20:
-        drivers.append(f"ROE {row['roe']:.1f}%")
+    # 🔴 CRITICAL FIX: Low ROE + High FCF Penalty (Issue #2 - PTC India)
+    # Don't let massive FCF override poor profitability
+    # Exception: Fortress balance sheet (FCF > 1000 Cr AND D/E < 0.3)
+    if roe is not None and fcf is not None and growth is not None:
+        weak = (roe < 8) & (growth < 0)
+        fortress = (fcf > 1000) & (debt_equity < 0.3) if debt_equity is not None else np.zeros(n, dtype=bool)
+        penalties['low_roe_high_fcf'] = np.where(weak & fortress, 0.20, 0.0)  # -20% (reduced penalty)
+        penalties['low_roe_negative_growth'] = np.where(weak & ~fortress, 0.50, 0.0)  # -50% (severe penalty)
     
-    if 'roce' in row and row['roce'] > 20:
-        drivers.append(f"ROCE {row['roce']:.1f}%")
+    # 🔴 NEW: Low FCF Relative to Market Cap (Manager Feedback)
+    # For financials, skip this penalty (FCF less meaningful)
+    if fcf is not None and market_cap is not None:
+        penalties['low_fcf_relative'] = np.where(not_fin & (fcf > 0) & (fcf < 100) & (market_cap > 1000), 0.10, 0.0)
     
-    if 'opm' in row and row['opm'] > 15:
-        drivers.append(f"OPM {row['opm']:.1f}%")
+    # 🔴 NEW: Moderate P/E Warning (Manager Feedback)
+    # Flag moderately high P/E without disqualifying
+    if pe is not None:
+        penalties['moderate_pe'] = np.where((pe > 25) & (pe <= 50), 0.05, 0.0)  # -5%
     
-    # Growth metrics
-    if 'profit_growth_3yr' in row and row['profit_growth_3yr'] > 20:
-        drivers.append(f"Profit Growth {row['profit_growth_3yr']:.0f}%")
+    # 🔴 NEW: Compound Penalty for Multiple Red Flags (Expert Feedback)
+    # Companies with multiple issues should be heavily penalized; policy defaults fill absent metrics
+    filled = {
+        col: np.full(n, float(default)) if metrics[col] is None else np.where(np.isnan(metrics[col]), default, metrics[col])
+        for col, default in RED_FLAG_DEFAULTS.items()
+    }
+    red_flags = (
+        (filled['roe'] < 10).astype(np.int8)
+        + (filled['profit_growth_3yr'] < 0)
+        + (not_fin & (filled['fcf'] < 100) & (filled['market_cap'] > 1000))
+        + (filled['debt_equity'] > 1.0)
+    )
+    # Apply compound penalty if 2+ red flags
+    penalties['multiple_red_flags'] = np.where(red_flags >= 2, 0.10 * red_flags, 0.0)  # -10% per flag
     
-    if 'sales_growth_5yr' in row and row['sales_growth_5yr'] > 15:
-        drivers.append(f"Sales Growth {row['sales_growth_5yr']:.0f}%")
+    # Extreme Volatility Penalty
+    if return_1yr is not None:
+        penalties['extreme_volatility'] = np.where(np.abs(return_1yr) > 1000, 0.20, 0.0)  # -20%
+        penalties['high_volatility'] = np.where((np.abs(return_1yr) <= 1000) & (np.abs(return_1yr) > 500), 0.10, 0.0)  # -10%
     
-    if 'eps_growth_3yr' in row and row['eps_growth_3yr'] > 20:
-        drivers.append(f"EPS Growth {row['eps_growth_3yr']:.0f}%")
+    return penalties
+
+
+def risk_warning_codes(penalties: Dict[str, np.ndarray], positions: np.ndarray) -> list:
+    """Penalty reasons that apply to each company at the given positions"""
+    codes = list(penalties)
+    if not codes:
+        return [[] for _ in positions]
+    applies = np.column_stack([penalties[code][positions] for code in codes]) > 0
+    return [[codes[k] for k in np.flatnonzero(row)] for row in applies]
+
+
+def calculate_score_multipliers(df: pd.DataFrame, is_fin: np.ndarray, fcf_dq_mode: str = 'financials_only_off') -> Dict[str, any]:
+    """Quality, cash flow, valuation and risk-penalty assessments per company plus their combined multiplier.
+    Every metric column is read once and shared by all four rule sets.
+    """
+    metrics = _metric_arrays(df)
+    n = len(df)
+    quality = assess_quality_score(metrics, n)
+    cash_flow = assess_cash_flow_quality(metrics, n)
+    valuation = assess_valuation_reasonableness(metrics, n)
+    penalties = calculate_risk_penalties(metrics, n, is_fin, fcf_dq_mode)
+    total_penalty = np.zeros(n)
+    for amounts in penalties.values():
+        total_penalty += amounts
+    return {
+        'quality': quality,
+        'cash_flow': cash_flow,
+        'valuation': valuation['score'],
+        'valuation_warnings': valuation['warnings'],
+        'penalties': penalties,
+        'penalty': total_penalty,
+        'multiplier': quality * cash_flow * valuation['score'] * (1 - np.minimum(total_penalty, 0.6))  # Cap total penalty at 60%
+    }
+
+
+def calculate_composite_scores(philosophies: list, metric_matrix: np.ndarray, multiplier: np.ndarray) -> np.ndarray:
+    """Calculate weighted composite scores with quality adjustments for several philosophies at once.
+    metric_matrix holds normalized metrics with columns ordered by METRIC_INDEX (absent metrics as 0).
+    Returns an N x len(philosophies) matrix, one column per philosophy.
+    The product runs in float32 against the precomputed WEIGHT_MATRIX; results come back as float64.
+    All threshold rules are folded into multiplier beforehand, so scoring itself stays a plain matrix product.
+    """
+    weight_matrix = WEIGHT_MATRIX[[PHILOSOPHY_ROW[p] for p in philosophies]]
+    scores = (metric_matrix @ weight_matrix.T).astype(float)
     
+    # Multipliers do not depend on the philosophy, so they are applied once to every column
+    return np.round(scores * multiplier[:, None], 1)
+
+
+def _avg_present(items: list) -> np.ndarray:
+    """Row-wise mean over the (values, present) pairs that are present; 50 where none are"""
+    total = 0.0
+    count = 0
+    for values, present in items:
+        total = total + np.where(present, values, 0.0)
+        count = count + present.astype(int)
+    return np.where(count > 0, total / np.maximum(count, 1), 50.0)
+
+
+def calculate_v2_subscores(norm: Dict[str, np.ndarray], is_fin: np.ndarray) -> Dict[str, np.ndarray]:
+    """Quality, growth, valuation and cash flow V2 sub-scores from normalized metric columns.
+    norm maps metric name to its normalized values for the scored rows; absent metrics are skipped.
+    """
+    n = len(is_fin)
+    everywhere = np.ones(n, dtype=bool)
+
+    def _item(col: str) -> list:
+        return [(norm[col], everywhere)] if col in norm else []
+
+    def _prefer_5yr(col5: str, col3: str) -> list:
+        # A missing or zero 5yr score falls back to the 3yr score
+        if col5 not in norm:
+            return _item(col3)
+        v5 = norm[col5]
+        if col3 not in norm:
+            return [(v5, v5 != 0)]
+        return [(np.where(v5 != 0, v5, norm[col3]), everywhere)]
+
+    quality_core = _item('roe') + _item('roce')
+    quality = np.where(is_fin, _avg_present(quality_core), _avg_present(quality_core + _item('opm')))
+    growth = _avg_present(
+        _prefer_5yr('sales_growth_5yr', 'sales_growth_3yr') +
+        _prefer_5yr('profit_growth_5yr', 'profit_growth_3yr') +
+        _prefer_5yr('eps_growth_5yr', 'eps_growth_3yr')
+    )
+    valuation = _avg_present(
+        _item('pe_ratio') + _item('peg') + _item('pb_ratio') + _item('ev_ebitda') + _item('cmp_sales')
+    )
+    if 'fcf_3yr' in norm and 'fcf_5yr' in norm:
+        cashflow = np.clip(50.0 + (norm['fcf_5yr'] - norm['fcf_3yr']) / 2.0, 0.0, 100.0)
+    elif 'fcf' in norm:
+        cashflow = norm['fcf']
+    else:
+        cashflow = np.full(n, 50.0)
+    # Financials carry no meaningful FCF, so their cash flow sub-score is neutral
+    cashflow = np.where(is_fin, 50.0, cashflow)
+
+    return {
+        'quality': quality,
+        'growth': growth,
+        'valuation': valuation,
+        'cashflow': cashflow,
+    }
+
+
+# Key driver rules in display order: (column, threshold test, label formatter)
+KEY_DRIVER_RULES = [
+    # Profitability metrics
+    ('roe', lambda v: v > 20, lambda v: f"ROE {v:.1f}%"),
+    ('roce', lambda v: v > 20, lambda v: f"ROCE {v:.1f}%"),
+    ('opm', lambda v: v > 15, lambda v: f"OPM {v:.1f}%"),
+    # Growth metrics
+    ('profit_growth_3yr', lambda v: v > 20, lambda v: f"Profit Growth {v:.0f}%"),
+    ('sales_growth_5yr', lambda v: v > 15, lambda v: f"Sales Growth {v:.0f}%"),
+    ('eps_growth_3yr', lambda v: v > 20, lambda v: f"EPS Growth {v:.0f}%"),
     # Financial health
-    if 'debt_equity' in row and row['debt_equity'] < 0.5:
-        drivers.append(f"Low D/E {row['debt_equity']:.2f}")
-    
-    if 'fcf' in row and row['fcf'] > 0:
-        drivers.append("Positive FCF")
-    
+    ('debt_equity', lambda v: v < 0.5, lambda v: f"Low D/E {v:.2f}"),
+    ('fcf', lambda v: v > 0, lambda v: "Positive FCF"),
     # Valuation
-    if 'pe_ratio' in row and 0 < row['pe_ratio'] < 15:
-        drivers.append(f"Attractive P/E {row['pe_ratio']:.1f}")
-    
-    if 'peg' in row and 0 < row['peg'] < 1:
-        drivers.append(f"Low PEG {row['peg']:.2f}")
-    
-    if 'dividend_yield' in row and row['dividend_yield'] > 2:
-        drivers.append(f"Div Yield {row['dividend_yield']:.1f}%")
-    
-    return drivers[:top_n]
+    ('pe_ratio', lambda v: (v > 0) & (v < 15), lambda v: f"Attractive P/E {v:.1f}"),
+    ('peg', lambda v: (v > 0) & (v < 1), lambda v: f"Low PEG {v:.2f}"),
+    ('dividend_yield', lambda v: v > 2, lambda v: f"Div Yield {v:.1f}%"),
+]
 
 
-def generate_ranking_reason(row: pd.Series, philosophy: str, rank: int) -> str:
-    """Generate explanation for why company is ranked at this position"""
+def get_key_drivers(df: pd.DataFrame, top_n: int = 5) -> list:
+    """Identify key performance drivers for every company.
+    Threshold tests run column-wise; only the first top_n hits per row are formatted.
+    """
+    rules = [
+        (df[col].to_numpy(dtype=float), test, label)
+        for col, test, label in KEY_DRIVER_RULES
+        if col in df.columns
+    ]
+    if not rules:
+        return [[] for _ in range(len(df))]
+    
+    hits = np.column_stack([test(values) for values, test, _ in rules])
+    return [
+        [rules[j][2](rules[j][0][i]) for j in np.flatnonzero(row_hits)[:top_n]]
+        for i, row_hits in enumerate(hits)
+    ]
+
+
+def generate_ranking_reason(row: Dict[str, float], philosophy: str, rank: int) -> str:
+    """Generate explanation for why company is ranked at this position.
+    row only needs the philosophy's top weighted metrics (a dict or a DataFrame row).
+    """
     reasons = []
     phil = PHILOSOPHIES[philosophy]
     
-    # Get top weighted metrics for this philosophy
-    top_metrics = sorted(phil['weights'].items(), key=lambda x: x[1], reverse=True)[:3]
-    
-    for metric, weight in top_metrics:
+    # Top weighted metrics for this philosophy (precomputed at import)
+    for metric, weight in PHILOSOPHY_TOP3[philosophy]:
         if metric in row and not pd.isna(row[metric]):
             value = row[metric]
             if metric == 'roe':
@@ -563,6 +818,69 @@ def generate_ranking_reason(row: pd.Series, philosophy: str, rank: int) -> str:
         return f"Ranked #{rank} based on {phil['name']} investment philosophy."
 
 
+# Frontend (camelCase) names for the metrics returned with each company
+METRIC_NAME_MAP = {
+    'cmp': 'currentPrice',
+    'market_cap': 'marketCap',
+    'pe_ratio': 'peRatio',
+    'roe': 'roe',
+    'roce': 'roce',
+    'sales_growth_3yr': 'salesGrowth3Yr',
+    'sales_growth_5yr': 'salesGrowth5Yr',
+    'sales': 'sales',
+    'pat': 'pat',
+    'profit_growth_3yr': 'profitGrowth3Yr',
+    'profit_growth_5yr': 'profitGrowth5Yr',
+    'fcf_3yr': 'fcf3Yr',
+    'fcf_5yr': 'fcf5Yr',
+    'fcf': 'fcf',
+    'peg': 'peg',
+    'return_1yr': 'return1Yr',
+    'return_3yr': 'return3Yr',
+    'return_5yr': 'return5Yr',
+    'asset_turnover': 'assetTurnover',
+    'cmp_sales': 'priceToSales',
+    'eps': 'eps',
+    'eps_growth_3yr': 'epsGrowth3Yr',
+    'eps_growth_5yr': 'epsGrowth5Yr',
+    'debt_equity': 'debtToEquity',
+    'opm': 'opm',
+    'dividend_yield': 'dividendYield',
+    # New metrics
+    'npm': 'npm',
+    'interest_coverage': 'interestCoverage',
+    'current_ratio': 'currentRatio',
+    'pb_ratio': 'priceToBook',
+    'ev_ebitda': 'evEbitda',
+    'dividend_payout': 'dividendPayout',
+    'fcf_yield_inverse': 'priceToFcf',
+    'pledged_pct': 'pledgedPct',
+    'promoter_holding': 'promoterHolding'
+}
+
+# Display labels for risk penalty codes
+RISK_WARNING_LABELS = {
+    'negative_fcf': '⚠️ Negative Free Cash Flow',
+    'extreme_pe': '🚨 Extreme P/E Ratio (>100)',
+    'high_pe': '⚠️ High P/E Ratio (>50)',
+    'moderate_pe': '⚠️ Moderate P/E (25-50x)',
+    'high_debt': '🚨 High Debt/Equity (>1.5)',
+    'moderate_debt': '⚠️ Moderate Debt (>1.0)',
+    'low_roe': '⚠️ Low ROE (<10%)',
+    'moderate_roe': '⚠️ Moderate ROE (<12%)',
+    'very_low_roe': '🚨 Very Low ROE (<8%)',
+    'low_roce': '⚠️ Low ROCE (<12%)',
+    'moderate_roce': '⚠️ Moderate ROCE (<15%)',
+    'low_roe_negative_growth': '🚨 Low ROE + Negative Growth',
+    'low_roe_high_fcf': '⚠️ Low ROE despite High FCF',
+    'low_fcf_relative': '⚠️ Low FCF Relative to Size',
+    'multiple_red_flags': '🚨 Multiple Quality Concerns',
+    'high_peg': '⚠️ High PEG Ratio (>2)',
+    'extreme_volatility': '🚨 Extreme Volatility',
+    'high_volatility': '⚠️ High Volatility'
+}
+
+
 @router.post("/analyze")
 async def analyze_rankings(
     file: UploadFile = File(...),
@@ -581,30 +899,39 @@ async def analyze_rankings(
     if fcfDQMode not in valid_modes:
         raise HTTPException(status_code=400, detail=f"Invalid fcfDQMode: {fcfDQMode}. Must be one of {sorted(valid_modes)}")
     
-    # Read the uploaded file
+    # Parsing and scoring are CPU-bound; run them in a worker thread so the event loop stays free
+    return await run_in_threadpool(_analyze_rankings_sync, file.file, file.filename, philosophy, fcfDQMode)
+
+
+def _analyze_rankings_sync(upload, filename: str, philosophy: str, fcfDQMode: str) -> Dict:
+    """Parse, score and rank an uploaded file (runs in a worker thread)"""
+    # Read the uploaded file straight from its spooled temp file (no full copy into bytes)
     try:
-        content = await file.read()
-        print(f"📁 File size: {len(content)} bytes")
+        upload.seek(0)
         
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            # First attempt - read with header=0
-            buffer = io.BytesIO(content)
-            df = pd.read_excel(buffer, header=0)
-            print(f"📋 First read columns: {list(df.columns[:5])}")
+        if filename.endswith('.csv'):
+            if ARROW_AVAILABLE:
+                table = pa_csv.read_csv(upload, read_options=pa_csv.ReadOptions(block_size=1 << 20))
+                df = table.to_pandas()
+            else:
+                df = pd.read_csv(upload)
+        elif filename.endswith(('.xlsx', '.xls')):
+            # Peek at the first row only to decide which row holds the real headers
+            first_row = pd.read_excel(upload, header=None, nrows=1, engine=EXCEL_ENGINE)
+            first_cols = [str(c).strip().upper() for c in first_row.iloc[0, :5]] if len(first_row) else []
             
-            # Check if first row looks like generic headers (A, B, C, etc.)
-            # Only re-read if ALL first columns are single letters A-Z
-            first_cols = [str(c).strip().upper() for c in df.columns[:5]]
-            if all(len(c) == 1 and c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' for c in first_cols):
-                # Re-read with header=1 (second row as header)
-                print("🔄 Detected generic single-letter headers, re-reading with header=1")
-                buffer = io.BytesIO(content)  # Create new buffer
-                df = pd.read_excel(buffer, header=1)
-                print(f"📋 Second read columns: {list(df.columns[:5])}")
+            # Generic headers (A, B, C, etc.): only if ALL first columns are single letters A-Z
+            header_row = 0
+            if first_cols and all(len(c) == 1 and c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' for c in first_cols):
+                print("🔄 Detected generic single-letter headers, reading with header=1")
+                header_row = 1
+            
+            upload.seek(0)
+            df = pd.read_excel(upload, header=header_row, engine=EXCEL_ENGINE)
+            print(f"📋 Columns: {list(df.columns[:5])}")
         else:
             raise HTTPException(status_code=400, detail="File must be CSV or Excel format")
+        print(f"📁 Parsed {len(df)} rows")
     
     except Exception as e:
         print(f"❌ Error reading file: {str(e)}")
@@ -612,62 +939,27 @@ async def analyze_rankings(
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
     
+    # Positional index: row labels double as positions into the normalized matrix
+    df.reset_index(drop=True, inplace=True)
+    
     # Normalize column names (handle common variations)
     df.columns = [str(c).replace('\u00a0', ' ').replace('\xa0',' ').strip().lower() for c in df.columns]
     print(f"📊 Normalized columns: {list(df.columns[:10])}")
     
-    # Map common column name variations (Screener.in format)
-    # Process in specific order to avoid conflicts
-    column_mapping = {
-        'name': ['company', 'company_name', 'name'],
-        'cmp': ['cmp rs', 'cmp', 'current_price', 'price'],
-        'market_cap': ['mar cap rs.cr', 'market_cap', 'mcap', 'market cap'],
-        'pe_ratio': ['p/e', 'pe', 'pe_ratio', 'price_to_earnings'],
-        'roe': ['roe %', 'roe', 'return_on_equity', 'return on equity'],
-        'roce': ['roce %', 'roce', 'return_on_capital', 'return on capital employed'],
-        'sales_growth_3yr': ['sales var 3yrs', 'sales var 3yrs %', 'sales_growth_3yr', 'sales growth 3yrs %'],
-        'sales_growth_5yr': ['sales var 5yrs', 'sales var 5yrs %', 'sales_growth_5yr', 'sales growth 5yrs %', 'sales growth (5 yrs cagr)'],
-        'sales': ['sales rs.cr', 'sales', 'revenue'],
-        'pat': ['pat 12m rs.cr', 'pat', 'profit_after_tax', 'net_profit'],
-        'profit_growth_3yr': ['profit var 3yrs', 'profit var 3yrs %', 'profit_growth_3yr', 'pat growth 3yrs %'],
-        'profit_growth_5yr': ['profit var 5yrs', 'profit var 5yrs %', 'profit_growth_5yr', 'pat growth 5yrs %'],
-        'fcf_3yr': ['free cash flow 3yrs', 'fcf_3yr'],
-        'fcf_5yr': ['free cash flow 5yrs', 'fcf_5yr'],
-        'fcf': ['free cash flow rs.cr', 'free cash / eq', 'free cash eq', 'fcf', 'free_cash_flow'],
-        'peg': ['peg', 'peg_ratio'],
-        'return_1yr': ['1yr return', '1yr return %', 'return_1yr'],
-        'return_3yr': ['3yrs return', '3yrs return %', 'return_3yr'],
-        'return_5yr': ['5yrs return', '5yrs return %', 'return_5yr'],
-        'asset_turnover': ['asset turnover', 'asset_turnover'],
-        'cmp_sales': ['cmp / sales', 'cmp_sales', 'price_to_sales'],
-        'eps': ['eps 12m rs', 'eps', 'earnings_per_share'],
-        'eps_growth_3yr': ['eps var 3yrs', 'eps var 3yrs %', 'eps_growth_3yr'],
-        'eps_growth_5yr': ['eps var 5yrs', 'eps var 5yrs %', 'eps_growth_5yr'],
-        'debt_equity': ['debt / eq', 'debt/eq', 'debt_equity', 'debt_to_equity', 'd/e', 'debt/equity', 'debt eq'],
-        'opm': ['opm %', 'opm', 'operating_profit_margin', 'operating margin'],
-        'dividend_yield': ['div yld', 'div yld %', 'dividend_yield', 'dividend yield'],
-        # New format columns
-        'npm': ['npm ann %', 'net profit margin', 'npm %'],
-        'interest_coverage': ['int coverage', 'interest coverage', 'interest coverage ratio'],
-        'current_ratio': ['current ratio', 'current_ratio'],
-        'pb_ratio': ['cmp / bv', 'price to book', 'p/b', 'pb ratio', 'p/bv'],
-        'ev_ebitda': ['ev / ebitda', 'ev/ebitda', 'ev to ebitda'],
-        'dividend_payout': ['dividend payout %', 'payout ratio', 'dividend payout'],
-        'fcf_yield_inverse': ['cmp / fcf', 'price to fcf'],
-        'pledged_pct': ['pledged %', 'pledged shares %', 'pledged'],
-        'promoter_holding': ['prom. hold. %', 'promoter holding %', 'promoter holding']
-    }
-    
-    # Standardize column names (process name first to avoid conflicts)
-    mapped_cols = set()
-    print(f"🔄 Starting column mapping...")
-    for standard_name, variations in column_mapping.items():
-        for col in df.columns:
-            if col not in mapped_cols and any(var in col for var in variations):
-                print(f"  Mapping '{col}' -> '{standard_name}'")
-                df.rename(columns={col: standard_name}, inplace=True)
-                mapped_cols.add(col)
-                break
+    # Standardize column names in a single pass over the uploaded columns
+    rename = {}
+    for col in df.columns:
+        standard = VARIATION_TO_STANDARD.get(col)
+        if standard is None or standard in rename.values():
+            standard = next(
+                (std for var, std in VARIATION_TO_STANDARD.items() if var in col and std not in rename.values()),
+                None
+            )
+        if standard is not None:
+            rename[col] = standard
+    df.rename(columns=rename, inplace=True)
+    mapped_cols = set(rename.values())
+    print(f"🔄 Mapped {len(rename)} columns to standard names")
     
     # Handle symbol separately - use 'name' as fallback only if no dedicated symbol column exists
     symbol_variations = ['symbol', 'ticker', 'code']
@@ -699,29 +991,14 @@ async def analyze_rankings(
     try:
         print(f"🔢 Processing numeric columns...")
         
-        # Define all numeric columns
-        numeric_cols = [
-            'cmp', 'market_cap', 'pe_ratio', 'roe', 'roce', 
-            'sales_growth_3yr', 'sales_growth_5yr', 'sales', 'pat',
-            'profit_growth_3yr', 'profit_growth_5yr', 
-            'fcf_3yr', 'fcf_5yr', 'fcf', 'peg',
-            'return_1yr', 'return_3yr', 'return_5yr',
-            'asset_turnover', 'cmp_sales', 'eps',
-            'eps_growth_3yr', 'eps_growth_5yr',
-            'debt_equity', 'opm', 'dividend_yield',
-            # New metrics
-            'npm', 'interest_coverage', 'current_ratio', 'pb_ratio', 'ev_ebitda',
-            'dividend_payout', 'fcf_yield_inverse', 'pledged_pct', 'promoter_holding'
-        ]
+        # Convert all present numeric columns in one call
+        present_cols = [col for col in NUMERIC_COLS if col in df.columns]
+        df[present_cols] = df[present_cols].apply(pd.to_numeric, errors='coerce')
+        print(f"  Converted {len(present_cols)} columns to numeric")
         
-        # Convert to numeric and fill missing values
-        for col in numeric_cols:
-            if col in df.columns:
-                print(f"  Converting {col} to numeric...")
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                # Use median for most columns, 0 for growth/return metrics that might be negative
-                fill_value = df[col].median() if not df[col].isna().all() else 0
-                df[col].fillna(fill_value, inplace=True)
+        # Fill missing values with the column median (0 for columns with no data at all)
+        medians = df[present_cols].median().fillna(0)
+        df[present_cols] = df[present_cols].fillna(medians)
         
         print(f"✅ Numeric conversion complete")
     except Exception as e:
@@ -730,94 +1007,89 @@ async def analyze_rankings(
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Error processing numeric columns: {str(e)}")
     
+    # Detect financials once; row helpers read this flag instead of re-detecting
+    df['_is_fin'] = compute_financials_mask(df)
+    
     # Create normalized dataframe
     print(f"📈 Creating normalized scores...")
-    normalized_df = pd.DataFrame(index=df.index)
-    
-    # Metrics where lower is better (inverse scoring)
-    inverse_metrics = ['debt_equity', 'pe_ratio', 'peg', 'cmp_sales', 'pb_ratio', 'ev_ebitda', 'fcf_yield_inverse', 'pledged_pct']
-    
-    for col in numeric_cols:
-        if col in df.columns and df[col].notna().any():
-            inverse = col in inverse_metrics
-            normalized_df[col] = df[col].apply(
-                lambda x: normalize_score(x, df[col].min(), df[col].max(), inverse)
-            )
     
-    print(f"✅ Normalization complete. Normalized {len(normalized_df.columns)} metrics")
-    
-    # Calculate scores
-    print(f"🎯 Calculating composite scores...")
-    weights = PHILOSOPHIES[philosophy]['weights']
-    df['composite_score'] = df.apply(
-        lambda row: calculate_composite_score(row, weights, normalized_df, fcfDQMode),
-        axis=1
+    # One block read for all metric columns; columns with no data at all are skipped
+    present_cols = [col for col in NUMERIC_COLS if col in df.columns]
+    values = df[present_cols].to_numpy(dtype=float)
+    has_data = ~np.isnan(values).all(axis=0)
+    norm_cols = [col for col, keep in zip(present_cols, has_data) if keep]
+    normalized_df = pd.DataFrame(
+        normalize_metrics(values[:, has_data], np.array([col in INVERSE_METRICS for col in norm_cols], dtype=bool)),
+        columns=norm_cols,
+        index=df.index
     )
     
-    # Calculate philosophy-specific scores
-    df['buffett_score'] = df.apply(
-        lambda row: calculate_composite_score(row, PHILOSOPHIES['buffett']['weights'], normalized_df, fcfDQMode),
-        axis=1
-    )
-    df['lynch_score'] = df.apply(
-        lambda row: calculate_composite_score(row, PHILOSOPHIES['lynch']['weights'], normalized_df, fcfDQMode),
-        axis=1
-    )
-    df['growth_score'] = df.apply(
-        lambda row: calculate_composite_score(row, PHILOSOPHIES['growth']['weights'], normalized_df, fcfDQMode),
-        axis=1
-    )
+    print(f"✅ Normalization complete. Normalized {len(normalized_df.columns)} metrics")
     
     # Apply disqualification rules
     print(f"🚨 Checking for disqualifications...")
-    disqualified_companies = []
-    df['disqualified'] = False
-    df['disqualification_reason'] = ''
-    
-    for idx, row in df.iterrows():
-        should_dq, reason = should_disqualify(row, fcfDQMode)
-        if should_dq:
-            df.at[idx, 'disqualified'] = True
-            df.at[idx, 'disqualification_reason'] = reason
-            disqualified_companies.append((row['name'], reason))
-            print(f"  ⚠️ Disqualified: {row['name']} - {reason}")
+    dq_mask, dq_reasons = should_disqualify(df, fcfDQMode)
+    df['disqualified'] = dq_mask
+    df['disqualification_reason'] = dq_reasons
+    disqualified_companies = list(zip(df['name'].to_numpy()[dq_mask], dq_reasons[dq_mask]))
+    for name, reason in disqualified_companies:
+        print(f"  ⚠️ Disqualified: {name} - {reason}")
     
     # Filter out disqualified companies
     original_count = len(df)
     df = df[df['disqualified'] == False].copy()
     print(f"✅ {len(disqualified_companies)} companies disqualified, {len(df)} remaining")
     
-    # Add risk warnings and quality assessments
-    df['risk_warnings'] = df.apply(lambda row: list(calculate_risk_penalties(row, fcfDQMode).keys()), axis=1)
-    df['quality_score'] = df.apply(assess_quality_score, axis=1)
-    df['cf_quality_score'] = df.apply(assess_cash_flow_quality, axis=1)
-    
-    # Add valuation warnings
-    valuation_data = df.apply(assess_valuation_reasonableness, axis=1)
-    df['valuation_score'] = valuation_data.apply(lambda x: x['score'])
-    df['valuation_warnings'] = valuation_data.apply(lambda x: x['warnings'])
+    # Calculate scores for the remaining companies only (normalization above still spans the full universe)
+    print(f"🎯 Calculating composite scores...")
+    # 0-100 normalized scores only need float32; raw metrics stay float64 for the rules and the response
+    metric_matrix = normalized_df.reindex(columns=NUMERIC_COLS, fill_value=0.0).to_numpy(dtype=np.float32)[df.index]
+    assessments = calculate_score_multipliers(df, df['_is_fin'].to_numpy(), fcfDQMode)
+    scored_index = df.index  # row order of the assessment arrays
+    
+    # Selected philosophy plus the philosophy-specific scores in one matrix product
+    scores = calculate_composite_scores([philosophy, 'buffett', 'lynch', 'growth'], metric_matrix, assessments['multiplier'])
+    df['composite_score'] = scores[:, 0]
+    df['buffett_score'] = scores[:, 1]
+    df['lynch_score'] = scores[:, 2]
+    df['growth_score'] = scores[:, 3]
+    
+    # Add quality assessments and valuation warnings from the scoring pass
+    # (risk warnings are only listed for returned rows)
+    df['quality_score'] = assessments['quality']
+    df['cf_quality_score'] = assessments['cash_flow']
+    df['valuation_score'] = assessments['valuation']
+    df['valuation_warnings'] = assessments['valuation_warnings']
     
     # Add sector identification and adjustments
     if SECTOR_ENABLED:
         print(f"🏢 Applying sector-specific adjustments...")
-        df['sector'] = df['name'].apply(get_sector_from_name)
-        df['sector_adjustment'] = 0.0
-        df['sector_insights'] = ''
+        df['sector'] = map_sectors(df['name'])
+        # The sector rules only look at these metrics and at the high-debt penalty from the scoring pass
+        sector_cols = [col for col in ('debt_equity', 'fcf', 'roe', 'roce', 'opm') if col in df.columns]
+        # Plain Python floats so adjust_score_for_sector rounds exactly as it does for scalar inputs
+        sector_values = [df[col].tolist() for col in sector_cols]
+        high_debt = np.asarray(assessments['penalties'].get('high_debt', np.zeros(len(df))), dtype=float).tolist()
+        base_scores = df['composite_score'].tolist()
+        adjusted_scores = np.empty(len(df))
+        sector_adjustments = np.empty(len(df))
+        sector_insights = []
         
-        for idx, row in df.iterrows():
-            sector = row['sector']
-            penalties = calculate_risk_penalties(row, fcfDQMode)
-            
+        for i, sector in enumerate(df['sector']):
+            penalties = {'high_debt': high_debt[i]} if high_debt[i] > 0 else {}
             adjustment_result = adjust_score_for_sector(
-                base_score=row['composite_score'],
-                company_data=row,
+                base_score=base_scores[i],
+                company_data={col: values[i] for col, values in zip(sector_cols, sector_values)},
                 sector=sector,
                 penalties=penalties
             )
-            
-            df.at[idx, 'composite_score'] = adjustment_result['adjusted_score']
-            df.at[idx, 'sector_adjustment'] = adjustment_result['sector_adjustment']
-            df.at[idx, 'sector_insights'] = '; '.join(adjustment_result['sector_insights'])
+            adjusted_scores[i] = adjustment_result['adjusted_score']
+            sector_adjustments[i] = adjustment_result['sector_adjustment']
+            sector_insights.append('; '.join(adjustment_result['sector_insights']))
+        
+        df['composite_score'] = adjusted_scores
+        df['sector_adjustment'] = sector_adjustments
+        df['sector_insights'] = sector_insights
         
         print(f"✅ Sector adjustments applied")
     else:
@@ -844,158 +1116,51 @@ async def analyze_rankings(
         portfolio_recommendation = ''
     
     # V2 Sub-scores
-    def _avg_present(vals: list[float]) -> float:
-        vv = [v for v in vals if v is not None]
-        return float(sum(vv) / len(vv)) if vv else 50.0
-    def _nz(col: str, idx) -> float | None:
-        return float(normalized_df.at[idx, col]) if col in normalized_df.columns else None
-    quality_scores = []
-    growth_scores = []
-    valuation_scores = []
-    cashflow_scores = []
-    is_fin_flags = []
-    for idx, row in df.iterrows():
-        is_fin = is_financials(row)
-        is_fin_flags.append(is_fin)
-        if is_fin:
-            q = _avg_present([_nz('roe', idx), _nz('roce', idx)])
-        else:
-            q = _avg_present([_nz('roe', idx), _nz('roce', idx), _nz('opm', idx)])
-        g = _avg_present([
-            _nz('sales_growth_5yr', idx) or _nz('sales_growth_3yr', idx),
-            _nz('profit_growth_5yr', idx) or _nz('profit_growth_3yr', idx),
-            _nz('eps_growth_5yr', idx) or _nz('eps_growth_3yr', idx)
-        ])
-        v = _avg_present([
-            _nz('pe_ratio', idx),
-            _nz('peg', idx),
-            _nz('pb_ratio', idx),
-            _nz('ev_ebitda', idx),
-            _nz('cmp_sales', idx)
-        ])
-        if is_fin:
-            c = 50.0
-        else:
-            fcf_now = _nz('fcf', idx)
-            fcf3 = _nz('fcf_3yr', idx)
-            fcf5 = _nz('fcf_5yr', idx)
-            if fcf3 is not None and fcf5 is not None:
-                diff = (fcf5 - fcf3)
-                c = max(0.0, min(100.0, 50.0 + diff / 2.0))
-            elif fcf_now is not None:
-                c = fcf_now
-            else:
-                c = 50.0
-        quality_scores.append(q)
-        growth_scores.append(g)
-        valuation_scores.append(v)
-        cashflow_scores.append(c)
-    df['quality_score_v2'] = quality_scores
-    df['growth_score_v2'] = growth_scores
-    df['valuation_score_v2'] = valuation_scores
-    df['cashflow_score_v2'] = cashflow_scores
-    df['is_financials_detected'] = is_fin_flags
-    final_scores = []
-    for idx, row in df.iterrows():
-        if row['is_financials_detected']:
-            fs = (
-                0.45 * row['quality_score_v2'] +
-                0.20 * row['growth_score_v2'] +
-                0.25 * row['valuation_score_v2'] +
-                0.10 * row['cashflow_score_v2']
-            )
-        else:
-            fs = (
-                0.35 * row['quality_score_v2'] +
-                0.25 * row['growth_score_v2'] +
-                0.20 * row['valuation_score_v2'] +
-                0.20 * row['cashflow_score_v2']
-            )
-        final_scores.append(float(fs))
-    df['final_score_v2'] = final_scores
+    # df keeps the positional RangeIndex from upload, so row labels index normalized rows directly
+    norm_values = normalized_df.to_numpy()[df.index]
+    norm = {col: norm_values[:, j] for j, col in enumerate(normalized_df.columns)}
+    is_fin = df['_is_fin'].to_numpy(dtype=bool)
+    v2 = calculate_v2_subscores(norm, is_fin)
+    df = df.assign(
+        quality_score_v2=v2['quality'],
+        growth_score_v2=v2['growth'],
+        valuation_score_v2=v2['valuation'],
+        cashflow_score_v2=v2['cashflow'],
+        is_financials_detected=is_fin,
+    )
+    q, g, v, c = v2['quality'], v2['growth'], v2['valuation'], v2['cashflow']
+    df['final_score_v2'] = np.where(
+        is_fin,
+        0.45 * q + 0.20 * g + 0.25 * v + 0.10 * c,
+        0.35 * q + 0.25 * g + 0.20 * v + 0.20 * c
+    )
     
-    # Sort by composite score (after sector adjustments)
-    df = df.sort_values('composite_score', ascending=False)
-    df['rank'] = range(1, len(df) + 1)
+    # Only the top 50 are returned, so select them by composite score (after sector adjustments)
+    # instead of sorting the whole frame
+    top = df.nlargest(50, 'composite_score').copy()
+    top['rank'] = range(1, len(top) + 1)
     
     # Get key drivers and reasoning
-    df['key_drivers'] = df.apply(get_key_drivers, axis=1)
-    df['ranking_reason'] = df.apply(lambda row: generate_ranking_reason(row, philosophy, row['rank']), axis=1)
+    top['key_drivers'] = get_key_drivers(top)
+    reason_cols = [metric for metric, _ in PHILOSOPHY_TOP3[philosophy] if metric in top.columns]
+    reason_values = [top[col].to_numpy() for col in reason_cols]
+    top['ranking_reason'] = [
+        generate_ranking_reason(dict(zip(reason_cols, values)), philosophy, rank)
+        for rank, *values in zip(top['rank'], *reason_values)
+    ]
     
     # Prepare response
     rankings = []
-    # Map snake_case to camelCase for JSON response
-    metric_name_map = {
-        'cmp': 'currentPrice',
-        'market_cap': 'marketCap',
-        'pe_ratio': 'peRatio',
-        'roe': 'roe',
-        'roce': 'roce',
-        'sales_growth_3yr': 'salesGrowth3Yr',
-        'sales_growth_5yr': 'salesGrowth5Yr',
-        'sales': 'sales',
-        'pat': 'pat',
-        'profit_growth_3yr': 'profitGrowth3Yr',
-        'profit_growth_5yr': 'profitGrowth5Yr',
-        'fcf_3yr': 'fcf3Yr',
-        'fcf_5yr': 'fcf5Yr',
-        'fcf': 'fcf',
-        'peg': 'peg',
-        'return_1yr': 'return1Yr',
-        'return_3yr': 'return3Yr',
-        'return_5yr': 'return5Yr',
-        'asset_turnover': 'assetTurnover',
-        'cmp_sales': 'priceToSales',
-        'eps': 'eps',
-        'eps_growth_3yr': 'epsGrowth3Yr',
-        'eps_growth_5yr': 'epsGrowth5Yr',
-        'debt_equity': 'debtToEquity',
-        'opm': 'opm',
-        'dividend_yield': 'dividendYield',
-        # New metrics
-        'npm': 'npm',
-        'interest_coverage': 'interestCoverage',
-        'current_ratio': 'currentRatio',
-        'pb_ratio': 'priceToBook',
-        'ev_ebitda': 'evEbitda',
-        'dividend_payout': 'dividendPayout',
-        'fcf_yield_inverse': 'priceToFcf',
-        'pledged_pct': 'pledgedPct',
-        'promoter_holding': 'promoterHolding'
-    }
+    # Metric dicts for all returned rows in one call, with camelCase keys for the frontend
+    metric_cols = [col for col in NUMERIC_COLS if col in top.columns]
+    metric_rows = top[metric_cols].astype(float).fillna(0.0).rename(columns=METRIC_NAME_MAP).to_dict('records')
     
-    for _, row in df.head(50).iterrows():  # Return top 50
-        metrics = {}
-        for col in numeric_cols:
-            if col in row:
-                # Convert to camelCase for frontend
-                camel_key = metric_name_map.get(col, col)
-                metrics[camel_key] = float(row[col]) if not pd.isna(row[col]) else 0.0
-        
+    # Risk warnings reuse the penalties computed in the scoring pass
+    warning_rows = risk_warning_codes(assessments['penalties'], scored_index.get_indexer(top.index))
+    
+    for row, metrics, warnings in zip(top.to_dict('records'), metric_rows, warning_rows):
         # Format risk warnings for display
-        risk_warnings_display = []
-        for warning in row['risk_warnings']:
-            warning_map = {
-                'negative_fcf': '⚠️ Negative Free Cash Flow',
-                'extreme_pe': '🚨 Extreme P/E Ratio (>100)',
-                'high_pe': '⚠️ High P/E Ratio (>50)',
-                'moderate_pe': '⚠️ Moderate P/E (25-50x)',
-                'high_debt': '🚨 High Debt/Equity (>1.5)',
-                'moderate_debt': '⚠️ Moderate Debt (>1.0)',
-                'low_roe': '⚠️ Low ROE (<10%)',
-                'moderate_roe': '⚠️ Moderate ROE (<12%)',
-                'very_low_roe': '🚨 Very Low ROE (<8%)',
-                'low_roce': '⚠️ Low ROCE (<12%)',
-                'moderate_roce': '⚠️ Moderate ROCE (<15%)',
-                'low_roe_negative_growth': '🚨 Low ROE + Negative Growth',
-                'low_roe_high_fcf': '⚠️ Low ROE despite High FCF',
-                'low_fcf_relative': '⚠️ Low FCF Relative to Size',
-                'multiple_red_flags': '🚨 Multiple Quality Concerns',
-                'high_peg': '⚠️ High PEG Ratio (>2)',
-                'extreme_volatility': '🚨 Extreme Volatility',
-                'high_volatility': '⚠️ High Volatility'
-            }
-            risk_warnings_display.append(warning_map.get(warning, warning))
+        risk_warnings_display = [RISK_WARNING_LABELS.get(warning, warning) for warning in warnings]
         
         rankings.append({
             'rank': int(row['rank']),
@@ -2,7 +2,8 @@
 Upload Router - Handles file uploads (PDF transcripts and Excel financial data)
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from typing import BinaryIO, List, Optional
 from datetime import datetime
 
 from models.schemas import UploadResponse
@@ -17,6 +18,36 @@ pdf_parser = PDFParser()
 excel_parser = ExcelParser()
 
 
+def _process_transcript(stream: BinaryIO) -> tuple:
+    """Extract, analyze and score a PDF transcript (runs in a worker thread)"""
+    raw_text = pdf_parser.extract_text(stream)
+    analysis = pdf_parser.analyze_transcript(raw_text)
+    integrity_score = pdf_parser.calculate_integrity_score(raw_text, analysis)
+    return raw_text, analysis, integrity_score
+
+
+def _process_financials(stream: BinaryIO, filename: str) -> tuple:
+    """Parse an Excel/CSV file and derive its metrics and traffic lights (runs in a worker thread)"""
+    print(f"\n=== Parsing Excel file: {filename} ===")
+    parsed_data = excel_parser.parse_financial_data(stream, filename)
+    print(f"Parsed data shape: {parsed_data.get('shape', 'unknown')}")
+    print(f"Columns found: {parsed_data.get('columns', [])[:10]}")  # First 10 columns
+    
+    if 'error' in parsed_data.get('metadata', {}):
+        raise Exception(f"Parsing error: {parsed_data['metadata']['error']}")
+    
+    metrics = excel_parser.calculate_metrics(parsed_data)
+    print(f"Calculated metrics: {list(metrics.keys())}")
+    print(f"Revenue: {metrics.get('revenue', 'NOT FOUND')}")
+    print(f"Net Profit: {metrics.get('net_profit', 'NOT FOUND')}")
+    
+    if metrics.get('revenue') is None:
+        print("⚠️ WARNING: Revenue not found in Excel file!")
+    
+    traffic_lights = excel_parser.generate_traffic_lights(metrics)
+    return parsed_data, metrics, traffic_lights
+
+
 @router.get("/debug/state")
 async def debug_state():
     """Debug endpoint to check current processed files state"""
@@ -159,14 +190,10 @@ async def upload_pdf(
                     detail=f"File {file.filename} is not a PDF"
                 )
             
-            # Read file content
-            content = await file.read()
-            
-            # Process the PDF
+            # Process the PDF straight from the spooled upload instead of copying it into memory
             try:
-                raw_text = pdf_parser.extract_text(content)
-                analysis = pdf_parser.analyze_transcript(raw_text)
-                integrity_score = pdf_parser.calculate_integrity_score(raw_text, analysis)
+                # Parsing is CPU-bound; keep it off the event loop
+                raw_text, analysis, integrity_score = await run_in_threadpool(_process_transcript, file.file)
                 
                 file_id = f"pdf_{datetime.utcnow().timestamp()}"
                 
@@ -241,28 +268,10 @@ async def upload_excel(
                     detail=f"File {file.filename} is not supported"
                 )
             
-            # Read file content
-            content = await file.read()
-            
-            # Process the Excel file
+            # Process the Excel file straight from the spooled upload instead of copying it into memory
             try:
-                print(f"\n=== Parsing Excel file: {file.filename} ===")
-                parsed_data = excel_parser.parse_financial_data(content, file.filename)
-                print(f"Parsed data shape: {parsed_data.get('shape', 'unknown')}")
-                print(f"Columns found: {parsed_data.get('columns', [])[:10]}")  # First 10 columns
-                
-                if 'error' in parsed_data.get('metadata', {}):
-                    raise Exception(f"Parsing error: {parsed_data['metadata']['error']}")
-                
-                metrics = excel_parser.calculate_metrics(parsed_data)
-                print(f"Calculated metrics: {list(metrics.keys())}")
-                print(f"Revenue: {metrics.get('revenue', 'NOT FOUND')}")
-                print(f"Net Profit: {metrics.get('net_profit', 'NOT FOUND')}")
-                
-                if metrics.get('revenue') is None:
-                    print("⚠️ WARNING: Revenue not found in Excel file!")
-                
-                traffic_lights = excel_parser.generate_traffic_lights(metrics)
+                # Parsing is CPU-bound; keep it off the event loop
+                parsed_data, metrics, traffic_lights = await run_in_threadpool(_process_financials, file.file, file.filename)
                 
                 file_id = f"excel_{datetime.utcnow().timestamp()}"
                 
@@ -3,17 +3,25 @@ Validation Router
 Handles performance validation and return data fetching
 """
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, List
+from datetime import datetime, timedelta
+from functools import lru_cache
+import asyncio
+import hashlib
+import json
 import sys
 from pathlib import Path
 
+from core.redis import get_redis
+
 # Add utils to path
 sys.path.append(str(Path(__file__).parent.parent / "utils"))
 
 try:
-    from performance_tracking import tracker, get_performance_summary
+    from performance_tracking import tracker, get_performance_summary, iter_snapshots_file
     from market_data_fetcher import fetcher, fetch_returns_for_snapshot, INDIAN_BENCHMARKS
     VALIDATION_ENABLED = True
 except ImportError as e:
@@ -22,6 +30,29 @@ except ImportError as e:
 
 router = APIRouter(prefix="/validation", tags=["validation"])
 
+# Upper bound on snapshots fetching returns from Yahoo Finance at the same time
+MAX_CONCURRENT_VALIDATIONS = 10
+
+# Seconds a /stock-prices response is served from Redis before prices are fetched again
+PRICE_CACHE_TTL = 60
+
+# Seconds a /performance-report is served from Redis (the key also changes whenever snapshots do)
+REPORT_CACHE_TTL = 300
+
+# Work currently in flight, keyed by request; identical concurrent requests await the same task
+_inflight: Dict[tuple, asyncio.Future] = {}
+
+
+async def _coalesced(key: tuple, make_coro: Callable[[], Awaitable]):
+    """Run make_coro() once per key at a time, sharing the result with concurrent callers"""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(make_coro())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield so one caller disconnecting does not cancel the work for the others
+    return await asyncio.shield(task)
+
 
 class ValidateSnapshotRequest(BaseModel):
     snapshot_id: str
@@ -35,6 +66,22 @@ class ManualReturnsRequest(BaseModel):
     period_months: int
 
 
+def _snapshot_summaries() -> List[dict]:
+    """Summary fields of every snapshot (blocking file read)"""
+    # Stream the file so only one snapshot's rankings are in memory at a time
+    snapshot_list = []
+    for snapshot in iter_snapshots_file(tracker.snapshots_file):
+        snapshot_list.append({
+            'snapshot_id': snapshot['snapshot_id'],
+            'timestamp': snapshot['timestamp'],
+            'philosophy': snapshot['philosophy'],
+            'total_companies': snapshot['summary']['total_companies'],
+            'has_validation': 'validation' in snapshot,
+            'validated_periods': list(snapshot.get('actual_returns', {}).keys()) if 'actual_returns' in snapshot else []
+        })
+    return snapshot_list
+
+
 @router.get("/snapshots")
 async def get_snapshots():
     """Get all saved ranking snapshots"""
@@ -42,19 +89,7 @@ async def get_snapshots():
         raise HTTPException(status_code=503, detail="Validation system not available")
     
     try:
-        snapshots = tracker._load_snapshots()
-        
-        # Return summary info
-        snapshot_list = []
-        for snapshot in snapshots:
-            snapshot_list.append({
-                'snapshot_id': snapshot['snapshot_id'],
-                'timestamp': snapshot['timestamp'],
-                'philosophy': snapshot['philosophy'],
-                'total_companies': snapshot['summary']['total_companies'],
-                'has_validation': 'validation' in snapshot,
-                'validated_periods': list(snapshot.get('actual_returns', {}).keys()) if 'actual_returns' in snapshot else []
-            })
+        snapshot_list = await run_in_threadpool(_snapshot_summaries)
         
         return {
             'total_snapshots': len(snapshot_list),
@@ -81,9 +116,13 @@ async def validate_snapshot_auto(request: ValidateSnapshotRequest):
     try:
         print(f"\n🔄 Starting automatic validation for {request.snapshot_id}")
         
-        validation_result = fetch_returns_for_snapshot(
-            snapshot_id=request.snapshot_id,
-            months=request.period_months
+        validation_result = await _coalesced(
+            ('validate', request.snapshot_id, request.period_months),
+            lambda: run_in_threadpool(
+                fetch_returns_for_snapshot,
+                snapshot_id=request.snapshot_id,
+                months=request.period_months
+            )
         )
         
         return {
@@ -111,7 +150,8 @@ async def add_manual_returns(request: ManualReturnsRequest):
         raise HTTPException(status_code=503, detail="Validation system not available")
     
     try:
-        validation = tracker.add_actual_returns(
+        validation = await run_in_threadpool(
+            tracker.add_actual_returns,
             snapshot_id=request.snapshot_id,
             returns_data=request.returns_data,
             period_months=request.period_months
@@ -134,20 +174,44 @@ async def get_performance_report():
     """
     Get comprehensive performance report
     
-    Shows overall model performance across all validated snapshots
+    Shows overall model performance across all validated snapshots. Reports are
+    cached in Redis per version of the snapshots file, so saving or validating a
+    snapshot invalidates them.
     """
     if not VALIDATION_ENABLED:
         raise HTTPException(status_code=503, detail="Validation system not available")
     
     try:
-        report = get_performance_summary()
+        try:
+            stat = tracker.snapshots_file.stat()
+            key = f"cache:perf-report:{stat.st_mtime_ns}:{stat.st_size}"
+        except FileNotFoundError:
+            key = "cache:perf-report:empty"
+        
+        try:
+            redis_client = get_redis()
+            cached_value = redis_client.get(key)
+            if cached_value:
+                return json.loads(cached_value)
+        except Exception as e:
+            redis_client = None
+            print(f"⚠️ Report cache unavailable: {e}")
+        
+        report = await run_in_threadpool(get_performance_summary)
+        
+        if redis_client is not None:
+            try:
+                redis_client.setex(key, REPORT_CACHE_TTL, json.dumps(report))
+            except Exception as e:
+                print(f"⚠️ Could not cache performance report: {e}")
+        
         return report
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/historical-performance")
+@router.get("/historical-performance", response_class=ORJSONResponse)
 async def get_historical_performance(months_back: int = 12):
     """
     Get historical performance data as time series
@@ -159,7 +223,7 @@ async def get_historical_performance(months_back: int = 12):
         raise HTTPException(status_code=503, detail="Validation system not available")
     
     try:
-        df = tracker.get_historical_performance(months_back=months_back)
+        df = await run_in_threadpool(tracker.get_historical_performance, months_back=months_back)
         
         if df.empty:
             return {
@@ -167,27 +231,24 @@ async def get_historical_performance(months_back: int = 12):
                 'data': []
             }
         
-        # Convert to dict for JSON response
+        # Convert datetime to string (same text as datetime.isoformat) before building records
+        df['date'] = df['date'].dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str.replace(r'\.000000$', '', regex=True)
         data = df.to_dict('records')
         
-        # Convert datetime to string
-        for record in data:
-            if 'date' in record:
-                record['date'] = record['date'].isoformat()
-        
-        return {
+        # Records are already JSON-native; skip FastAPI's generic encoder
+        return ORJSONResponse({
             'months_back': months_back,
             'data_points': len(data),
             'data': data
-        }
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/benchmarks")
-async def get_available_benchmarks():
-    """Get list of available benchmark indices"""
+@lru_cache(maxsize=1)
+def _benchmarks_payload() -> dict:
+    """Static benchmark listing, built once per process"""
     return {
         'benchmarks': INDIAN_BENCHMARKS,
         'default': '^NSEI',
@@ -203,11 +264,25 @@ async def get_available_benchmarks():
     }
 
 
+@router.get("/benchmarks")
+async def get_available_benchmarks():
+    """Get list of available benchmark indices"""
+    return _benchmarks_payload()
+
+
+def _prices_cache_key(symbol_list: List[str]) -> str:
+    """Cache key for a set of symbols, independent of their order in the request"""
+    return f"cache:prices:{hashlib.md5(','.join(sorted(set(symbol_list))).encode()).hexdigest()}"
+
+
 @router.get("/stock-prices")
 async def get_stock_prices(symbols: str):
     """
     Get current market prices for stocks
     
+    Responses are cached in Redis for PRICE_CACHE_TTL seconds; if Redis is
+    unavailable prices are fetched live.
+    
     Args:
         symbols: Comma-separated list of stock symbols (e.g., "TCS,INFY,WIPRO")
     """
@@ -216,12 +291,32 @@ async def get_stock_prices(symbols: str):
     
     try:
         symbol_list = [s.strip() for s in symbols.split(',')]
-        prices = fetcher.get_current_prices(symbol_list)
+        key = _prices_cache_key(symbol_list)
         
-        return {
+        try:
+            redis_client = get_redis()
+            cached_value = redis_client.get(key)
+            if cached_value:
+                redis_client.incr("metrics:prices:hits")
+                return json.loads(cached_value)
+            redis_client.incr("metrics:prices:misses")
+        except Exception as e:
+            redis_client = None
+            print(f"⚠️ Price cache unavailable: {e}")
+        
+        prices = await _coalesced(('prices', key), lambda: fetcher.fetch_current_prices(symbol_list))
+        result = {
             'timestamp': datetime.now().isoformat(),
             'prices': prices
         }
+        
+        if redis_client is not None:
+            try:
+                redis_client.setex(key, PRICE_CACHE_TTL, json.dumps(result))
+            except Exception as e:
+                print(f"⚠️ Could not cache prices: {e}")
+        
+        return result
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -239,7 +334,7 @@ async def export_backtest_data():
     
     try:
         output_file = "data/performance_tracking/backtest_export.csv"
-        tracker.export_for_backtesting(output_file)
+        await run_in_threadpool(tracker.export_for_backtesting, output_file)
         
         return {
             'success': True,
@@ -263,12 +358,11 @@ async def validate_all_snapshots(period_months: int = 6):
         raise HTTPException(status_code=503, detail="Validation system not available")
     
     try:
-        snapshots = tracker._load_snapshots()
+        snapshots = await run_in_threadpool(tracker._load_snapshots)
         cutoff_date = datetime.now() - timedelta(days=period_months * 30)
         
-        validated_count = 0
+        eligible = []
         skipped_count = 0
-        errors = []
         
         for snapshot in snapshots:
             snapshot_date = datetime.fromisoformat(snapshot['timestamp'])
@@ -283,14 +377,30 @@ async def validate_all_snapshots(period_months: int = 6):
                 skipped_count += 1
                 continue
             
-            try:
-                fetch_returns_for_snapshot(snapshot['snapshot_id'], period_months)
-                validated_count += 1
-            except Exception as e:
+            eligible.append(snapshot['snapshot_id'])
+        
+        # Fetching is blocking network I/O, so run snapshots concurrently in worker threads
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_VALIDATIONS)
+        
+        async def _validate(snapshot_id: str):
+            async with semaphore:
+                return await _coalesced(
+                    ('validate', snapshot_id, period_months),
+                    lambda: run_in_threadpool(fetch_returns_for_snapshot, snapshot_id, period_months)
+                )
+        
+        results = await asyncio.gather(*(_validate(sid) for sid in eligible), return_exceptions=True)
+        
+        validated_count = 0
+        errors = []
+        for snapshot_id, result in zip(eligible, results):
+            if isinstance(result, Exception):
                 errors.append({
-                    'snapshot_id': snapshot['snapshot_id'],
-                    'error': str(e)
+                    'snapshot_id': snapshot_id,
+                    'error': str(result)
                 })
+            else:
+                validated_count += 1
         
         return {
             'success': True,
@@ -2,50 +2,149 @@
 WebSocket Router - Real-time updates for jobs and portfolio
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, Set
+from typing import Dict, Optional, Set
 import json
 import asyncio
 from core.auth import get_current_user
-from core.redis import get_redis
+from core.redis import get_redis, get_async_redis
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 router = APIRouter()
 
 # Active WebSocket connections
 active_connections: Dict[str, Set[WebSocket]] = {}
 
+# Messages are published to Redis so every worker can reach its own sockets:
+# per-user messages on f"{CHANNEL_PREFIX}{user_id}", broadcasts on BROADCAST_CHANNEL
+CHANNEL_PREFIX = "ws:"
+BROADCAST_CHANNEL = "ws-broadcast"
+LISTENER_RETRY_SECONDS = 5
+# How long connect waits for this worker's listener to confirm its subscription
+SUBSCRIBE_TIMEOUT_SECONDS = 2.0
+# A socket that can't take a message within this many seconds is treated as dead
+SEND_TIMEOUT_SECONDS = 2.0
+
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        # Set while this worker's listener is subscribed; until then messages are also delivered locally
+        self._subscribed = asyncio.Event()
     
     async def connect(self, websocket: WebSocket, user_id: str):
         await websocket.accept()
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
         self.active_connections[user_id].add(websocket)
+        if self._listener is None or self._listener.done():
+            attempted = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen(attempted))
+            # Wait for the first subscribe attempt (success or failure) before sending anything
+            try:
+                await asyncio.wait_for(attempted.wait(), SUBSCRIBE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
     
     def disconnect(self, websocket: WebSocket, user_id: str):
         if user_id in self.active_connections:
             self.active_connections[user_id].discard(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
+        # Nobody left on this worker to forward to; the listener stops itself when it is the caller
+        if not self.active_connections and self._listener is not None:
+            if self._listener is not asyncio.current_task():
+                self._listener.cancel()
+            self._listener = None
+            self._subscribed.clear()
     
     async def send_personal_message(self, message: dict, user_id: str):
-        if user_id in self.active_connections:
-            disconnected = set()
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except:
-                    disconnected.add(connection)
-            
-            # Clean up disconnected
-            for conn in disconnected:
-                self.disconnect(conn, user_id)
+        text = self._serialize(message)
+        # Checked before publishing: if this worker is not listening yet, Redis won't bring it back here
+        listening = self._subscribed.is_set()
+        if not (await self._publish(f"{CHANNEL_PREFIX}{user_id}", text) and listening):
+            await self._send_text(text, user_id)
     
     async def broadcast(self, message: dict):
-        for user_id in list(self.active_connections.keys()):
-            await self.send_personal_message(message, user_id)
+        text = self._serialize(message)
+        listening = self._subscribed.is_set()
+        if not (await self._publish(BROADCAST_CHANNEL, text) and listening):
+            await self._broadcast_local(text)
+    
+    async def _publish(self, channel: str, text: str) -> bool:
+        """Publish to all workers; returns False if Redis is unavailable"""
+        try:
+            await get_async_redis().publish(channel, text)
+            return True
+        except Exception as e:
+            print(f"⚠️ WebSocket publish failed, delivering locally only: {e}")
+            return False
+    
+    async def _listen(self, attempted: asyncio.Event):
+        """Forward published messages to the sockets connected to this worker"""
+        me = asyncio.current_task()
+        while self._listener is me:
+            pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                await pubsub.subscribe(BROADCAST_CHANNEL)
+                if self._listener is not me:
+                    return
+                self._subscribed.set()
+                attempted.set()
+                async for item in pubsub.listen():
+                    channel = item['channel'].decode()
+                    text = item['data'].decode()
+                    if channel == BROADCAST_CHANNEL:
+                        await self._broadcast_local(text)
+                    else:
+                        await self._send_text(text, channel[len(CHANNEL_PREFIX):])
+                    # A failed send may have disconnected the last socket (see disconnect)
+                    if self._listener is not me:
+                        return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ WebSocket pub/sub listener error: {e}")
+                if self._listener is me:
+                    self._subscribed.clear()
+                attempted.set()
+                await asyncio.sleep(LISTENER_RETRY_SECONDS)
+            finally:
+                if self._listener is me:
+                    self._subscribed.clear()
+                await pubsub.reset()
+    
+    async def _broadcast_local(self, text: str):
+        # Send to all local users concurrently
+        await asyncio.gather(
+            *[self._send_text(text, user_id) for user_id in list(self.active_connections.keys())],
+            return_exceptions=True
+        )
+    
+    @staticmethod
+    def _serialize(message: dict) -> str:
+        # Sent as text frames (the client JSON.parses event.data), same compact form as send_json
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+    
+    async def _send_text(self, text: str, user_id: str):
+        connections = list(self.active_connections.get(user_id, ()))
+        results = await asyncio.gather(
+            *[asyncio.wait_for(connection.send_text(text), SEND_TIMEOUT_SECONDS) for connection in connections],
+            return_exceptions=True
+        )
+        
+        # Clean up disconnected (or stuck) sockets in one pass
+        for conn, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(conn, user_id)
 
 
 manager = ConnectionManager()
@@ -3,16 +3,102 @@ Automatic Ticker Symbol Fetcher
 Scrapes Screener.in to find correct NSE ticker symbols for company names,
 OR reads them directly from an Excel file if provided.
 """
-import requests
+import aiohttp
+import asyncio
 from bs4 import BeautifulSoup
+import hashlib
 import json
-import time
 import re
+import time
 from typing import Dict, Optional, Tuple, List
 import argparse
 import os
+import sys
 import pandas as pd
 
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_io import EXCEL_ENGINE, read_excel_columns, read_json, write_json
+from utils.performance_tracking import iter_snapshots_file, migrate_legacy_snapshots
+
+
+# Searches kept in flight at once - doubles as the rate limit towards Screener.in
+MAX_CONCURRENT_SEARCHES = 5
+REQUEST_TIMEOUT = 10
+
+# Transient failures are retried with exponential backoff (0.5s, 1s, 2s)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+# Common finance abbreviations expanded to improve search hits. Space-delimited keys only
+# match whole words; adjacent words may share the separating space (e.g. "m & m fin serv").
+_ABBREVIATION_WORDS = {
+    ' fin serv ': ' finance services ',
+    ' fin. serv. ': ' finance services ',
+    ' fin ': ' finance ',
+    ' inv ': ' investment ',
+    ' inv. ': ' investment ',
+    ' serv ': ' services ',
+    ' serv. ': ' services ',
+    ' ind ': ' industries ',
+    ' ind. ': ' industries ',
+    ' m  m ': ' mahindra  mahindra ',
+    ' m & m ': ' mahindra & mahindra ',
+    'cholaman': 'cholamandalam',
+    'cholamandlam': 'cholamandalam'
+}
+_ABBREVIATIONS = {k.strip(): v.strip() for k, v in _ABBREVIATION_WORDS.items()}
+_ABBREVIATION_RE = re.compile('|'.join(
+    ('(?<= )' if k.startswith(' ') else '') + re.escape(k.strip()) + ('(?= )' if k.endswith(' ') else '')
+    for k in sorted(_ABBREVIATION_WORDS, key=lambda k: len(k.strip()), reverse=True)
+))
+_NON_WORD_RE = re.compile(r'[^\w\s&]')
+_COMPANY_SUFFIX_RE = re.compile(
+    r'\s+(Ltd\.?|Limited|Pvt\.?|Private|Inc\.?|Corp\.?|Co\.?|Company\s+Ltd\.?)+$', re.IGNORECASE
+)
+_NSE_CODE_RE = re.compile(r'NSE\s*:\s*([A-Z0-9&\.\-]+)')
+_COMPANY_URL_RE = re.compile(r'/company/([A-Z0-9&\.\-]+)/')
+
+TICKER_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', '.cache', 'tickers')
+TICKER_CACHE_TTL = 30 * 86400  # 30 days
+
+
+class TickerCache:
+    """On-disk cache of resolved tickers, one JSON file per normalized company name"""
+    
+    def __init__(self, cache_dir: str = TICKER_CACHE_DIR, ttl: int = TICKER_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+    
+    def _path(self, company_name: str) -> str:
+        key = hashlib.md5(company_name.strip().lower().encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def get(self, company_name: str) -> Optional[str]:
+        """Return the cached ticker if present and younger than the TTL"""
+        try:
+            entry = read_json(self._path(company_name))
+            if time.time() - entry['timestamp'] < self.ttl:
+                self.hits += 1
+                return entry['ticker']
+        except Exception:
+            pass
+        self.misses += 1
+        return None
+    
+    def set(self, company_name: str, ticker: str):
+        """Store a resolved ticker (cache write failures are ignored)"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_json(self._path(company_name), {'ticker': ticker, 'timestamp': time.time()})
+        except Exception as e:
+            print(f"  ⚠️ Could not cache ticker for {company_name}: {e}")
+
+
 class TickerSymbolFetcher:
     """Fetch NSE ticker symbols from Screener.in"""
     
@@ -22,27 +108,11 @@ class TickerSymbolFetcher:
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        self.cache = TickerCache()
     
     def _expand_abbreviations(self, s: str) -> str:
         """Expand common finance abbreviations to improve hits"""
-        repls = {
-            ' fin serv ': ' finance services ',
-            ' fin. serv. ': ' finance services ',
-            ' fin ': ' finance ',
-            ' inv ': ' investment ',
-            ' inv. ': ' investment ',
-            ' serv ': ' services ',
-            ' serv. ': ' services ',
-            ' ind ': ' industries ',
-            ' ind. ': ' industries ',
-            ' m  m ': ' mahindra  mahindra ',
-            ' m & m ': ' mahindra & mahindra ',
-            'cholaman': 'cholamandalam',
-            'cholamandlam': 'cholamandalam'
-        }
-        x = f" {s.lower()} "
-        for k, v in repls.items():
-            x = x.replace(k, v)
+        x = _ABBREVIATION_RE.sub(lambda m: _ABBREVIATIONS[m.group(0)], f" {s.lower()} ")
         return ' '.join(x.split())
 
     def _query_variants(self, company_name: str) -> List[str]:
@@ -52,7 +122,7 @@ class TickerSymbolFetcher:
         # Normalizations
         v = base.replace('&', ' and ')
         v = v.replace('.', ' ')
-        v = re.sub(r'[^\w\s&]', ' ', v)
+        v = _NON_WORD_RE.sub(' ', v)
         v = ' '.join(v.split())
         variants.append(v)
 
@@ -63,24 +133,40 @@ class TickerSymbolFetcher:
         variants = list(dict.fromkeys([x for x in variants if x]))
         return variants
 
-    def _extract_code_from_page(self, url_path: str) -> Optional[str]:
+    async def _get(self, session: aiohttp.ClientSession, url: str, params: Optional[dict] = None) -> Optional[str]:
+        """GET url and return the body, or None on a non-200 response after retries"""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status == 200:
+                        return await response.text()
+                    if response.status not in RETRY_STATUSES:
+                        return None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == MAX_RETRIES:
+                    raise
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        return None
+
+    async def _extract_code_from_page(self, session: aiohttp.ClientSession, url_path: str) -> Optional[str]:
         try:
-            page = requests.get(self.base_url + url_path, headers=self.headers, timeout=10)
-            if page.status_code != 200:
+            html = await self._get(session, self.base_url + url_path)
+            if html is None:
                 return None
-            html = page.text
-            m = re.search(r'NSE\s*:\s*([A-Z0-9&\.\-]+)', html)
+            m = _NSE_CODE_RE.search(html)
             if m:
                 return m.group(1)
         except Exception:
             return None
         return None
 
-    def search_company(self, company_name: str) -> Optional[str]:
+    async def search_company(self, session: aiohttp.ClientSession, company_name: str) -> Optional[str]:
         """
         Search for company and return NSE ticker symbol
         
         Args:
+            session: Shared aiohttp session (carries headers and timeout)
             company_name: Company name to search
             
         Returns:
@@ -98,18 +184,17 @@ class TickerSymbolFetcher:
             if key in manual:
                 return manual[key]
 
+            cached = self.cache.get(company_name)
+            if cached:
+                print(f"  💾 {company_name} → {cached} (cached)")
+                return cached
+
             # Try multiple query variants
             for q in self._query_variants(company_name):
-                params = {'q': q}
-                response = requests.get(
-                    self.search_url,
-                    params=params,
-                    headers=self.headers,
-                    timeout=10
-                )
-                if response.status_code != 200:
+                body = await self._get(session, self.search_url, params={'q': q})
+                if body is None:
                     continue
-                data = response.json()
+                data = json.loads(body)
                 if not data:
                     continue
                 first = data[0]
@@ -117,19 +202,22 @@ class TickerSymbolFetcher:
                 code = first.get('nse_code') or first.get('nseSymbol')
                 if code:
                     print(f"  ✅ {company_name} → {code}")
+                    self.cache.set(company_name, code)
                     return code
                 # Else try URL
                 url = first.get('url') or ''
-                m = re.search(r'/company/([A-Z0-9&\.\-]+)/', url)
+                m = _COMPANY_URL_RE.search(url)
                 if m:
                     code = m.group(1)
                     print(f"  ✅ {company_name} → {code}")
+                    self.cache.set(company_name, code)
                     return code
                 # As last resort, open page and parse NSE code
                 if url:
-                    code = self._extract_code_from_page(url)
+                    code = await self._extract_code_from_page(session, url)
                     if code:
                         print(f"  ✅ {company_name} → {code}")
+                        self.cache.set(company_name, code)
                         return code
             
             print(f"  ⚠️ {company_name}: No ticker found")
@@ -142,11 +230,11 @@ class TickerSymbolFetcher:
     def _clean_company_name(self, name: str) -> str:
         """Clean company name for better search results"""
         # Remove common suffixes
-        name = re.sub(r'\s+(Ltd\.?|Limited|Pvt\.?|Private|Inc\.?|Corp\.?|Co\.?|Company\s+Ltd\.?)+$', '', name, flags=re.IGNORECASE)
+        name = _COMPANY_SUFFIX_RE.sub('', name)
         # Normalize
         name = name.replace('&', ' and ')
         name = name.replace('.', ' ')
-        name = re.sub(r'[^\w\s&]', ' ', name)
+        name = _NON_WORD_RE.sub(' ', name)
         name = ' '.join(name.split())
         
         return name
@@ -164,28 +252,35 @@ class TickerSymbolFetcher:
         print(f"\n🔍 Fetching ticker symbols for {len(company_names)} companies...")
         print("=" * 80)
         
-        mapping = {}
-        
-        for i, company_name in enumerate(company_names, 1):
-            print(f"\n[{i}/{len(company_names)}] Searching: {company_name}")
-            
-            ticker = self.search_company(company_name)
-            
-            if ticker:
-                mapping[company_name] = ticker
-            
-            # Rate limiting - be nice to the server
-            time.sleep(1)
+        tickers = asyncio.run(self.fetch_all_async(company_names))
+        mapping = {name: ticker for name, ticker in zip(company_names, tickers) if ticker}
         
         print("\n" + "=" * 80)
         print(f"✅ Successfully found {len(mapping)}/{len(company_names)} ticker symbols")
+        print(f"💾 Ticker cache: {self.cache.hits} hits, {self.cache.misses} misses")
         
         return mapping
     
+    async def fetch_all_async(self, company_names: list) -> List[Optional[str]]:
+        """Search all companies concurrently, at most MAX_CONCURRENT_SEARCHES at a time"""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        
+        # One pooled keep-alive connection per concurrent search
+        connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_SEARCHES)
+        
+        async with aiohttp.ClientSession(headers=self.headers, timeout=timeout, connector=connector) as session:
+            async def bounded(i: int, company_name: str) -> Optional[str]:
+                async with semaphore:
+                    print(f"\n[{i}/{len(company_names)}] Searching: {company_name}")
+                    return await self.search_company(session, company_name)
+            
+            tasks = [bounded(i, name) for i, name in enumerate(company_names, 1)]
+            return await asyncio.gather(*tasks)
+    
     def save_mapping(self, mapping: Dict[str, str], filepath: str):
         """Save mapping to JSON file"""
-        with open(filepath, 'w') as f:
-            json.dump(mapping, f, indent=2)
+        write_json(filepath, mapping)
         print(f"\n💾 Saved mapping to: {filepath}")
 
 
@@ -196,16 +291,15 @@ def load_companies_from_snapshot():
         os.path.dirname(os.path.dirname(__file__)),
         'data',
         'performance_tracking',
-        'ranking_snapshots.json'
+        'ranking_snapshots.jsonl'
     )
     
     try:
-        with open(snapshot_path, 'r') as f:
-            snapshots = json.load(f)
+        migrate_legacy_snapshots(snapshot_path)
+        # Get latest snapshot by timestamp, whatever order the file is in
+        latest = max(iter_snapshots_file(snapshot_path), key=lambda s: s.get('timestamp') or '', default=None)
         
-        if snapshots and len(snapshots) > 0:
-            # Get latest snapshot
-            latest = snapshots[0]
+        if latest:
             companies = [r['company'] for r in latest['rankings']]
             print(f"📊 Loaded {len(companies)} companies from snapshot")
             return companies
@@ -246,10 +340,11 @@ def load_from_excel(excel_path: str) -> Tuple[List[str], Dict[str, str]]:
     companies will be used with scraping.
     """
     print(f"📄 Reading Excel: {excel_path}")
-    df = pd.read_excel(excel_path)
+    # Header only; the name/ticker columns are read once they are known
+    header = pd.read_excel(excel_path, nrows=0, engine=EXCEL_ENGINE)
 
     # Normalize columns
-    cols = {c.strip().lower(): c for c in df.columns if isinstance(c, str)}
+    cols = {c.strip().lower(): c for c in header.columns if isinstance(c, str)}
 
     name_cols = [
         c for key, c in cols.items()
@@ -272,24 +367,22 @@ def load_from_excel(excel_path: str) -> Tuple[List[str], Dict[str, str]]:
     if name_cols and ticker_cols:
         name_col = name_cols[0]
         tick_col = ticker_cols[0]
+        df = read_excel_columns(excel_path, header, [name_col, tick_col])
         sub = df[[name_col, tick_col]].dropna()
-        for _, row in sub.iterrows():
-            name = str(row[name_col]).strip()
-            tick = str(row[tick_col]).strip()
-            if name and tick and tick.lower() != 'nan':
-                direct_mapping[name] = tick
+        names = sub[name_col].astype(str).str.strip()
+        ticks = sub[tick_col].astype(str).str.strip()
+        valid = (names != '') & (ticks != '') & (ticks.str.lower() != 'nan')
+        direct_mapping = dict(zip(names[valid].tolist(), ticks[valid].tolist()))
         companies = list(direct_mapping.keys())
         print(f"📊 Loaded {len(companies)} companies with tickers from Excel")
         return companies, direct_mapping
 
     # Else, try to get a single column of company names
-    candidate_cols = ticker_cols or name_cols or list(df.columns)
-    series = df[candidate_cols[0]].dropna()
-    for v in series:
-        s = str(v).strip()
-        if s and s.lower() != 'nan':
-            companies.append(s)
-    companies = list(dict.fromkeys(companies))  # de-duplicate preserve order
+    candidate_cols = ticker_cols or name_cols or list(header.columns)
+    df = read_excel_columns(excel_path, header, candidate_cols[:1])
+    series = df[candidate_cols[0]].dropna().astype(str).str.strip()
+    series = series[(series != '') & (series.str.lower() != 'nan')]
+    companies = series.drop_duplicates().tolist()  # de-duplicate preserve order
     print(f"📊 Loaded {len(companies)} companies from Excel (no ticker column found)")
     return companies, {}
 
@@ -1,34 +1,43 @@
 """
 Generate a new ranking snapshot from an Excel/CSV file and append it to
-backend/data/performance_tracking/ranking_snapshots.json
+backend/data/performance_tracking/ranking_snapshots.jsonl (one snapshot per line)
 
 Minimal snapshot compatible with backtest:
 - snapshot_id
 - timestamp
 - philosophy
 - rankings: list of {rank, company, symbol}
+- summary: {total_companies}
 
 Usage:
   python scripts/generate_snapshot_from_excel.py --excel "Z:\\screener.in data\\FINANCE SCRRNER.xlsx" \
       --philosophy buffett --backdate-months 6
 """
 import argparse
-import json
 import os
+import sys
 from datetime import datetime, timedelta
 from typing import List, Tuple
 import pandas as pd
 
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_io import EXCEL_ENGINE, json_line, read_excel_columns
+from utils.performance_tracking import migrate_legacy_snapshots
+
+
 SNAPSHOTS_PATH = os.path.join(
     os.path.dirname(os.path.dirname(__file__)),
-    'data', 'performance_tracking', 'ranking_snapshots.json'
+    'data', 'performance_tracking', 'ranking_snapshots.jsonl'
 )
 
 
 def load_names_and_symbols(excel_path: str) -> Tuple[List[str], List[str]]:
-    df = pd.read_excel(excel_path)
+    # Header only; the name/ticker columns are read once they are known
+    header = pd.read_excel(excel_path, nrows=0, engine=EXCEL_ENGINE)
     # Normalize columns
-    cols = {c.strip().lower(): c for c in df.columns if isinstance(c, str)}
+    cols = {c.strip().lower(): c for c in header.columns if isinstance(c, str)}
 
     # Candidate columns for company name and ticker
     name_candidates = [
@@ -49,57 +58,39 @@ def load_names_and_symbols(excel_path: str) -> Tuple[List[str], List[str]]:
                     return v
         return None
 
-    name_col = pick(name_candidates) or (df.columns[0] if len(df.columns) else None)
+    name_col = pick(name_candidates) or (header.columns[0] if len(header.columns) else None)
     tick_col = pick(ticker_candidates)
 
     if name_col is None:
         raise ValueError("Could not find a company name column in the Excel file")
 
-    names = []
-    symbols = []
-
-    for _, row in df.iterrows():
-        name = str(row.get(name_col, '')).strip()
-        if not name or name.lower() == 'nan':
-            continue
-        names.append(name)
-        if tick_col:
-            sym = str(row.get(tick_col, '')).strip()
-            symbols.append(sym if sym and sym.lower() != 'nan' else name)
-        else:
-            # Use company name as symbol; market_data_fetcher will map via symbol_mapping
-            symbols.append(name)
+    df = read_excel_columns(excel_path, header, [name_col, tick_col] if tick_col else [name_col])
 
-    # De-duplicate while preserving order
-    seen = set()
-    names_out, symbols_out = [], []
-    for n, s in zip(names, symbols):
-        if n not in seen:
-            seen.add(n)
-            names_out.append(n)
-            symbols_out.append(s)
+    names = df[name_col].astype(str).str.strip()
+    mask = (names != '') & (names.str.lower() != 'nan')
+    names = names[mask]
 
-    return names_out, symbols_out
+    if tick_col:
+        symbols = df.loc[mask, tick_col].astype(str).str.strip()
+        symbols = symbols.where((symbols != '') & (symbols.str.lower() != 'nan'), names)
+    else:
+        # Use company name as symbol; market_data_fetcher will map via symbol_mapping
+        symbols = names
+
+    # De-duplicate while preserving order
+    keep = ~names.duplicated(keep='first')
+    return names[keep].tolist(), symbols[keep].tolist()
 
 
 def ensure_snapshots_file():
     os.makedirs(os.path.dirname(SNAPSHOTS_PATH), exist_ok=True)
-    if not os.path.exists(SNAPSHOTS_PATH):
-        with open(SNAPSHOTS_PATH, 'w') as f:
-            json.dump([], f)
+    # Pre-JSONL store (a single JSON array) is converted on first use
+    migrate_legacy_snapshots(SNAPSHOTS_PATH)
 
 
 def append_snapshot(philosophy: str, companies: List[str], symbols: List[str], backdate_months: int = 0):
     ensure_snapshots_file()
 
-    with open(SNAPSHOTS_PATH, 'r') as f:
-        try:
-            snapshots = json.load(f)
-            if not isinstance(snapshots, list):
-                snapshots = []
-        except Exception:
-            snapshots = []
-
     # Compute timestamp
     ts = datetime.now()
     if backdate_months and backdate_months > 0:
@@ -119,14 +110,15 @@ def append_snapshot(philosophy: str, companies: List[str], symbols: List[str], b
         'snapshot_id': snapshot_id,
         'timestamp': ts.isoformat(),
         'philosophy': philosophy,
-        'rankings': rankings
+        'rankings': rankings,
+        'summary': {
+            'total_companies': len(rankings)
+        }
     }
 
-    # Prepend so it's the latest
-    snapshots.insert(0, snapshot)
-
-    with open(SNAPSHOTS_PATH, 'w') as f:
-        json.dump(snapshots, f, indent=2)
+    # Newest snapshot is the last line
+    with open(SNAPSHOTS_PATH, 'ab') as f:
+        f.write(json_line(snapshot))
 
     print("✅ Snapshot created:")
     print(f"  ID:        {snapshot_id}")
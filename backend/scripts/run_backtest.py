@@ -2,32 +2,60 @@
 6-Month Backtesting Script
 Validates ranking model performance against actual returns
 """
+import io
+import os
+import pickle
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
 from datetime import datetime, timedelta
-import json
-from typing import Optional
+from typing import Dict, List, Optional, Union
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
 try:
-    from utils.performance_tracking import tracker
-    from utils.market_data_fetcher import fetcher, INDIAN_BENCHMARKS
+    from utils.performance_tracking import tracker, iter_snapshots_file, read_snapshots_file, migrate_legacy_snapshots
+    from utils.market_data_fetcher import fetcher, INDIAN_BENCHMARKS, RETURNS_MAX_WORKERS
 except ImportError as e:
     print(f"❌ Error importing modules: {e}")
     print("Make sure you've installed: pip install yfinance pandas")
     sys.exit(1)
 
 
-def run_6month_backtest(snapshot_id: str = None, auto_validate_all: bool = False, snapshots_path: Optional[str] = None):
+# Snapshots parsed per vectorized timestamp filter while streaming the file
+FILTER_BATCH_SIZE = 1000
+
+
+def _keep_old_snapshots(batch: List[Dict], cutoff_date: datetime, old_snapshots: List[Dict], old_dates: list):
+    """Append the batch's snapshots older than cutoff_date (timestamps parsed once, vectorized)"""
+    if not batch:
+        return
+    timestamps = pd.to_datetime(pd.Index([s.get('timestamp') for s in batch]), format='ISO8601', errors='coerce')
+    for snapshot in (s for s, ts in zip(batch, timestamps) if pd.isna(ts)):
+        print(f"⚠️ Skipping snapshot {snapshot.get('snapshot_id')} with unreadable timestamp: {snapshot.get('timestamp')!r}")
+    is_old = timestamps < pd.Timestamp(cutoff_date)
+    old_snapshots.extend(s for s, old in zip(batch, is_old) if old)
+    old_dates.extend(timestamps[is_old])
+
+
+def run_6month_backtest(
+    snapshot_id: str = None,
+    auto_validate_all: bool = False,
+    snapshots_path: Optional[str] = None,
+    max_workers: int = RETURNS_MAX_WORKERS,
+    quiet: bool = False
+):
     """
     Run 6-month backtest on ranking snapshots
     
     Args:
         snapshot_id: Specific snapshot to validate (optional)
         auto_validate_all: Validate all snapshots older than 6 months
+            (also the default when stdin is not a terminal)
+        max_workers: Concurrent Yahoo Finance requests per batch
+        quiet: Skip the per-snapshot listing
     """
     print("=" * 80)
     print("📊 6-MONTH BACKTESTING SYSTEM")
@@ -36,7 +64,9 @@ def run_6month_backtest(snapshot_id: str = None, auto_validate_all: bool = False
     # If a snapshots path is provided (or default exists), align tracker storage to that file
     try:
         base_path = Path(__file__).parents[1]  # backend/
-        default_path = base_path / 'data' / 'performance_tracking' / 'ranking_snapshots.json'
+        default_path = base_path / 'data' / 'performance_tracking' / 'ranking_snapshots.jsonl'
+        # The tracker migrates relative to the cwd; convert the store next to this script too
+        migrate_legacy_snapshots(default_path)
         selected_path = Path(snapshots_path) if snapshots_path else default_path
         if selected_path.exists():
             tracker.storage_path = selected_path.parent
@@ -46,27 +76,41 @@ def run_6month_backtest(snapshot_id: str = None, auto_validate_all: bool = False
     except Exception as _e:
         pass
 
-    # Load all snapshots
-    snapshots = tracker._load_snapshots()
-    loader_info = "tracker._load_snapshots()"
-
-    # If no snapshots found, try explicit path (CLI or default JSON)
-    if not snapshots:
-        try:
-            base_path = Path(__file__).parents[1]  # backend/
-            default_path = base_path / 'data' / 'performance_tracking' / 'ranking_snapshots.json'
-            path_to_read = Path(snapshots_path) if snapshots_path else default_path
-            print(f"\n⚙️  Fallback: loading snapshots directly from: {path_to_read}")
-            if path_to_read.exists():
-                with path_to_read.open('r', encoding='utf-8') as f:
-                    snapshots = json.load(f)
-                loader_info = f"json.load({path_to_read})"
-            else:
-                print(f"\n⚠️ Path does not exist: {path_to_read}")
-        except Exception as e:
-            print(f"\n⚠️ Fallback load failed: {e}")
-    
-    if not snapshots:
+    # Calculate cutoff date (6 months ago)
+    cutoff_date = datetime.now() - timedelta(days=180)
+    
+    # Stream the tracker's file, or fall back to the explicit path (CLI or default JSONL)
+    path_to_read = Path(tracker.snapshots_file)
+    loader_info = f"iter_snapshots_file({path_to_read})"
+    if not path_to_read.exists():
+        base_path = Path(__file__).parents[1]  # backend/
+        default_path = base_path / 'data' / 'performance_tracking' / 'ranking_snapshots.jsonl'
+        path_to_read = Path(snapshots_path) if snapshots_path else default_path
+        loader_info = f"iter_snapshots_file({path_to_read})"
+        print(f"\n⚙️  Fallback: loading snapshots directly from: {path_to_read}")
+        if not path_to_read.exists():
+            print(f"\n⚠️ Path does not exist: {path_to_read}")
+    
+    # Keep only snapshots older than 6 months while parsing, so newer ones are never held in memory
+    total_snapshots = 0
+    first_timestamp = None
+    old_snapshots = []
+    old_dates = []
+    batch = []
+    try:
+        for snapshot in iter_snapshots_file(path_to_read):
+            total_snapshots += 1
+            if first_timestamp is None:
+                first_timestamp = snapshot.get('timestamp')
+            batch.append(snapshot)
+            if len(batch) >= FILTER_BATCH_SIZE:
+                _keep_old_snapshots(batch, cutoff_date, old_snapshots, old_dates)
+                batch = []
+    except Exception as e:
+        print(f"\n⚠️ Snapshot load stopped early: {e}")
+    _keep_old_snapshots(batch, cutoff_date, old_snapshots, old_dates)
+    
+    if not total_snapshots:
         print("\n❌ No snapshots found!")
         print(f"   Loader used: {loader_info}")
         print("\nTo create snapshots:")
@@ -75,53 +119,47 @@ def run_6month_backtest(snapshot_id: str = None, auto_validate_all: bool = False
         print("3. System automatically saves snapshots")
         return
     
-    print(f"\n✅ Found {len(snapshots)} snapshots (via {loader_info})")
-    
-    # Calculate cutoff date (6 months ago)
-    cutoff_date = datetime.now() - timedelta(days=180)
-    
-    # Filter snapshots older than 6 months
-    old_snapshots = []
-    for snapshot in snapshots:
-        snapshot_date = datetime.fromisoformat(snapshot['timestamp'])
-        if snapshot_date < cutoff_date:
-            old_snapshots.append(snapshot)
+    print(f"\n✅ Found {total_snapshots} snapshots (via {loader_info})")
     
     print(f"📅 Snapshots older than 6 months: {len(old_snapshots)}")
     
     if not old_snapshots:
         print("\n⚠️ No snapshots old enough for 6-month validation")
-        print(f"   Oldest snapshot: {snapshots[0]['timestamp']}")
+        print(f"   Oldest snapshot: {first_timestamp}")
         print(f"   Need snapshots before: {cutoff_date.date()}")
         print("\n💡 For testing purposes, you can:")
-        print("   1. Manually edit snapshot timestamps in data/performance_tracking/ranking_snapshots.json")
+        print("   1. Manually edit snapshot timestamps in data/performance_tracking/ranking_snapshots.jsonl")
         print("   2. Or wait 6 months for real validation")
         return
     
-    # Display available snapshots
-    print("\n📋 Available Snapshots for Validation:")
-    print("-" * 80)
-    for i, snapshot in enumerate(old_snapshots, 1):
-        snapshot_date = datetime.fromisoformat(snapshot['timestamp'])
-        has_validation = 'validation' in snapshot
-        status = "✅ Validated" if has_validation else "⏳ Pending"
-        
-        print(f"{i}. {snapshot['snapshot_id']}")
-        print(f"   Date: {snapshot_date.date()}")
-        print(f"   Philosophy: {snapshot['philosophy']}")
-        companies_count = (
-            snapshot.get('summary', {}).get('total_companies')
-            or len(snapshot.get('rankings', []))
-        )
-        print(f"   Companies: {companies_count}")
-        print(f"   Status: {status}")
-        print()
+    # Display available snapshots (built in a buffer and written once, not one print per line)
+    if not quiet:
+        buf = io.StringIO()
+        buf.write("\n📋 Available Snapshots for Validation:\n")
+        buf.write("-" * 80 + "\n")
+        for i, (snapshot, snapshot_date) in enumerate(zip(old_snapshots, old_dates), 1):
+            has_validation = 'validation' in snapshot
+            status = "✅ Validated" if has_validation else "⏳ Pending"
+            
+            buf.write(f"{i}. {snapshot['snapshot_id']}\n")
+            buf.write(f"   Date: {snapshot_date.date()}\n")
+            buf.write(f"   Philosophy: {snapshot['philosophy']}\n")
+            # Both snapshot writers store summary.total_companies
+            companies_count = snapshot.get('summary', {}).get('total_companies')
+            if companies_count is None:
+                buf.write("   ⚠️ Missing summary.total_companies (written by an older snapshot generator)\n")
+                companies_count = '?'
+            buf.write(f"   Companies: {companies_count}\n")
+            buf.write(f"   Status: {status}\n\n")
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
     
     # Validate specific snapshot or all
     if snapshot_id:
-        validate_single_snapshot(snapshot_id)
-    elif auto_validate_all:
-        validate_all_snapshots(old_snapshots)
+        validate_single_snapshot(snapshot_id, max_workers=max_workers)
+    elif auto_validate_all or not sys.stdin.isatty():
+        # Unattended runs (cron/CI) never block on the interactive menu
+        validate_all_snapshots(old_snapshots, max_workers=max_workers)
     else:
         # Interactive mode
         print("\n🎯 What would you like to do?")
@@ -134,18 +172,38 @@ def run_6month_backtest(snapshot_id: str = None, auto_validate_all: bool = False
         
         if choice == "1":
             snapshot_id = input("Enter snapshot ID: ").strip()
-            validate_single_snapshot(snapshot_id)
+            validate_single_snapshot(snapshot_id, max_workers=max_workers)
         elif choice == "2":
-            validate_all_snapshots(old_snapshots)
+            validate_all_snapshots(old_snapshots, max_workers=max_workers)
         elif choice == "3":
             show_performance_report()
         else:
             print("Exiting...")
 
 
-def validate_single_snapshot(snapshot_id: str, snapshots: Optional[list] = None, snapshots_path: Optional[str] = None):
+def resolve_tickers(raw_symbols) -> Dict[str, str]:
+    """Map ranking symbols/company names to tickers, once per distinct symbol"""
+    resolved = {}
+    for s in dict.fromkeys(raw_symbols):
+        try:
+            # Prefer explicit mapping, fallback to resolver
+            resolved[s] = fetcher.symbol_mapping.get(s) or fetcher._resolve_symbol(s)
+        except Exception:
+            resolved[s] = s
+    return resolved
+
+
+def validate_single_snapshot(
+    snapshot_id: str,
+    snapshots: Optional[Union[List[Dict], Dict[str, Dict]]] = None,
+    snapshots_path: Optional[str] = None,
+    max_workers: int = RETURNS_MAX_WORKERS,
+    resolved: Optional[Dict[str, str]] = None
+):
     """Validate a single snapshot
+    snapshots may be a list or a dict indexed by snapshot_id (O(1) lookup for batch runs).
     If snapshots is None, try tracker loader; if empty, try loading from snapshots_path.
+    resolved maps ranking symbols to tickers (see resolve_tickers); batch runs build it once.
     """
     print("\n" + "=" * 80)
     print(f"🔄 VALIDATING SNAPSHOT: {snapshot_id}")
@@ -159,18 +217,16 @@ def validate_single_snapshot(snapshot_id: str, snapshots: Optional[list] = None,
             if not loaded:
                 # Fallback to explicit path
                 base_path = Path(__file__).parents[1]
-                default_path = base_path / 'data' / 'performance_tracking' / 'ranking_snapshots.json'
+                default_path = base_path / 'data' / 'performance_tracking' / 'ranking_snapshots.jsonl'
+                migrate_legacy_snapshots(default_path)
                 path_to_read = Path(snapshots_path) if snapshots_path else default_path
                 if path_to_read.exists():
-                    with path_to_read.open('r', encoding='utf-8') as f:
-                        loaded = json.load(f)
+                    loaded = read_snapshots_file(path_to_read)
 
-        snapshot = None
-        
-        for s in loaded or []:
-            if s['snapshot_id'] == snapshot_id:
-                snapshot = s
-                break
+        if isinstance(loaded, dict):
+            snapshot = loaded.get(snapshot_id)
+        else:
+            snapshot = next((s for s in loaded or [] if s['snapshot_id'] == snapshot_id), None)
         
         if not snapshot:
             print(f"❌ Snapshot {snapshot_id} not found")
@@ -180,14 +236,9 @@ def validate_single_snapshot(snapshot_id: str, snapshots: Optional[list] = None,
         snapshot_date = datetime.fromisoformat(snapshot['timestamp'])
         raw_symbols = [r['symbol'] for r in snapshot['rankings'][:50]]
         # Resolve to tickers ahead of time to avoid malformed Yahoo symbols with spaces
-        symbols = []
-        for s in raw_symbols:
-            try:
-                # Prefer explicit mapping, fallback to resolver
-                mapped = fetcher.symbol_mapping.get(s) or fetcher._resolve_symbol(s)
-                symbols.append(mapped)
-            except Exception:
-                symbols.append(s)
+        if resolved is None:
+            resolved = resolve_tickers(raw_symbols)
+        symbols = [resolved.get(s, s) for s in raw_symbols]
         
         print(f"\n📅 Snapshot Date: {snapshot_date.date()}")
         print(f"📊 Philosophy: {snapshot['philosophy']}")
@@ -195,23 +246,27 @@ def validate_single_snapshot(snapshot_id: str, snapshots: Optional[list] = None,
         print(f"\n🔄 Fetching actual returns from Yahoo Finance...")
         print("   (This may take 1-2 minutes...)")
         
-        # Fetch actual returns
-        returns_data = fetcher.get_stock_returns(
-            symbols=symbols,
-            start_date=snapshot_date,
-            period_months=6
-        )
+        # Fetch actual returns and the Nifty 50 benchmark return concurrently
+        print(f"📈 Fetching Nifty 50 benchmark return alongside...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            returns_future = executor.submit(
+                fetcher.get_stock_returns_batched,
+                symbols=symbols,
+                start_date=snapshot_date,
+                period_months=6,
+                max_workers=max_workers
+            )
+            benchmark_future = executor.submit(
+                fetcher.get_benchmark_return,
+                benchmark='^NSEI',
+                start_date=snapshot_date,
+                period_months=6
+            )
+            returns_data = returns_future.result()
+            benchmark_return = benchmark_future.result()
         
         print(f"\n✅ Successfully fetched returns for {len(returns_data)}/{len(symbols)} stocks")
         
-        # Fetch benchmark return
-        print(f"\n📈 Fetching Nifty 50 benchmark return...")
-        benchmark_return = fetcher.get_benchmark_return(
-            benchmark='^NSEI',
-            start_date=snapshot_date,
-            period_months=6
-        )
-        
         # Add returns to snapshot
         validation = tracker.add_actual_returns(
             snapshot_id=snapshot_id,
@@ -273,30 +328,57 @@ def validate_single_snapshot(snapshot_id: str, snapshots: Optional[list] = None,
         traceback.print_exc()
 
 
-def validate_all_snapshots(old_snapshots: list):
+def validate_all_snapshots(old_snapshots: list, max_workers: int = RETURNS_MAX_WORKERS):
     """Validate all old snapshots"""
     print("\n" + "=" * 80)
     print(f"🔄 BATCH VALIDATION: {len(old_snapshots)} snapshots")
     print("=" * 80)
     
     results = []
+    snapshot_index = {s['snapshot_id']: s for s in old_snapshots}
+    # Resolve the ticker universe of the whole batch once
+    resolved = resolve_tickers(r['symbol'] for s in old_snapshots for r in s['rankings'][:50])
+    pending = [
+        s for s in old_snapshots
+        if not ('validation' in s and '6m' in s.get('actual_returns', {}))
+    ]
     
-    for i, snapshot in enumerate(old_snapshots, 1):
-        snapshot_id = snapshot['snapshot_id']
-        
-        # Skip if already validated
-        if 'validation' in snapshot and '6m' in snapshot.get('actual_returns', {}):
-            print(f"\n⏭️ [{i}/{len(old_snapshots)}] {snapshot_id} - Already validated")
-            continue
-        
-        print(f"\n🔄 [{i}/{len(old_snapshots)}] Validating {snapshot_id}...")
+    # Validation results are written once at the end instead of once per snapshot
+    tracker.begin_batch()
+    try:
+        if len(pending) > 1:
+            # One close matrix covering every pending 6-month window; each snapshot slices it
+            start_dates = [datetime.fromisoformat(s['timestamp']) for s in pending]
+            universe = {resolved[r['symbol']] for s in pending for r in s['rankings'][:50]}
+            fetcher.prefetch_closes(
+                sorted(universe),
+                start_date=min(start_dates),
+                end_date=max(start_dates) + timedelta(days=6 * 30),
+                max_workers=max_workers
+            )
         
-        try:
-            validate_single_snapshot(snapshot_id)
-            results.append({'snapshot_id': snapshot_id, 'status': 'success'})
-        except Exception as e:
-            print(f"❌ Failed: {str(e)}")
-            results.append({'snapshot_id': snapshot_id, 'status': 'failed', 'error': str(e)})
+        for i, snapshot in enumerate(old_snapshots, 1):
+            snapshot_id = snapshot['snapshot_id']
+            
+            # Skip if already validated
+            if 'validation' in snapshot and '6m' in snapshot.get('actual_returns', {}):
+                print(f"\n⏭️ [{i}/{len(old_snapshots)}] {snapshot_id} - Already validated")
+                continue
+            
+            print(f"\n🔄 [{i}/{len(old_snapshots)}] Validating {snapshot_id}...")
+            
+            try:
+                # Reuse the already-loaded snapshots (indexed by id) instead of re-reading the file per snapshot
+                validate_single_snapshot(
+                    snapshot_id, snapshots=snapshot_index, max_workers=max_workers, resolved=resolved
+                )
+                results.append({'snapshot_id': snapshot_id, 'status': 'success'})
+            except Exception as e:
+                print(f"❌ Failed: {str(e)}")
+                results.append({'snapshot_id': snapshot_id, 'status': 'failed', 'error': str(e)})
+    finally:
+        fetcher.clear_prefetched()
+        tracker.commit_batch()
     
     # Summary
     print("\n" + "=" * 80)
@@ -316,13 +398,47 @@ def validate_all_snapshots(old_snapshots: list):
                 print(f"   - {r['snapshot_id']}: {r.get('error', 'Unknown error')}")
 
 
+def _cached_performance_report() -> Dict:
+    """
+    generate_performance_report, memoized on disk between runs
+    
+    Keyed by the snapshots file's (mtime_ns, size), so any new snapshot or
+    validation recomputes it.
+    """
+    snapshots_file = Path(tracker.snapshots_file)
+    if not snapshots_file.exists():
+        return tracker.generate_performance_report()
+    
+    stat = snapshots_file.stat()
+    key = (str(snapshots_file.resolve()), stat.st_mtime_ns, stat.st_size)
+    cache_file = Path(tracker.storage_path) / 'report_cache.pkl'
+    
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('key') == key:
+            return cached['report']
+    except Exception:
+        pass
+    
+    report = tracker.generate_performance_report()
+    try:
+        tmp_file = cache_file.with_suffix('.pkl.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump({'key': key, 'report': report}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        print(f"⚠️ Could not cache performance report: {e}")
+    return report
+
+
 def show_performance_report():
     """Show overall performance report"""
     print("\n" + "=" * 80)
     print("📊 OVERALL PERFORMANCE REPORT")
     print("=" * 80)
     
-    report = tracker.generate_performance_report()
+    report = _cached_performance_report()
     
     if report.get('status') == 'No validated data available':
         print("\n⚠️ No validated data available yet")
@@ -374,9 +490,9 @@ def show_performance_report():
         print(f"   Hit Rate: {worst['validation']['hit_rate']:.1%}")
 
 
-def export_backtest_results():
-    """Export backtest results to CSV"""
-    output_file = "data/performance_tracking/backtest_results.csv"
+def export_backtest_results(fmt: str = 'parquet'):
+    """Export backtest results (Parquet by default, CSV on request)"""
+    output_file = f"data/performance_tracking/backtest_results.{fmt}"
     tracker.export_for_backtesting(output_file)
     print(f"\n✅ Backtest results exported to: {output_file}")
 
@@ -386,20 +502,25 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description='Run 6-month backtest on ranking model')
     parser.add_argument('--snapshot-id', help='Specific snapshot ID to validate')
-    parser.add_argument('--auto-validate-all', action='store_true', help='Automatically validate all old snapshots')
+    parser.add_argument('--auto-validate-all', action='store_true', help='Automatically validate all old snapshots (default when not run from a terminal)')
     parser.add_argument('--report', action='store_true', help='Show performance report only')
-    parser.add_argument('--export', action='store_true', help='Export backtest results to CSV')
-    parser.add_argument('--snapshots', type=str, default=None, help='Path to ranking_snapshots.json (override)')
+    parser.add_argument('--export', action='store_true', help='Export backtest results')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='parquet', help='File format for --export')
+    parser.add_argument('--snapshots', type=str, default=None, help='Path to ranking_snapshots.jsonl (override; a legacy .json array also works)')
+    parser.add_argument('--quiet', action='store_true', help='Do not list the available snapshots')
+    parser.add_argument('--max-workers', type=int, default=RETURNS_MAX_WORKERS, help='Concurrent Yahoo Finance requests')
     
     args = parser.parse_args()
     
     if args.report:
         show_performance_report()
     elif args.export:
-        export_backtest_results()
+        export_backtest_results(args.format)
     else:
         run_6month_backtest(
             snapshot_id=args.snapshot_id,
             auto_validate_all=args.auto_validate_all,
-            snapshots_path=args.snapshots
+            snapshots_path=args.snapshots,
+            max_workers=args.max_workers,
+            quiet=args.quiet
         )
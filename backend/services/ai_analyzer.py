@@ -2,18 +2,50 @@
 AI-Powered Analysis Service
 Uses LLM for intelligent transcript analysis with real insights
 """
+import asyncio
 import os
 import re
-from typing import Dict, List
+from typing import Dict, List, Optional
 import json
 
 # Check if Ollama is available
 try:
     import requests
+    from requests.adapters import HTTPAdapter
     REQUESTS_AVAILABLE = True
 except ImportError:
     REQUESTS_AVAILABLE = False
 
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+OLLAMA_TIMEOUT = 180  # 3 minutes per analysis
+OLLAMA_CONNECT_TIMEOUT = 10
+
+# Heuristic patterns, compiled once (all are matched against the lowercased transcript)
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+_REVENUE_PATTERNS = (
+    re.compile(r'revenue.*?(?:grew|increased|grew by|up).*?(\d+(?:\.\d+)?)\s*(?:%|percent)'),
+    re.compile(r'(?:top|top-line|topline).*?growth.*?(\d+(?:\.\d+)?)\s*(?:%|percent)'),
+    re.compile(r'sales.*?(?:grew|increased).*?(\d+(?:\.\d+)?)\s*(?:%|percent)'),
+)
+
+_MARGIN_PATTERNS = (
+    re.compile(r'(?:ebitda|operating|net)\s+margin.*?(?:expanded|improved|increased).*?(\d+(?:\.\d+)?)\s*(?:%|percent|basis points|bps)'),
+    re.compile(r'margin.*?(?:expanded|improved).*?(\d+(?:\.\d+)?)\s*(?:basis points|bps)'),
+    re.compile(r'margin.*?(?:at|of|was).*?(\d+(?:\.\d+)?)\s*%'),
+)
+
+_REVENUE_GUIDANCE_RE = re.compile(
+    r'(?:revenue|sales).*?(?:guidance|target|expect|forecast).*?(\d+(?:\.\d+)?)\s*(?:%|percent|crore|million|billion)'
+)
+_MARGIN_GUIDANCE_RE = re.compile(r'(?:margin|ebitda).*?(?:guidance|target|expect).*?(\d+(?:\.\d+)?)\s*%')
+_CAPEX_GUIDANCE_RE = re.compile(r'capex.*?(?:guidance|plan|expect).*?(\d+(?:,\d+)?)\s*(?:crore|million|billion)')
+
 
 class AIAnalyzer:
     """AI-powered transcript analyzer with intelligent insights using Ollama"""
@@ -21,11 +53,21 @@ class AIAnalyzer:
     def __init__(self):
         self.ollama_url = os.getenv('OLLAMA_URL', 'http://localhost:11434')
         self.ollama_model = os.getenv('OLLAMA_MODEL', 'llama3.1:8b')
+        # Concurrent /api/chat requests in analyze_quarters_batch; set it to the
+        # Ollama server's OLLAMA_NUM_PARALLEL so requests do not queue server-side
+        self.num_parallel = max(1, int(os.getenv('OLLAMA_NUM_PARALLEL', '4')))
         
         # Check if Ollama is running
+        self.session = None
         if REQUESTS_AVAILABLE:
+            # One keep-alive pool for the probe and every sync /api/chat call
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.num_parallel, max_retries=0)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.session.headers.update({'Connection': 'keep-alive', 'Accept-Encoding': 'gzip'})
             try:
-                response = requests.get(f"{self.ollama_url}/api/tags", timeout=2)
+                response = self.session.get(f"{self.ollama_url}/api/tags", timeout=2)
                 self.use_ai = response.status_code == 200
                 if self.use_ai:
                     print(f"✓ Ollama connected - Using model: {self.ollama_model}")
@@ -36,22 +78,63 @@ class AIAnalyzer:
             print("✗ Requests library not available")
             self.use_ai = False
     
-    def analyze_quarter_with_ai(self, text: str, quarter: str, company: str, model: str = None, temperature: float = None, max_chars: int = 0) -> Dict:
+    def close(self):
+        """Release pooled HTTP connections"""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def analyze_quarter_with_ai(self, text: str, quarter: str, company: str, model: str = None, temperature: float = None, max_chars: int = 0, text_lower: str = None) -> Dict:
         """
         Analyze quarter transcript with AI for intelligent insights.
         Optional overrides: model, temperature, max_chars (prompt truncation).
+        Pass text_lower when the caller has already lowercased the transcript.
         """
         if self.use_ai and len(text) > 500:
-            return self._analyze_with_ollama(text, quarter, company, model=model, temperature=temperature, max_chars=max_chars)
+            return self._analyze_with_ollama(text, quarter, company, model=model, temperature=temperature, max_chars=max_chars, text_lower=text_lower)
         else:
-            return self._analyze_with_advanced_heuristics(text, quarter, company)
+            return self._analyze_with_advanced_heuristics(text, quarter, company, text_lower=text_lower)
     
-    def _analyze_with_ollama(self, text: str, quarter: str, company: str, model: str = None, temperature: float = None, max_chars: int = 0) -> Dict:
-        """Use Ollama for deep analysis"""
-        
-        active_model = (model or self.ollama_model)
-        print(f"🤖 Analyzing {quarter} for {company} with Ollama ({active_model})...")
-        
+    async def analyze_quarters_batch(self, quarters: List[Dict], model: str = None, temperature: float = None, max_chars: int = 0) -> List[Dict]:
+        """
+        Analyze several quarters concurrently, returning results in input order.
+        Each item has text, quarter, company and optionally text_lower.
+        At most num_parallel Ollama requests are in flight, over one shared session.
+        """
+        semaphore = asyncio.Semaphore(self.num_parallel)
+        
+        async def analyze_one(session, item: Dict) -> Dict:
+            text, quarter, company = item['text'], item['quarter'], item['company']
+            text_lower = item.get('text_lower')
+            if not (self.use_ai and len(text) > 500):
+                return self._analyze_with_advanced_heuristics(text, quarter, company, text_lower=text_lower)
+            async with semaphore:
+                if session is None:
+                    return await asyncio.to_thread(
+                        self._analyze_with_ollama, text, quarter, company,
+                        model=model, temperature=temperature, max_chars=max_chars, text_lower=text_lower
+                    )
+                return await self._analyze_with_ollama_async(
+                    session, text, quarter, company,
+                    model=model, temperature=temperature, max_chars=max_chars, text_lower=text_lower
+                )
+        
+        if not (self.use_ai and AIOHTTP_AVAILABLE):
+            return list(await asyncio.gather(*(analyze_one(None, item) for item in quarters)))
+        
+        timeout = aiohttp.ClientTimeout(total=OLLAMA_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT)
+        connector = aiohttp.TCPConnector(limit=self.num_parallel)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            return list(await asyncio.gather(*(analyze_one(session, item) for item in quarters)))
+    
+    def _chat_payload(self, text: str, quarter: str, company: str, active_model: str, temperature: Optional[float], max_chars: int) -> Dict:
+        """Request body for Ollama /api/chat"""
         # Truncate text to fit context window (default first 4500 chars for faster analysis)
         limit = max_chars if max_chars and max_chars > 0 else 4500
         analysis_text = text[:limit]
@@ -104,96 +187,127 @@ Return this JSON structure filled with data from the transcript above:
 
 IMPORTANT: Return ONLY the JSON object above, nothing else. No explanations, no markdown, just the JSON."""
 
+        return {
+            "model": active_model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are a financial analyst. You ONLY respond with valid JSON. Never include explanations or markdown formatting."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "stream": False,
+            "format": "json",
+            "options": {
+                "temperature": 0.1 if temperature is None else float(temperature),
+                "num_predict": 2000
+            }
+        }
+    
+    def _analyze_with_ollama(self, text: str, quarter: str, company: str, model: str = None, temperature: float = None, max_chars: int = 0, text_lower: str = None) -> Dict:
+        """Use Ollama for deep analysis"""
+        
+        active_model = (model or self.ollama_model)
+        print(f"🤖 Analyzing {quarter} for {company} with Ollama ({active_model})...")
+        
         try:
             # Call Ollama API using chat endpoint for better structured output
-            response = requests.post(
+            response = self.session.post(
                 f"{self.ollama_url}/api/chat",
-                json={
-                    "model": active_model,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "You are a financial analyst. You ONLY respond with valid JSON. Never include explanations or markdown formatting."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "stream": False,
-                    "format": "json",
-                    "options": {
-                        "temperature": 0.1 if temperature is None else float(temperature),
-                        "num_predict": 2000
-                    }
-                },
-                timeout=180  # 3 minutes timeout for analysis
+                json=self._chat_payload(text, quarter, company, active_model, temperature, max_chars),
+                timeout=OLLAMA_TIMEOUT
             )
+            response_data = response.json() if response.status_code == 200 else None
+            return self._parse_chat_response(response.status_code, response_data, text, quarter, company, text_lower)
+        
+        except Exception as e:
+            print(f"✗ Ollama analysis failed: {e}, falling back to heuristics")
+            return self._analyze_with_advanced_heuristics(text, quarter, company, text_lower=text_lower)
+    
+    async def _analyze_with_ollama_async(self, session, text: str, quarter: str, company: str, model: str = None, temperature: float = None, max_chars: int = 0, text_lower: str = None) -> Dict:
+        """_analyze_with_ollama over a shared aiohttp session"""
+        
+        active_model = (model or self.ollama_model)
+        print(f"🤖 Analyzing {quarter} for {company} with Ollama ({active_model})...")
+        
+        try:
+            async with session.post(
+                f"{self.ollama_url}/api/chat",
+                json=self._chat_payload(text, quarter, company, active_model, temperature, max_chars)
+            ) as response:
+                status = response.status
+                response_data = await response.json(content_type=None) if status == 200 else None
+            return self._parse_chat_response(status, response_data, text, quarter, company, text_lower)
+        
+        except Exception as e:
+            print(f"✗ Ollama analysis failed: {e}, falling back to heuristics")
+            return self._analyze_with_advanced_heuristics(text, quarter, company, text_lower=text_lower)
+    
+    def _parse_chat_response(self, status: int, response_data: Optional[Dict], text: str, quarter: str, company: str, text_lower: str = None) -> Dict:
+        """Turn an Ollama chat response into an analysis dict (heuristics when unusable)"""
+        if status == 200:
+            # Chat API returns message in different format
+            result_text = response_data.get('message', {}).get('content', '') or response_data.get('response', '')
+            print(f"✓ Ollama response received ({len(result_text)} chars)")
             
-            if response.status_code == 200:
-                response_data = response.json()
-                # Chat API returns message in different format
-                result_text = response_data.get('message', {}).get('content', '') or response_data.get('response', '')
-                print(f"✓ Ollama response received ({len(result_text)} chars)")
-                
-                # Extract JSON from response
-                json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-                if json_match:
-                    try:
-                        analysis = json.loads(json_match.group())
-                        print(f"✓ JSON parsed successfully")
-                        
-                        # Normalize all array fields that might contain objects
-                        def normalize_array(arr):
-                            """Convert array of objects to array of strings"""
-                            normalized = []
-                            for item in arr:
-                                if isinstance(item, dict):
-                                    # Try common patterns
-                                    if 'initiative' in item and 'details' in item:
-                                        normalized.append(f"{item['initiative']} - {item['details']}")
-                                    elif 'initiative' in item:
-                                        normalized.append(item['initiative'])
-                                    elif 'insight' in item:
-                                        normalized.append(item['insight'])
-                                    elif 'risk' in item:
-                                        normalized.append(item['risk'])
-                                    elif 'guidance' in item:
-                                        normalized.append(item['guidance'])
-                                    else:
-                                        # Fallback: join all values
-                                        normalized.append(' - '.join(str(v) for v in item.values() if v))
+            # Extract JSON from response
+            json_match = _JSON_OBJECT_RE.search(result_text)
+            if json_match:
+                try:
+                    analysis = json.loads(json_match.group())
+                    print(f"✓ JSON parsed successfully")
+                    
+                    # Normalize all array fields that might contain objects
+                    def normalize_array(arr):
+                        """Convert array of objects to array of strings"""
+                        normalized = []
+                        for item in arr:
+                            if isinstance(item, dict):
+                                # Try common patterns
+                                if 'initiative' in item and 'details' in item:
+                                    normalized.append(f"{item['initiative']} - {item['details']}")
+                                elif 'initiative' in item:
+                                    normalized.append(item['initiative'])
+                                elif 'insight' in item:
+                                    normalized.append(item['insight'])
+                                elif 'risk' in item:
+                                    normalized.append(item['risk'])
+                                elif 'guidance' in item:
+                                    normalized.append(item['guidance'])
                                 else:
-                                    normalized.append(str(item))
-                            return normalized
-                        
-                        # Normalize all list fields
-                        for field in ['strategic_initiatives', 'key_insights', 'risks_concerns', 'forward_guidance']:
-                            if field in analysis and isinstance(analysis[field], list):
-                                analysis[field] = normalize_array(analysis[field])
-                        
-                        return analysis
-                    except json.JSONDecodeError as je:
-                        print(f"✗ JSON parse error: {je}")
-                        print(f"Response preview: {result_text[:500]}")
-                        return self._analyze_with_advanced_heuristics(text, quarter, company)
-                else:
-                    print(f"✗ No JSON found in response")
+                                    # Fallback: join all values
+                                    normalized.append(' - '.join(str(v) for v in item.values() if v))
+                            else:
+                                normalized.append(str(item))
+                        return normalized
+                    
+                    # Normalize all list fields
+                    for field in ['strategic_initiatives', 'key_insights', 'risks_concerns', 'forward_guidance']:
+                        if field in analysis and isinstance(analysis[field], list):
+                            analysis[field] = normalize_array(analysis[field])
+                    
+                    return analysis
+                except json.JSONDecodeError as je:
+                    print(f"✗ JSON parse error: {je}")
                     print(f"Response preview: {result_text[:500]}")
-                    return self._analyze_with_advanced_heuristics(text, quarter, company)
+                    return self._analyze_with_advanced_heuristics(text, quarter, company, text_lower=text_lower)
             else:
-                print(f"✗ Ollama returned status {response.status_code}")
-                return self._analyze_with_advanced_heuristics(text, quarter, company)
-                
-        except Exception as e:
-            print(f"✗ Ollama analysis failed: {e}, falling back to heuristics")
-            return self._analyze_with_advanced_heuristics(text, quarter, company)
+                print(f"✗ No JSON found in response")
+                print(f"Response preview: {result_text[:500]}")
+                return self._analyze_with_advanced_heuristics(text, quarter, company, text_lower=text_lower)
+        else:
+            print(f"✗ Ollama returned status {status}")
+            return self._analyze_with_advanced_heuristics(text, quarter, company, text_lower=text_lower)
     
-    def _analyze_with_advanced_heuristics(self, text: str, quarter: str, company: str) -> Dict:
+    def _analyze_with_advanced_heuristics(self, text: str, quarter: str, company: str, text_lower: str = None) -> Dict:
         """
         Advanced heuristic analysis with intelligent pattern matching
         """
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         
         # Extract financial metrics with context
         financial_performance = self._extract_financial_metrics(text, text_lower)
@@ -243,29 +357,17 @@ IMPORTANT: Return ONLY the JSON object above, nothing else. No explanations, no
         """Extract specific financial metrics with context"""
         
         # Revenue growth patterns
-        revenue_patterns = [
-            r'revenue.*?(?:grew|increased|grew by|up).*?(\d+(?:\.\d+)?)\s*(?:%|percent)',
-            r'(?:top|top-line|topline).*?growth.*?(\d+(?:\.\d+)?)\s*(?:%|percent)',
-            r'sales.*?(?:grew|increased).*?(\d+(?:\.\d+)?)\s*(?:%|percent)'
-        ]
-        
         revenue_growth = "Not specified"
-        for pattern in revenue_patterns:
-            match = re.search(pattern, text_lower)
+        for pattern in _REVENUE_PATTERNS:
+            match = pattern.search(text_lower)
             if match:
                 revenue_growth = f"{match.group(1)}% growth"
                 break
         
         # Margin trends
-        margin_patterns = [
-            r'(?:ebitda|operating|net)\s+margin.*?(?:expanded|improved|increased).*?(\d+(?:\.\d+)?)\s*(?:%|percent|basis points|bps)',
-            r'margin.*?(?:expanded|improved).*?(\d+(?:\.\d+)?)\s*(?:basis points|bps)',
-            r'margin.*?(?:at|of|was).*?(\d+(?:\.\d+)?)\s*%'
-        ]
-        
         margin_trend = "Stable"
-        for pattern in margin_patterns:
-            match = re.search(pattern, text_lower)
+        for pattern in _MARGIN_PATTERNS:
+            match = pattern.search(text_lower)
             if match:
                 if 'expanded' in text_lower or 'improved' in text_lower:
                     margin_trend = f"Expanding (improved by {match.group(1)} bps)"
@@ -450,28 +552,19 @@ IMPORTANT: Return ONLY the JSON object above, nothing else. No explanations, no
         guidance = []
         
         # Revenue guidance
-        revenue_guidance = re.findall(
-            r'(?:revenue|sales).*?(?:guidance|target|expect|forecast).*?(\d+(?:\.\d+)?)\s*(?:%|percent|crore|million|billion)',
-            text_lower
-        )
+        revenue_guidance = _REVENUE_GUIDANCE_RE.search(text_lower)
         if revenue_guidance:
-            guidance.append(f"Revenue target: {revenue_guidance[0]}% growth expected")
+            guidance.append(f"Revenue target: {revenue_guidance.group(1)}% growth expected")
         
         # Margin guidance
-        margin_guidance = re.findall(
-            r'(?:margin|ebitda).*?(?:guidance|target|expect).*?(\d+(?:\.\d+)?)\s*%',
-            text_lower
-        )
+        margin_guidance = _MARGIN_GUIDANCE_RE.search(text_lower)
         if margin_guidance:
-            guidance.append(f"Margin target: {margin_guidance[0]}% expected")
+            guidance.append(f"Margin target: {margin_guidance.group(1)}% expected")
         
         # Capex guidance
-        capex_guidance = re.findall(
-            r'capex.*?(?:guidance|plan|expect).*?(\d+(?:,\d+)?)\s*(?:crore|million|billion)',
-            text_lower
-        )
+        capex_guidance = _CAPEX_GUIDANCE_RE.search(text_lower)
         if capex_guidance:
-            guidance.append(f"Capex plan: {capex_guidance[0]} for investments")
+            guidance.append(f"Capex plan: {capex_guidance.group(1)} for investments")
         
         # General outlook
         if 'optimistic' in text_lower or 'confident' in text_lower:
@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Union
+from typing import Dict, List, Any, BinaryIO, Union
 import io
 from datetime import datetime
 from .philosophy_scorer import PhilosophyScorer
@@ -38,21 +38,25 @@ class ExcelParser:
             }
         }
     
-    def parse_financial_data(self, file_content: bytes, filename: str) -> Dict[str, Any]:
-        """Parse financial data from Excel/CSV files"""
+    def parse_financial_data(self, file_content: Union[bytes, BinaryIO], filename: str) -> Dict[str, Any]:
+        """Parse financial data from Excel/CSV files (raw bytes or a seekable binary stream)"""
         try:
+            source = io.BytesIO(file_content) if isinstance(file_content, (bytes, bytearray)) else file_content
+            source.seek(0)
             if filename.endswith('.csv'):
-                df = pd.read_csv(io.BytesIO(file_content))
+                df = pd.read_csv(source)
                 all_sheets = {'Sheet1': df}
             else:
                 # Read all sheets from Excel file
                 try:
-                    all_sheets = pd.read_excel(io.BytesIO(file_content), sheet_name=None, engine='openpyxl')
+                    all_sheets = pd.read_excel(source, sheet_name=None, engine='openpyxl')
                 except Exception:
                     try:
-                        all_sheets = pd.read_excel(io.BytesIO(file_content), sheet_name=None, engine='xlrd')
+                        source.seek(0)
+                        all_sheets = pd.read_excel(source, sheet_name=None, engine='xlrd')
                     except Exception:
-                        all_sheets = pd.read_excel(io.BytesIO(file_content), sheet_name=None)
+                        source.seek(0)
+                        all_sheets = pd.read_excel(source, sheet_name=None)
                 
                 print(f"📊 Found {len(all_sheets)} sheets: {list(all_sheets.keys())}")
                 
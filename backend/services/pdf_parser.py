@@ -7,7 +7,7 @@ except ImportError:
 
 import pdfplumber
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, BinaryIO, Union
 import io
 
 class PDFParser:
@@ -44,15 +44,19 @@ class PDFParser:
             ]
         }
     
-    def extract_text(self, pdf_content: bytes) -> str:
-        """Extract text from PDF using multiple methods for better accuracy"""
+    def extract_text(self, pdf_content: Union[bytes, BinaryIO]) -> str:
+        """Extract text from PDF using multiple methods for better accuracy.
+        Accepts raw bytes or a seekable binary stream (such as an upload's spooled file).
+        """
         text = ""
+        pdf_stream = io.BytesIO(pdf_content) if isinstance(pdf_content, (bytes, bytearray)) else pdf_content
         
         try:
-            # Method 1: Try PyMuPDF if available
+            # Method 1: Try PyMuPDF if available (it needs the whole document in memory)
             if PYMUPDF_AVAILABLE and fitz:
                 try:
-                    pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+                    pdf_stream.seek(0)
+                    pdf_document = fitz.open(stream=pdf_stream.read(), filetype="pdf")
                     for page_num in range(pdf_document.page_count):
                         page = pdf_document[page_num]
                         text += page.get_text() + "\n"
@@ -64,7 +68,8 @@ class PDFParser:
             
             # Method 2: pdfplumber as fallback
             try:
-                with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
+                pdf_stream.seek(0)
+                with pdfplumber.open(pdf_stream) as pdf:
                     for page in pdf.pages:
                         page_text = page.extract_text()
                         if page_text:
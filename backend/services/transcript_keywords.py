@@ -0,0 +1,86 @@
+"""
+Transcript Keyword Counter
+Counts keyword categories in earnings call transcripts with a single multi-pattern scan
+"""
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Optional
+
+# Optional multi-pattern matcher for transcript keyword counting
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+# Keyword categories counted in every transcript (counts are summed per category)
+TRANSCRIPT_KEYWORDS = {
+    'revenue': ['revenue', 'sales', 'topline'],
+    'margin': ['margin', 'profitability', 'ebitda'],
+    'growth': ['growth', 'increase', 'expansion', 'accelerat'],
+    'positive': ['delivered', 'achieved', 'exceeded', 'outperformed', 'strong', 'robust', 'successful'],
+    'concern': ['missed', 'below', 'disappointed', 'shortfall', 'challenges', 'headwinds', 'pressure'],
+    'strategy': ['digital', 'transformation', 'innovation', 'technology', 'automation', 'ai', 'cloud'],
+    'customer': ['customer', 'client'],
+}
+
+# Transcripts above PARALLEL_THRESHOLD are scanned in WINDOW_SIZE tiles (across worker processes
+# when a pool is passed in).
+# Each tile carries WINDOW_OVERLAP extra chars so keywords straddling an edge are still seen,
+# but a match is only counted by the tile it starts in.
+WINDOW_SIZE = 64 * 1024
+WINDOW_OVERLAP = max(len(word) for words in TRANSCRIPT_KEYWORDS.values() for word in words) - 1
+PARALLEL_THRESHOLD = 1024 * 1024
+
+
+def _build_keyword_automaton():
+    """Build one Aho-Corasick automaton over all transcript keywords"""
+    automaton = ahocorasick.Automaton()
+    for category, words in TRANSCRIPT_KEYWORDS.items():
+        for word in words:
+            automaton.add_word(word, (len(word), category))
+    automaton.make_automaton()
+    return automaton
+
+
+KEYWORD_AUTOMATON = _build_keyword_automaton() if AHOCORASICK_AVAILABLE else None
+
+def create_keyword_pool() -> ProcessPoolExecutor:
+    """Worker pool for very large transcripts; the owner (the app lifespan) shuts it down"""
+    return ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
+
+
+def _count_window(window: str, limit: int) -> Dict[str, int]:
+    """Count keyword hits in one tile, ignoring matches that start at or after limit"""
+    counts = dict.fromkeys(TRANSCRIPT_KEYWORDS, 0)
+    for end, (length, category) in KEYWORD_AUTOMATON.iter(window):
+        if end - length + 1 < limit:
+            counts[category] += 1
+    return counts
+
+
+def count_keyword_categories(text_lower: str, pool: Optional[Executor] = None) -> Dict[str, int]:
+    """
+    Count keyword hits per category in the lowercased transcript
+    
+    Blocks until done; async callers should run transcripts above
+    PARALLEL_THRESHOLD in a worker thread (run_in_threadpool).
+    """
+    if KEYWORD_AUTOMATON is None:
+        return {
+            category: sum(text_lower.count(word) for word in words)
+            for category, words in TRANSCRIPT_KEYWORDS.items()
+        }
+
+    if len(text_lower) <= PARALLEL_THRESHOLD:
+        return _count_window(text_lower, len(text_lower))
+
+    windows = [text_lower[i:i + WINDOW_SIZE + WINDOW_OVERLAP] for i in range(0, len(text_lower), WINDOW_SIZE)]
+    totals = dict.fromkeys(TRANSCRIPT_KEYWORDS, 0)
+    limits = [WINDOW_SIZE] * len(windows)
+    results = pool.map(_count_window, windows, limits, chunksize=4) if pool else map(_count_window, windows, limits)
+    for counts in results:
+        for category, count in counts.items():
+            totals[category] += count
+    return totals
@@ -0,0 +1,73 @@
+"""
+Tests for MarketDataFetcher's batched return computation
+Run from backend/: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import types
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'utils'))
+
+# yfinance/aiohttp are only needed for network calls, which these tests replace
+for _name in ('yfinance', 'aiohttp'):
+    try:
+        __import__(_name)
+    except ImportError:
+        sys.modules[_name] = types.ModuleType(_name)
+if not hasattr(sys.modules['aiohttp'], 'ClientSession'):
+    sys.modules['aiohttp'].ClientSession = object  # only used in annotations here
+
+import market_data_fetcher  # noqa: E402
+from market_data_fetcher import MarketDataFetcher, ReturnsCache  # noqa: E402
+
+
+def _fake_download(closes_by_ticker):
+    """yf.download stand-in: one Close column per known ticker, raising for the others"""
+    def download(tickers, start=None, end=None, **kwargs):
+        known = [t for t in tickers if t in closes_by_ticker]
+        if not known:
+            raise RuntimeError("429 Too Many Requests")
+        return pd.concat({'Close': pd.concat({t: closes_by_ticker[t] for t in known}, axis=1)}, axis=1)
+    return download
+
+
+class BatchedReturnsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fetcher = MarketDataFetcher()
+        self.fetcher.returns_cache = ReturnsCache(os.path.join(self.tmp.name, 'returns.sqlite'))
+        # No BSE/NSE retries for the failed ticker
+        self.fetcher.get_stock_returns = lambda symbols, *args, **kwargs: {}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_failed_chunk_does_not_skew_other_returns(self):
+        days = pd.date_range('2024-01-01', periods=5)
+        closes = {
+            # Trades on fewer days than DOWN, so DOWN's extra dates come from a later chunk
+            'FLAT.NS': pd.Series([50.0, 50.0, 50.0], index=days[1:4]),
+            'DOWN.NS': pd.Series([100.0, 200.0, 150.0, 90.0, 70.0], index=days),
+        }
+        symbols = ['FAIL.NS', 'FLAT.NS', 'DOWN.NS']
+
+        with mock.patch.object(market_data_fetcher, 'SPARK_BATCH_SIZE', 1), \
+                mock.patch.object(market_data_fetcher.yf, 'download', _fake_download(closes), create=True):
+            returns = self.fetcher.get_stock_returns_batched(
+                symbols, datetime(2024, 1, 1), datetime(2024, 1, 10), max_workers=1
+            )
+
+        self.assertEqual(returns, {'FLAT.NS': 0.0, 'DOWN.NS': -30.0})
+        # The cached (closed-window) value is the correct one too
+        key = ReturnsCache.key('DOWN', datetime(2024, 1, 1), datetime(2024, 1, 10))
+        self.assertEqual(self.fetcher.returns_cache.get_many([key]), {key: -30.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+File I/O helpers shared by the data scripts
+JSON via orjson when available, Excel via calamine when available
+"""
+import json
+
+import pandas as pd
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None
+
+
+def read_json(path: str):
+    """Parse a JSON file (with orjson when available)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+
+def write_json(path: str, obj) -> None:
+    """Write obj as 2-space indented JSON (with orjson when available)"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(obj, f, indent=2)
+
+
+def json_line(obj) -> bytes:
+    """Serialize obj as a single JSON Lines record"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj) + b'\n'
+    return json.dumps(obj).encode() + b'\n'
+
+
+def read_excel_columns(excel_path: str, header: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """Read only the given header columns, as strings (no type inference on the rest)"""
+    positions = sorted({header.columns.get_loc(c) for c in columns})
+    df = pd.read_excel(excel_path, usecols=positions, dtype=str, engine=EXCEL_ENGINE)
+    df.columns = header.columns[positions]
+    return df
@@ -2,10 +2,30 @@
 Investment Tier Classification System
 Based on deep analysis feedback - Quality over Quantity
 """
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple
 
 
+# Tier number -> (tier_name, tier_action)
+TIER_LABELS = {
+    1: ("CORE PORTFOLIO", "BUY / HOLD 5+ years"),
+    2: ("QUALITY ADDITIONS", "HOLD / BUY on dips"),
+    3: ("SPECIALIZED PLAYS", "HOLD / RESEARCH"),
+    4: ("AVOID", "EXCLUDE from portfolio"),
+}
+
+# Metrics read by the tier rules and the value assumed when a column is missing
+TIER_METRIC_DEFAULTS = {
+    'roe': 0,
+    'roce': 0,
+    'pe_ratio': 999,
+    'fcf': 0,
+    'debt_equity': 999,
+    'profit_growth_3yr': 0,
+}
+
+
 def classify_investment_tier(row: pd.Series) -> Tuple[int, str, str]:
     """
     Classify company into investment tiers based on fundamental quality
@@ -19,34 +39,34 @@ def classify_investment_tier(row: pd.Series) -> Tuple[int, str, str]:
     Tier 4: AVOID (Remaining) - EXCLUDE from portfolio
     """
     
-    roe = row.get('roe', 0)
-    roce = row.get('roce', 0)
-    pe_ratio = row.get('pe_ratio', 999)
-    fcf = row.get('fcf', 0)
-    debt_equity = row.get('debt_equity', 999)
-    profit_growth = row.get('profit_growth_3yr', 0)
+    roe = row.get('roe', TIER_METRIC_DEFAULTS['roe'])
+    roce = row.get('roce', TIER_METRIC_DEFAULTS['roce'])
+    pe_ratio = row.get('pe_ratio', TIER_METRIC_DEFAULTS['pe_ratio'])
+    fcf = row.get('fcf', TIER_METRIC_DEFAULTS['fcf'])
+    debt_equity = row.get('debt_equity', TIER_METRIC_DEFAULTS['debt_equity'])
+    profit_growth = row.get('profit_growth_3yr', TIER_METRIC_DEFAULTS['profit_growth_3yr'])
     
     # TIER 1: CORE PORTFOLIO - Exceptional Quality
     # Criteria: ROE > 20% + ROCE > 20% + P/E < 25 + FCF > ₹500 Cr + D/E < 0.5
     if (roe > 20 and roce > 20 and pe_ratio < 25 and 
         fcf > 500 and debt_equity < 0.5):
-        return 1, "CORE PORTFOLIO", "BUY / HOLD 5+ years"
+        return (1, *TIER_LABELS[1])
     
     # TIER 2: QUALITY ADDITIONS - Good Quality
     # Criteria: ROE > 15% + ROCE > 15% + P/E < 35 + FCF > ₹100 Cr + D/E < 1.0
     if (roe > 15 and roce > 15 and pe_ratio < 35 and 
         fcf > 100 and debt_equity < 1.0):
-        return 2, "QUALITY ADDITIONS", "HOLD / BUY on dips"
+        return (2, *TIER_LABELS[2])
     
     # TIER 3: SPECIALIZED PLAYS - Mixed Quality
     # Criteria: Either ROE > 12% OR FCF > ₹1,000 Cr + Positive Growth + D/E < 1.5
     if ((roe > 12 or (fcf > 1000 and profit_growth > 0)) and 
         debt_equity < 1.5):
-        return 3, "SPECIALIZED PLAYS", "HOLD / RESEARCH"
+        return (3, *TIER_LABELS[3])
     
     # TIER 4: AVOID - Poor Quality
     # Everything else
-    return 4, "AVOID", "EXCLUDE from portfolio"
+    return (4, *TIER_LABELS[4])
 
 
 def get_tier_summary(df: pd.DataFrame) -> Dict:
@@ -246,13 +266,38 @@ def classify_all_companies(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with tier columns added
     """
-    # Apply tier classification
-    tier_data = df.apply(classify_investment_tier, axis=1, result_type='expand')
-    df['investment_tier'] = tier_data[0]
-    df['investment_tier_name'] = tier_data[1]
-    df['investment_tier_action'] = tier_data[2]
+    # Read each tier metric once as an array; the rules match classify_investment_tier
+    n = len(df)
+    metrics = {
+        col: df[col].to_numpy(dtype=float) if col in df.columns else np.full(n, float(default))
+        for col, default in TIER_METRIC_DEFAULTS.items()
+    }
+    roe = metrics['roe']
+    roce = metrics['roce']
+    pe_ratio = metrics['pe_ratio']
+    fcf = metrics['fcf']
+    debt_equity = metrics['debt_equity']
+    profit_growth = metrics['profit_growth_3yr']
+    
+    tiers = np.select(
+        [
+            (roe > 20) & (roce > 20) & (pe_ratio < 25) & (fcf > 500) & (debt_equity < 0.5),
+            (roe > 15) & (roce > 15) & (pe_ratio < 35) & (fcf > 100) & (debt_equity < 1.0),
+            ((roe > 12) | ((fcf > 1000) & (profit_growth > 0))) & (debt_equity < 1.5),
+        ],
+        [1, 2, 3],
+        default=4
+    )
+    df['investment_tier'] = tiers
+    # Only four tiers exist, so the label columns are stored as categoricals
+    df['investment_tier_name'] = pd.Categorical.from_codes(tiers - 1, [TIER_LABELS[t][0] for t in TIER_LABELS])
+    df['investment_tier_action'] = pd.Categorical.from_codes(tiers - 1, [TIER_LABELS[t][1] for t in TIER_LABELS])
     
     # Add tier insights
-    df['tier_insights'] = df.apply(add_tier_insights, axis=1)
+    insight_cols = ['investment_tier'] + list(TIER_METRIC_DEFAULTS)
+    df['tier_insights'] = [
+        add_tier_insights(dict(zip(insight_cols, values)))
+        for values in zip(tiers, *metrics.values())
+    ]
     
     return df
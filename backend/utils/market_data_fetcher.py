@@ -6,9 +6,74 @@ import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import aiohttp
 import time
 import json
 import os
+import sqlite3
+import threading
+
+
+# Yahoo Finance spark endpoint: latest quote meta for up to SPARK_BATCH_SIZE symbols per request
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v7/finance/spark"
+SPARK_BATCH_SIZE = 20
+
+# Per-symbol history downloads run in this many threads (also the effective Yahoo rate limit)
+RETURNS_MAX_WORKERS = 8
+
+RETURNS_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', '.cache', 'returns.sqlite')
+
+
+class ReturnsCache:
+    """
+    Persistent cache of historical returns keyed by (symbol, start date, end date)
+    
+    Callers only store windows that have already closed, whose prices no longer change,
+    so entries never expire. Cache errors are reported and treated as misses.
+    """
+    
+    def __init__(self, path: str = RETURNS_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS returns (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+        return self._conn
+    
+    @staticmethod
+    def key(symbol: str, start_date: datetime, end_date: datetime) -> str:
+        return f"{symbol}:{start_date.date().isoformat()}:{end_date.date().isoformat()}"
+    
+    def get_many(self, keys: List[str]) -> Dict[str, float]:
+        """Cached values for the keys that are present"""
+        found = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    found.update(conn.execute(f"SELECT key, value FROM returns WHERE key IN ({placeholders})", chunk))
+        except sqlite3.Error as e:
+            print(f"⚠️ Returns cache unavailable: {e}")
+        return found
+    
+    def set_many(self, values: Dict[str, float]):
+        if not values:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO returns (key, value) VALUES (?, ?)", list(values.items()))
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not cache returns: {e}")
 
 
 class MarketDataFetcher:
@@ -21,6 +86,15 @@ class MarketDataFetcher:
         self.bse_suffix = ".BO"  # BSE stocks (fallback)
         self.symbol_mapping = self._load_symbol_mapping()
         self._normalized_map = self._build_normalized_map(self.symbol_mapping)
+        # First mapping key per lowercased name, for case-insensitive lookups
+        self._lowercase_map: Dict[str, str] = {}
+        for key, value in self.symbol_mapping.items():
+            self._lowercase_map.setdefault(key.lower(), value)
+        # Memo of _resolve_symbol results (the mapping is fixed after load)
+        self._resolved: Dict[str, str] = {}
+        self.returns_cache = ReturnsCache()
+        # Close matrix loaded by prefetch_closes, with the [start, end) range it covers
+        self._prefetched: Optional[Tuple[pd.DataFrame, datetime, datetime]] = None
     
     def _load_symbol_mapping(self) -> Dict[str, str]:
         """Load symbol mapping from JSON file"""
@@ -62,7 +136,13 @@ class MarketDataFetcher:
         return nm
     
     def _resolve_symbol(self, symbol: str) -> str:
-        """Resolve company name to ticker symbol"""
+        """Resolve company name to ticker symbol (memoized per symbol)"""
+        resolved = self._resolved.get(symbol)
+        if resolved is None:
+            resolved = self._resolved[symbol] = self._resolve_symbol_uncached(symbol)
+        return resolved
+    
+    def _resolve_symbol_uncached(self, symbol: str) -> str:
         # Check if it's already a ticker (contains .NS or .BO)
         if '.NS' in symbol or '.BO' in symbol:
             return symbol.replace('.NS', '').replace('.BO', '')
@@ -74,9 +154,8 @@ class MarketDataFetcher:
         
         # Try case-insensitive match
         sl = s_clean.lower()
-        for key, value in self.symbol_mapping.items():
-            if key.lower() == sl:
-                return value
+        if sl in self._lowercase_map:
+            return self._lowercase_map[sl]
         
         # Try normalized lookup (handles punctuation, spaces, '&' vs 'and')
         nk = self._normalize_key(s_clean)
@@ -103,16 +182,20 @@ class MarketDataFetcher:
         symbols: List[str],
         start_date: datetime,
         end_date: Optional[datetime] = None,
-        period_months: Optional[int] = None
+        period_months: Optional[int] = None,
+        max_workers: int = RETURNS_MAX_WORKERS
     ) -> Dict[str, float]:
         """
         Get actual returns for a list of stock symbols
         
+        Symbols are downloaded concurrently in up to max_workers threads.
+        
         Args:
             symbols: List of NSE stock symbols (without .NS suffix)
             start_date: Start date for return calculation
             end_date: End date (default: today)
             period_months: Alternative to end_date - calculate returns over N months
+            max_workers: Concurrent downloads
             
         Returns:
             Dict mapping symbols to percentage returns
@@ -128,24 +211,122 @@ class MarketDataFetcher:
         
         print(f"📊 Fetching returns for {len(symbols)} stocks from {start_date.date()} to {end_date.date()}")
         
+        # Finished windows never change, so their returns are cached on disk
+        window_closed = end_date <= datetime.now()
+        
+        def _fetch_one(symbol: str) -> Optional[float]:
+            # Resolve symbol to ticker
+            ticker_symbol = self._resolve_symbol(symbol)
+            key = self.returns_cache.key(ticker_symbol, start_date, end_date)
+            cached = self.returns_cache.get_many([key])
+            if key in cached:
+                return cached[key]
+            
+            returns = self._get_single_stock_return(ticker_symbol, start_date, end_date)
+            if returns is not None and window_closed:
+                self.returns_cache.set_many({key: returns})
+            return returns
+        
+        # Network-bound; the pool size doubles as the rate limit towards Yahoo Finance
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as pool:
+            futures = [pool.submit(_fetch_one, symbol) for symbol in symbols]
+            
+            for symbol, future in zip(symbols, futures):
+                try:
+                    returns = future.result()
+                    if returns is not None:
+                        returns_data[symbol] = returns
+                        print(f"  ✅ {symbol}: {returns:+.2f}%")
+                    else:
+                        failed_symbols.append(symbol)
+                        print(f"  ⚠️ {symbol}: No data available")
+                    
+                except Exception as e:
+                    failed_symbols.append(symbol)
+                    print(f"  ❌ {symbol}: Error - {str(e)}")
+        
+        print(f"\n✅ Successfully fetched: {len(returns_data)}/{len(symbols)}")
+        if failed_symbols:
+            print(f"⚠️ Failed symbols: {', '.join(failed_symbols)}")
+        
+        return returns_data
+    
+    def get_stock_returns_batched(
+        self,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: Optional[datetime] = None,
+        period_months: Optional[int] = None,
+        max_workers: int = RETURNS_MAX_WORKERS
+    ) -> Dict[str, float]:
+        """
+        Get actual returns like get_stock_returns, downloading NSE history for
+        SPARK_BATCH_SIZE symbols per request
+        
+        Symbols with no NSE history at all go through get_stock_returns, which
+        also tries BSE.
+        """
+        if end_date is None:
+            if period_months:
+                end_date = start_date + timedelta(days=period_months * 30)
+            else:
+                end_date = datetime.now()
+        
+        print(f"📊 Fetching returns for {len(symbols)} stocks from {start_date.date()} to {end_date.date()} (batched)")
+        
+        resolved = {symbol: self._resolve_symbol(symbol) for symbol in symbols}
+        tickers = {symbol: f"{resolved[symbol]}{self.nse_suffix}" for symbol in symbols}
+        
+        # Finished windows never change, so their returns are cached on disk
+        window_closed = end_date <= datetime.now()
+        cache_keys = {symbol: self.returns_cache.key(resolved[symbol], start_date, end_date) for symbol in symbols}
+        cached = self.returns_cache.get_many(list(set(cache_keys.values())))
+        
+        unique_tickers = list(dict.fromkeys(tickers[s] for s in symbols if cache_keys[s] not in cached))
+        
+        # Slice what a batch prefetch already holds; download only the rest
+        frames = []
+        if self._prefetched is not None:
+            prefetched, prefetch_start, prefetch_end = self._prefetched
+            if prefetch_start <= start_date and end_date <= prefetch_end:
+                held = [t for t in unique_tickers if t in prefetched.columns]
+                window = (prefetched.index >= start_date) & (prefetched.index < end_date)
+                frames.append(prefetched.loc[window, held])
+                held = set(held)
+                unique_tickers = [t for t in unique_tickers if t not in held]
+        
+        chunks = [unique_tickers[i:i + SPARK_BATCH_SIZE] for i in range(0, len(unique_tickers), SPARK_BATCH_SIZE)]
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+            frames.extend(pool.map(lambda chunk: self._download_closes(chunk, start_date, end_date), chunks))
+        
+        closes = self._concat_closes(frames)
+        counts = closes.count()
+        ticker_returns = self._returns_from_closes(closes)
+        
+        # No NSE rows at all: retry one by one (NSE, then BSE; these cache themselves)
+        missing = [s for s in symbols if cache_keys[s] not in cached and counts.get(tickers[s], 0) == 0]
+        fallback = self.get_stock_returns(missing, start_date, end_date, max_workers=max_workers) if missing else {}
+        
+        returns_data = {}
+        failed_symbols = []
+        downloaded = {}
         for symbol in symbols:
-            try:
-                # Resolve symbol to ticker
-                ticker_symbol = self._resolve_symbol(symbol)
-                returns = self._get_single_stock_return(ticker_symbol, start_date, end_date)
+            if cache_keys[symbol] in cached:
+                returns = cached[cache_keys[symbol]]
+            elif symbol in missing:
+                returns = fallback.get(symbol)
+            else:
+                returns = ticker_returns.get(tickers[symbol])
                 if returns is not None:
-                    returns_data[symbol] = returns
-                    print(f"  ✅ {symbol}: {returns:+.2f}%")
-                else:
-                    failed_symbols.append(symbol)
-                    print(f"  ⚠️ {symbol}: No data available")
-                
-                # Rate limiting - be nice to Yahoo Finance
-                time.sleep(0.5)
-                
-            except Exception as e:
+                    downloaded[cache_keys[symbol]] = returns
+            if returns is not None:
+                returns_data[symbol] = returns
+            else:
                 failed_symbols.append(symbol)
-                print(f"  ❌ {symbol}: Error - {str(e)}")
+        
+        if window_closed:
+            self.returns_cache.set_many(downloaded)
         
         print(f"\n✅ Successfully fetched: {len(returns_data)}/{len(symbols)}")
         if failed_symbols:
@@ -153,6 +334,76 @@ class MarketDataFetcher:
         
         return returns_data
     
+    def prefetch_closes(
+        self,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        max_workers: int = RETURNS_MAX_WORKERS
+    ):
+        """
+        Download NSE closes for a whole symbol universe over [start_date, end_date) once
+        
+        Later get_stock_returns_batched calls whose window lies inside this range
+        slice the matrix instead of downloading. Release it with clear_prefetched.
+        """
+        unique_tickers = list(dict.fromkeys(f"{self._resolve_symbol(s)}{self.nse_suffix}" for s in symbols))
+        chunks = [unique_tickers[i:i + SPARK_BATCH_SIZE] for i in range(0, len(unique_tickers), SPARK_BATCH_SIZE)]
+        
+        print(f"📦 Prefetching closes for {len(unique_tickers)} tickers from {start_date.date()} to {end_date.date()}")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+            frames = list(pool.map(lambda chunk: self._download_closes(chunk, start_date, end_date), chunks))
+        
+        closes = self._concat_closes(frames)
+        self._prefetched = (closes, start_date, end_date)
+    
+    def clear_prefetched(self):
+        self._prefetched = None
+    
+    def _download_closes(self, tickers: List[str], start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """Daily closes for several tickers in one download (one column per ticker)"""
+        try:
+            data = yf.download(
+                tickers, start=start_date, end=end_date,
+                auto_adjust=True, progress=False, threads=False
+            )
+        except Exception as e:
+            print(f"    Error fetching {', '.join(tickers)}: {str(e)}")
+            return pd.DataFrame(columns=tickers, index=pd.DatetimeIndex([]))
+        
+        if data.empty:
+            return pd.DataFrame(columns=tickers, index=pd.DatetimeIndex([]))
+        
+        closes = data['Close']
+        if isinstance(closes, pd.Series):
+            closes = closes.to_frame(tickers[0])
+        return closes
+    
+    @staticmethod
+    def _concat_closes(frames: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Join per-chunk close frames on one sorted date index
+        
+        Failed chunks (empty frames) are dropped: concatenating them would turn the
+        index into unsorted objects and break the first/last close lookup.
+        """
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(index=pd.DatetimeIndex([]))
+        return pd.concat(frames, axis=1).sort_index()
+    
+    @staticmethod
+    def _returns_from_closes(closes: pd.DataFrame) -> Dict[str, float]:
+        """Percentage return from first to last close per column (needs 2+ closes and a non-zero start)"""
+        if closes.empty:
+            return {}
+        
+        first = closes.bfill().iloc[0]
+        last = closes.ffill().iloc[-1]
+        returns = ((last - first) / first * 100).round(2)
+        valid = (closes.count() >= 2) & (first != 0)
+        return returns[valid].to_dict()
+    
     def _get_single_stock_return(
         self,
         symbol: str,
@@ -222,6 +473,12 @@ class MarketDataFetcher:
             else:
                 end_date = datetime.now()
         
+        key = self.returns_cache.key(benchmark, start_date, end_date)
+        cached = self.returns_cache.get_many([key])
+        if key in cached:
+            print(f"📈 {benchmark} return: {cached[key]:+.2f}% (cached)")
+            return cached[key]
+        
         try:
             index = yf.Ticker(benchmark)
             hist = index.history(start=start_date, end=end_date)
@@ -236,7 +493,10 @@ class MarketDataFetcher:
             returns = ((end_price - start_price) / start_price) * 100
             
             print(f"📈 {benchmark} return: {returns:+.2f}%")
-            return round(returns, 2)
+            returns = round(returns, 2)
+            if end_date <= datetime.now():
+                self.returns_cache.set_many({key: returns})
+            return returns
             
         except Exception as e:
             print(f"❌ Error fetching benchmark {benchmark}: {str(e)}")
@@ -285,7 +545,7 @@ class MarketDataFetcher:
         print(f"   Companies: {len(symbols)}")
         
         # Fetch actual returns
-        returns_data = self.get_stock_returns(
+        returns_data = self.get_stock_returns_batched(
             symbols=symbols,
             start_date=snapshot_date,
             period_months=period_months
@@ -342,6 +602,58 @@ class MarketDataFetcher:
         
         return prices
     
+    async def fetch_current_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        Get current market prices with batched Yahoo Finance requests
+        
+        Symbols are sent SPARK_BATCH_SIZE at a time and all batches run concurrently.
+        Any symbol a batch does not return is retried through get_current_prices.
+        
+        Args:
+            symbols: List of stock symbols
+            
+        Returns:
+            Dict mapping symbols to current prices
+        """
+        batches = [symbols[i:i + SPARK_BATCH_SIZE] for i in range(0, len(symbols), SPARK_BATCH_SIZE)]
+        prices = {}
+        
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
+            results = await asyncio.gather(
+                *(self._fetch_spark_batch(session, batch) for batch in batches),
+                return_exceptions=True
+            )
+        
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Batched price request failed for {len(batch)} symbols: {str(result)}")
+                continue
+            prices.update(result)
+        
+        missing = [symbol for symbol in symbols if symbol not in prices]
+        if missing:
+            prices.update(await asyncio.to_thread(self.get_current_prices, missing))
+        
+        return prices
+    
+    async def _fetch_spark_batch(self, session: aiohttp.ClientSession, symbols: List[str]) -> Dict[str, float]:
+        """Fetch the latest price for one batch of symbols from the spark endpoint"""
+        tickers = {f"{symbol}{self.nse_suffix}": symbol for symbol in symbols}
+        params = {'symbols': ','.join(tickers), 'range': '1d', 'interval': '5m'}
+        
+        async with session.get(YAHOO_SPARK_URL, params=params) as response:
+            response.raise_for_status()
+            payload = await response.json()
+        
+        prices = {}
+        for item in (payload.get('spark') or {}).get('result') or []:
+            symbol = tickers.get(item.get('symbol'))
+            for quote in item.get('response') or []:
+                current_price = (quote.get('meta') or {}).get('regularMarketPrice')
+                if symbol and current_price:
+                    prices[symbol] = round(current_price, 2)
+        return prices
+    
     def get_market_cap(self, symbols: List[str]) -> Dict[str, float]:
         """
         Get market capitalization for symbols
@@ -5,10 +5,93 @@ Tracks historical rankings and validates model performance over time
 import pandas as pd
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Union
 from pathlib import Path
+import os
+import threading
 import numpy as np
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _loads(data: bytes):
+    """Parse JSON bytes with orjson when available"""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # json.dumps writes NaN/Infinity for missing metrics, which orjson rejects
+            pass
+    return json.loads(data)
+
+
+def iter_snapshots_file(path: Path) -> Iterator[Dict]:
+    """
+    Yield the snapshots in a file one at a time
+    
+    ranking_snapshots.jsonl holds one snapshot per line, oldest first, and is
+    parsed line by line; any other suffix is read as the legacy single JSON array.
+    """
+    path = Path(path)
+    if not path.exists():
+        return
+    
+    # Bytes let json detect the encoding (scripts may write UTF-8 with orjson)
+    with open(path, 'rb') as f:
+        if path.suffix != '.jsonl':
+            try:
+                yield from _loads(f.read())
+            except json.JSONDecodeError:
+                pass
+            return
+        
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                snapshot = _loads(line)
+            except json.JSONDecodeError:
+                # e.g. a partial line left by an interrupted append
+                print(f"⚠️ Skipping unreadable snapshot at {path.name}:{line_no}")
+                continue
+            yield snapshot
+
+
+def read_snapshots_file(path: Path) -> List[Dict]:
+    """Parse a snapshots file (see iter_snapshots_file)"""
+    return list(iter_snapshots_file(path))
+
+
+def write_snapshots_file(path: Path, snapshots: List[Dict]):
+    """Rewrite a snapshots file in the format its suffix implies"""
+    path = Path(path)
+    # Write a sibling file and swap it in, so readers never see a half-written store
+    tmp_path = path.with_name(path.name + '.tmp')
+    if path.suffix != '.jsonl':
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshots, f, indent=2)
+    else:
+        with open(tmp_path, 'wb') as f:
+            for snapshot in snapshots:
+                f.write(json.dumps(snapshot).encode() + b'\n')
+    os.replace(tmp_path, path)
+
+
+def migrate_legacy_snapshots(snapshots_file: Path):
+    """Convert the old single-array ranking_snapshots.json next to snapshots_file to JSON Lines (once)"""
+    snapshots_file = Path(snapshots_file)
+    legacy_file = snapshots_file.with_suffix('.json')
+    if legacy_file.exists() and not snapshots_file.exists():
+        snapshots = read_snapshots_file(legacy_file)
+        # Some writers prepended to the array; the JSON Lines store is oldest first
+        snapshots.sort(key=lambda s: s.get('timestamp') or '')
+        write_snapshots_file(snapshots_file, snapshots)
+        print(f"✅ Migrated {len(snapshots)} snapshots to {snapshots_file.name}")
+
 
 class PerformanceTracker:
     """
@@ -18,8 +101,20 @@ class PerformanceTracker:
     def __init__(self, storage_path: str = "data/performance_tracking"):
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
-        self.snapshots_file = self.storage_path / "ranking_snapshots.json"
+        # Snapshots are JSON Lines so saving one is an append, not a rewrite of every snapshot
+        self.snapshots_file = self.storage_path / "ranking_snapshots.jsonl"
         self.validation_file = self.storage_path / "validation_results.json"
+        # Snapshot updates are load-modify-write on one JSON file; serialize them across threads
+        self._write_lock = threading.Lock()
+        # (file path, mtime_ns, size) of the parsed snapshots file, and the parsed list
+        self._snapshot_cache_key = None
+        self._snapshot_cache = []
+        # Working copy while a batch of add_actual_returns calls defers its write
+        self._batch_snapshots: Optional[List[Dict]] = None
+        self._migrate_legacy_snapshots()
+    
+    def _migrate_legacy_snapshots(self):
+        migrate_legacy_snapshots(self.snapshots_file)
     
     def save_ranking_snapshot(
         self,
@@ -54,13 +149,14 @@ class PerformanceTracker:
             }
         }
         
-        # Load existing snapshots
-        snapshots = self._load_snapshots()
-        snapshots.append(snapshot)
-        
-        # Save updated snapshots
-        with open(self.snapshots_file, 'w') as f:
-            json.dump(snapshots, f, indent=2)
+        with self._write_lock:
+            if self.snapshots_file.suffix == '.jsonl':
+                with open(self.snapshots_file, 'ab') as f:
+                    f.write(json.dumps(snapshot).encode() + b'\n')
+            else:
+                snapshots = self._read_snapshots_file()
+                snapshots.append(snapshot)
+                write_snapshots_file(self.snapshots_file, snapshots)
         
         print(f"✅ Saved ranking snapshot: {snapshot_id}")
         return snapshot_id
@@ -68,7 +164,7 @@ class PerformanceTracker:
     def add_actual_returns(
         self,
         snapshot_id: str,
-        returns_data: Dict[str, float],
+        returns_data: Union[Dict[str, float], pd.Series],
         period_months: int
     ):
         """
@@ -76,76 +172,103 @@ class PerformanceTracker:
         
         Args:
             snapshot_id: ID of the snapshot to update
-            returns_data: Dict mapping company symbols to actual returns
+            returns_data: Dict or Series mapping company symbols to actual returns
             period_months: Time period for returns (3, 6, or 12 months)
         """
-        snapshots = self._load_snapshots()
+        returns_series = pd.Series(returns_data, dtype=float)
         
-        for snapshot in snapshots:
-            if snapshot['snapshot_id'] == snapshot_id:
-                if 'actual_returns' not in snapshot:
-                    snapshot['actual_returns'] = {}
-                
-                snapshot['actual_returns'][f'{period_months}m'] = {
-                    'returns': returns_data,
-                    'recorded_date': datetime.now().isoformat()
-                }
-                
-                # Calculate validation metrics
-                validation = self._calculate_validation_metrics(
-                    snapshot['rankings'],
-                    returns_data,
-                    period_months
-                )
-                
-                snapshot['validation'] = validation
-                
-                # Save updated snapshots
-                with open(self.snapshots_file, 'w') as f:
-                    json.dump(snapshots, f, indent=2)
-                
-                print(f"✅ Added {period_months}m returns for snapshot {snapshot_id}")
-                print(f"   Hit Rate: {validation['hit_rate']:.1%}")
-                print(f"   Alpha: {validation['alpha']:.2f}%")
-                
-                return validation
+        with self._write_lock:
+            batched = self._batch_snapshots is not None
+            snapshots = self._batch_snapshots if batched else self._read_snapshots_file()
+            
+            for snapshot in snapshots:
+                if snapshot['snapshot_id'] == snapshot_id:
+                    if 'actual_returns' not in snapshot:
+                        snapshot['actual_returns'] = {}
+                    
+                    snapshot['actual_returns'][f'{period_months}m'] = {
+                        'returns': returns_series.to_dict(),
+                        'recorded_date': datetime.now().isoformat()
+                    }
+                    
+                    # Calculate validation metrics
+                    validation = self._calculate_validation_metrics(
+                        snapshot['rankings'],
+                        returns_series,
+                        period_months
+                    )
+                    
+                    snapshot['validation'] = validation
+                    
+                    # Save updated snapshots (deferred to commit_batch inside a batch)
+                    if not batched:
+                        write_snapshots_file(self.snapshots_file, snapshots)
+                    
+                    print(f"✅ Added {period_months}m returns for snapshot {snapshot_id}")
+                    print(f"   Hit Rate: {validation['hit_rate']:.1%}")
+                    print(f"   Alpha: {validation['alpha']:.2f}%")
+                    
+                    return validation
         
         raise ValueError(f"Snapshot {snapshot_id} not found")
     
+    def begin_batch(self):
+        """
+        Start deferring add_actual_returns writes until commit_batch
+        
+        Meant for single-writer batch runs (run_backtest): snapshots saved by other
+        writers between begin_batch and commit_batch are overwritten.
+        """
+        with self._write_lock:
+            self._batch_snapshots = self._read_snapshots_file()
+    
+    def commit_batch(self):
+        """Write all updates made since begin_batch in one rewrite"""
+        with self._write_lock:
+            if self._batch_snapshots is not None:
+                write_snapshots_file(self.snapshots_file, self._batch_snapshots)
+                self._batch_snapshots = None
+    
     def _calculate_validation_metrics(
         self,
         rankings: List[Dict],
-        returns_data: Dict[str, float],
+        returns_data: pd.Series,
         period_months: int
     ) -> Dict:
         """
         Calculate validation metrics comparing predictions to actual returns
+        
+        returns_data is a Series of returns indexed by symbol; the metrics are
+        computed on numpy arrays rather than Python loops.
         """
-        top_10 = rankings[:10]
-        top_10_symbols = [r['symbol'] for r in top_10]
+        top_10_symbols = [r['symbol'] for r in rankings[:10]]
         
-        # Get returns for top 10
-        top_10_returns = [returns_data.get(symbol, 0) for symbol in top_10_symbols]
+        # Returns for the top 10 (missing symbols count as 0%)
+        all_returns = returns_data.astype(float)
+        top_10_returns = all_returns.reindex(top_10_symbols, fill_value=0.0).to_numpy()
         
         # Benchmark (assume Nifty 50 or average of all stocks)
-        all_returns = list(returns_data.values())
-        benchmark_return = np.median(all_returns) if all_returns else 0
+        benchmark_return = float(np.median(all_returns.to_numpy())) if len(all_returns) else 0.0
+        
+        if len(top_10_returns) == 0:
+            top_10_returns = np.zeros(1)
         
         # Calculate metrics
-        avg_return = np.mean(top_10_returns)
+        avg_return = float(top_10_returns.mean())
         alpha = avg_return - benchmark_return
-        hit_rate = sum(1 for r in top_10_returns if r > benchmark_return) / len(top_10_returns)
+        hit_rate = float((top_10_returns > benchmark_return).mean())
         
         # Sharpe ratio (simplified - assuming risk-free rate of 6%)
         risk_free_rate = 6.0 * (period_months / 12)  # Annualized
-        std_dev = np.std(top_10_returns) if len(top_10_returns) > 1 else 1
+        std_dev = float(top_10_returns.std()) if len(top_10_returns) > 1 else 1
         sharpe = (avg_return - risk_free_rate) / std_dev if std_dev > 0 else 0
         
         # Win rate (% positive returns)
-        win_rate = sum(1 for r in top_10_returns if r > 0) / len(top_10_returns)
+        win_rate = float((top_10_returns > 0).mean())
         
         # Max drawdown
-        max_drawdown = min(top_10_returns) if top_10_returns else 0
+        worst = float(top_10_returns.min())
+        best = float(top_10_returns.max())
         
         return {
             'period_months': period_months,
@@ -155,9 +278,9 @@ class PerformanceTracker:
             'hit_rate': round(hit_rate, 3),
             'sharpe_ratio': round(sharpe, 2),
             'win_rate': round(win_rate, 3),
-            'max_drawdown': round(max_drawdown, 2),
-            'best_performer': max(top_10_returns) if top_10_returns else 0,
-            'worst_performer': min(top_10_returns) if top_10_returns else 0
+            'max_drawdown': round(worst, 2),
+            'best_performer': best,
+            'worst_performer': worst
         }
     
     def get_historical_performance(self, months_back: int = 12) -> pd.DataFrame:
@@ -268,22 +391,34 @@ class PerformanceTracker:
         return sectors
     
     def _load_snapshots(self) -> List[Dict]:
-        """Load existing snapshots from file"""
-        if not self.snapshots_file.exists():
-            return []
+        """
+        Load existing snapshots, re-parsing the file only when it has changed
         
+        The returned list is shared between callers and must not be modified;
+        code that updates snapshots reads its own copy with _read_snapshots_file.
+        """
         try:
-            with open(self.snapshots_file, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
+            stat = self.snapshots_file.stat()
+        except FileNotFoundError:
             return []
+        
+        key = (self.snapshots_file, stat.st_mtime_ns, stat.st_size)
+        if key != self._snapshot_cache_key:
+            self._snapshot_cache = self._read_snapshots_file()
+            self._snapshot_cache_key = key
+        return self._snapshot_cache
+    
+    def _read_snapshots_file(self) -> List[Dict]:
+        """Load existing snapshots from file"""
+        return read_snapshots_file(self.snapshots_file)
     
     def export_for_backtesting(self, output_file: str):
         """
         Export data in format suitable for backtesting
         
         Args:
-            output_file: Path to output CSV file
+            output_file: Path to output file; a .parquet suffix writes zstd-compressed
+                Parquet (pyarrow), anything else writes CSV
         """
         snapshots = self._load_snapshots()
         
@@ -309,8 +444,11 @@ class PerformanceTracker:
                 
                 rows.append(row)
         
-        df = pd.DataFrame(rows)
-        df.to_csv(output_file, index=False)
+        df = pd.DataFrame.from_records(rows)
+        if Path(output_file).suffix.lower() == '.parquet':
+            df.to_parquet(output_file, engine='pyarrow', compression='zstd', index=False)
+        else:
+            df.to_csv(output_file, index=False)
         print(f"✅ Exported {len(rows)} records to {output_file}")
 
 
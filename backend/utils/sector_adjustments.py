@@ -2,7 +2,9 @@
 Sector-Specific Adjustments for Financial Ranking
 Different sectors have different financial norms and expectations
 """
+from functools import lru_cache
 from typing import Dict, Optional
+import numpy as np
 import pandas as pd
 
 
@@ -104,6 +106,37 @@ SECTOR_BENCHMARKS = {
 }
 
 
+# Default keywords used to guess a sector from the company name (first match wins)
+DEFAULT_INDUSTRY_KEYWORDS = {
+    'IT': ['tech', 'software', 'infotech', 'systems', 'solutions', 'technologies'],
+    'Banking': ['bank', 'finance', 'nbfc', 'financial', 'capital', 'securities'],
+    'Pharma': ['pharma', 'drug', 'biotech', 'healthcare', 'medical', 'lab'],
+    'Manufacturing': ['industries', 'manufacturing', 'steel', 'cement', 'chemicals'],
+    'Telecom': ['telecom', 'communications', 'wireless', 'broadband'],
+    'RealEstate': ['realty', 'properties', 'construction', 'builders'],
+    'FMCG': ['consumer', 'foods', 'beverages', 'fmcg'],
+    'Auto': ['auto', 'motors', 'vehicles', 'automotive'],
+    'Energy': ['power', 'energy', 'oil', 'gas', 'petroleum'],
+}
+
+
+def _match_sector(company_name: str, industry_keywords: Dict) -> str:
+    """First sector whose keywords appear in the company name, else 'General'"""
+    company_lower = company_name.lower()
+    
+    for sector, keywords in industry_keywords.items():
+        if any(keyword in company_lower for keyword in keywords):
+            return sector
+    
+    return 'General'
+
+
+@lru_cache(maxsize=4096)
+def _sector_from_default_keywords(company_name: str) -> str:
+    # Company names repeat across uploads, so default-keyword lookups are memoized
+    return _match_sector(company_name, DEFAULT_INDUSTRY_KEYWORDS)
+
+
 def get_sector_from_name(company_name: str, industry_keywords: Optional[Dict] = None) -> str:
     """
     Attempt to identify sector from company name or industry keywords
@@ -116,25 +149,13 @@ def get_sector_from_name(company_name: str, industry_keywords: Optional[Dict] =
         Sector identifier or 'General' if unknown
     """
     if industry_keywords is None:
-        industry_keywords = {
-            'IT': ['tech', 'software', 'infotech', 'systems', 'solutions', 'technologies'],
-            'Banking': ['bank', 'finance', 'nbfc', 'financial', 'capital', 'securities'],
-            'Pharma': ['pharma', 'drug', 'biotech', 'healthcare', 'medical', 'lab'],
-            'Manufacturing': ['industries', 'manufacturing', 'steel', 'cement', 'chemicals'],
-            'Telecom': ['telecom', 'communications', 'wireless', 'broadband'],
-            'RealEstate': ['realty', 'properties', 'construction', 'builders'],
-            'FMCG': ['consumer', 'foods', 'beverages', 'fmcg'],
-            'Auto': ['auto', 'motors', 'vehicles', 'automotive'],
-            'Energy': ['power', 'energy', 'oil', 'gas', 'petroleum'],
-        }
-    
-    company_lower = company_name.lower()
-    
-    for sector, keywords in industry_keywords.items():
-        if any(keyword in company_lower for keyword in keywords):
-            return sector
-    
-    return 'General'
+        return _sector_from_default_keywords(company_name)
+    return _match_sector(company_name, industry_keywords)
+
+
+def map_sectors(names: pd.Series) -> pd.Series:
+    """Sector for every company name (categorical), classifying each distinct name once"""
+    return names.map({name: get_sector_from_name(name) for name in names.unique()}).astype('category')
 
 
 def adjust_score_for_sector(
@@ -310,13 +331,14 @@ def apply_sector_adjustments_to_dataframe(df: pd.DataFrame, sector_column: str =
     
     # If no sector column, try to infer from company name
     if sector_column not in df.columns and 'name' in df.columns:
-        df['sector'] = df['name'].apply(get_sector_from_name)
+        df['sector'] = map_sectors(df['name'])
     
-    # Apply adjustments
-    df['sector_adjustment'] = 0.0
-    df['sector_insights'] = ''
+    # Apply adjustments, collecting results and assigning each column once
+    adjusted_scores = []
+    sector_adjustments = []
+    sector_insights = []
     
-    for idx, row in df.iterrows():
+    for row in df.to_dict('records'):
         sector = row.get(sector_column, 'General')
         
         # Get current penalties (would need to be calculated)
@@ -329,8 +351,12 @@ def apply_sector_adjustments_to_dataframe(df: pd.DataFrame, sector_column: str =
             penalties=penalties
         )
         
-        df.at[idx, 'sector_adjusted_score'] = adjustment_result['adjusted_score']
-        df.at[idx, 'sector_adjustment'] = adjustment_result['sector_adjustment']
-        df.at[idx, 'sector_insights'] = '; '.join(adjustment_result['sector_insights'])
+        adjusted_scores.append(adjustment_result['adjusted_score'])
+        sector_adjustments.append(adjustment_result['sector_adjustment'])
+        sector_insights.append('; '.join(adjustment_result['sector_insights']))
+    
+    df['sector_adjusted_score'] = np.asarray(adjusted_scores, dtype=float)
+    df['sector_adjustment'] = np.asarray(sector_adjustments, dtype=float)
+    df['sector_insights'] = sector_insights
     
     return df